@@ -1,17 +1,68 @@
-from fastapi import FastAPI, HTTPException
+import asyncio
+import json
+from contextlib import asynccontextmanager
+
+import time
+import uuid
+
+from fastapi import FastAPI, Header, HTTPException, Response
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 from pydantic import BaseModel
+from starlette.routing import Match
 from typing import Optional, List
 
 from config_loader import load_config, AppConfig
 from chatbot.chatbot import ExamQuestionAgent
+from chatbot.telemetry import (
+    HTTP_REQUEST_SECONDS,
+    HTTP_REQUESTS,
+    REQUESTS_IN_FLIGHT,
+    render_metrics,
+    setup_tracing,
+    shutdown_tracing,
+)
 from loguru import logger
 
 # Load configuration
 config: AppConfig = load_config()
+setup_tracing(config.telemetry.otlp_endpoint, config.telemetry.service_name)
+
+# Initialize chatbot (cheap: indexes are loaded in the background at startup)
+chatbot = ExamQuestionAgent(config)
+
+
+async def _warm_up() -> None:
+    """Load the search indexes and query extractor, then index new or changed exam files."""
+    try:
+        await chatbot.vector_store.aload_indexes()
+    except Exception as exc:  # noqa: BLE001
+        logger.exception(f"Loading the search indexes failed: {exc}")
+        return
+    logger.info("Search indexes loaded")
+    await chatbot.vector_store.refresh_query_extractor()
+    if config.index_on_startup:
+        await chatbot.index_exam_files()
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Load indexes and index in the background so the server binds immediately.
+
+    ``/readyz`` reports not-ready until the indexes are loaded.
+    """
+    warm_up_task = asyncio.create_task(_warm_up())
+    yield
+    if not warm_up_task.done():
+        logger.info("Shutting down – cancelling background indexing")
+        warm_up_task.cancel()
+    shutdown_tracing()
+
+
+SESSION_HEADER = "X-Session-ID"
 
 # Initialize FastAPI app
-app = FastAPI(title="EduMind AI Chatbot")
+app = FastAPI(title="EduMind AI Chatbot", lifespan=lifespan)
 
 # Add CORS middleware
 app.add_middleware(
@@ -20,10 +71,55 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    # Browsers hide response headers from scripts unless they are exposed
+    expose_headers=[SESSION_HEADER],
 )
 
-# Initialize chatbot
-chatbot = ExamQuestionAgent(config)
+
+class MetricsMiddleware:
+    """Count requests in flight and time them until the last body byte.
+
+    Written as plain ASGI middleware so streamed (SSE) responses are timed
+    to the end of the stream, not to their first byte.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    @staticmethod
+    def _route(scope) -> str:
+        # Label by route template, never by raw path, to bound cardinality
+        for route in scope["app"].routes:
+            match, _ = route.matches(scope)
+            if match == Match.FULL:
+                return route.path
+        return "unmatched"
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        route = self._route(scope)
+        status = 500
+
+        async def _send(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        REQUESTS_IN_FLIGHT.inc(route=route)
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, _send)
+        finally:
+            REQUESTS_IN_FLIGHT.dec(route=route)
+            HTTP_REQUEST_SECONDS.observe(time.perf_counter() - start, route=route)
+            HTTP_REQUESTS.inc(route=route, method=scope["method"], status=status)
+
+
+app.add_middleware(MetricsMiddleware)
 
 
 class ChatMessage(BaseModel):
@@ -44,29 +140,127 @@ class ClarificationResponse(BaseModel):
     clarification: str
 
 
+def _session_id(value: Optional[str]) -> str:
+    """Use the client's session ID, or start a new session."""
+    return value or uuid.uuid4().hex
+
+
 @app.get("/")
 async def root():
     return {"message": "Welcome to the EduMind AI Chatbot API"}
 
 
+@app.get("/healthz")
+async def healthz():
+    """Liveness: the process is up and serving requests."""
+    return {"status": "ok"}
+
+
+@app.get("/readyz")
+async def readyz():
+    """Readiness: indexes are loaded and non-empty; includes indexing progress."""
+    ready = await asyncio.to_thread(chatbot.is_ready)
+    body = {
+        "ready": ready,
+        "indexing": chatbot.data_pipeline.progress,
+    }
+    return JSONResponse(body, status_code=200 if ready else 503)
+
+
+@app.get("/metrics")
+async def metrics():
+    """Prometheus metrics: requests, stage and LLM latencies, cache hits."""
+    return PlainTextResponse(
+        render_metrics(), media_type="text/plain; version=0.0.4; charset=utf-8"
+    )
+
+
+@app.get("/api/cache/stats")
+async def cache_stats():
+    """Hit/miss statistics of the semantic response cache."""
+    if chatbot.response_cache is None:
+        return {"enabled": False}
+    return {"enabled": True, **chatbot.response_cache.stats()}
+
+
 @app.get("/api/chat")
-async def chat_get_endpoint(message: str):
+async def chat_get_endpoint(
+    message: str,
+    response: Response,
+    session_id: Optional[str] = None,
+    x_session_id: Optional[str] = Header(default=None),
+):
+    session_id = _session_id(x_session_id or session_id)
+    response.headers[SESSION_HEADER] = session_id
     try:
-        response = await chatbot.send_message(message)
-        return {"response": response}
+        result = await chatbot.send_message(message, session_id)
+        return {"response": result}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
 @app.post("/api/chat", response_model=ChatResponse)
-async def chat_post_endpoint(chat_message: ChatMessage):
+async def chat_post_endpoint(
+    chat_message: ChatMessage,
+    response: Response,
+    x_session_id: Optional[str] = Header(default=None),
+):
+    session_id = _session_id(x_session_id)
+    response.headers[SESSION_HEADER] = session_id
     try:
-        response = await chatbot.send_message(chat_message.message)
-        return ChatResponse(response=response)
+        result = await chatbot.send_message(chat_message.message, session_id)
+        return ChatResponse(response=result)
     except Exception as e:
         return ChatResponse(response="", error=str(e))
  
 
+def _sse_response(message: str, session_id: str) -> StreamingResponse:
+    """Stream exam generation events as server-sent events."""
+
+    async def event_stream():
+        # EventSource cannot read response headers, so repeat the session ID
+        yield f"event: session\ndata: {json.dumps({'session_id': session_id})}\n\n"
+        try:
+            async for event in chatbot.stream_message(message, session_id):
+                yield f"event: {event['event']}\ndata: {json.dumps(event['data'])}\n\n"
+        except Exception as e:
+            logger.error(f"Streaming chat failed: {e}")
+            yield f"event: error\ndata: {json.dumps({'error': str(e)})}\n\n"
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        # Disable caching and proxy buffering so events arrive immediately
+        headers={
+            "Cache-Control": "no-cache",
+            "X-Accel-Buffering": "no",
+            SESSION_HEADER: session_id,
+        },
+    )
+
+
+@app.get("/api/chat/stream")
+async def chat_stream_get_endpoint(
+    message: str,
+    session_id: Optional[str] = None,
+    x_session_id: Optional[str] = Header(default=None),
+):
+    """SSE variant of ``GET /api/chat`` (usable with ``EventSource``).
+
+    ``EventSource`` cannot send headers, so the session ID may also be
+    passed as the ``session_id`` query parameter.
+    """
+    return _sse_response(message, _session_id(x_session_id or session_id))
+
+
+@app.post("/api/chat/stream")
+async def chat_stream_post_endpoint(
+    chat_message: ChatMessage, x_session_id: Optional[str] = Header(default=None)
+):
+    """SSE variant of ``POST /api/chat``."""
+    return _sse_response(chat_message.message, _session_id(x_session_id))
+
+
 @app.post("/api/clarify", response_model=ClarificationResponse)
 async def clarify_endpoint(clarification_request: ClarificationRequest):
     try:
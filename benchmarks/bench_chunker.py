@@ -0,0 +1,75 @@
+"""
+Micro-benchmark: chunking throughput with the legacy per-probe token length
+function versus the shared cached :class:`TokenCounter`.
+
+    python -m benchmarks.bench_chunker --files 20 --chunk-type RecursiveCharacterTextSplitter
+"""
+
+import argparse
+
+import tiktoken
+
+from benchmarks.common import (
+    largest_parsed_files,
+    load_bench_config,
+    read_parsed_text,
+    timed,
+    write_results,
+)
+from chatbot.rag.chunking.chunker import Chunker
+from chatbot.rag.chunking.token_counter import get_token_counter
+
+
+def legacy_length(text: str) -> int:
+    """Length function used before the shared token counter."""
+    return len(tiktoken.encoding_for_model("gpt-4").encode(text))
+
+
+def run(chunker: Chunker, texts):
+    n_chunks = 0
+    for text in texts:
+        n_chunks += len(chunker.chunk(text))
+    return n_chunks
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--files", type=int, default=20)
+    parser.add_argument("--chunk-type", default="RecursiveCharacterTextSplitter")
+    parser.add_argument("--output", default=None, help="Write results as JSON")
+    args = parser.parse_args()
+
+    config = load_bench_config(chunking={"chunk_type": args.chunk_type})
+    texts = [read_parsed_text(path) for path in largest_parsed_files(args.files)]
+
+    # Before: resolve the encoding and re-encode on every length probe
+    before = Chunker(config)
+    for splitter in (before.splitter, before.recursive_splitter):
+        if hasattr(splitter, "_length_function"):
+            splitter._length_function = legacy_length
+    before.token_counter.count_batch = lambda texts: [legacy_length(t) for t in texts]
+
+    # After: a cold shared counter
+    get_token_counter.cache_clear()
+    after = Chunker(config)
+
+    results = {"files": len(texts), "chunk_type": args.chunk_type}
+    for label, chunker in (("before", before), ("after", after)):
+        n_chunks, seconds = timed(run, chunker, texts)
+        results[label] = {
+            "chunks": n_chunks,
+            "seconds": round(seconds, 4),
+            "chunks_per_sec": round(n_chunks / seconds, 1) if seconds else None,
+        }
+        print(f"{label:>6}: {n_chunks} chunks in {seconds:.3f}s "
+              f"({results[label]['chunks_per_sec']} chunks/sec)")
+
+    counter = after.token_counter
+    results["after"]["cache_hits"] = counter.hits
+    results["after"]["cache_misses"] = counter.misses
+    if args.output:
+        write_results(args.output, "chunker", results)
+
+
+if __name__ == "__main__":
+    main()
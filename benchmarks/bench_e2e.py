@@ -0,0 +1,241 @@
+"""
+End-to-end benchmark against the in-repo fakes (no OpenAI or Azure calls, and
+no tiktoken downloads).
+
+For every corpus size it indexes synthetic PDFs through the full pipeline,
+then measures search throughput and chat latency on the resulting index:
+
+    python -m benchmarks.bench_e2e --sizes 10 50 --llm-ms 800 --llm-p95-ms 2000 \\
+        --output benchmarks/results/e2e.json
+
+Reported: chunks/sec for indexing, queries/sec and latency percentiles for
+``VectorStore.search`` and p50/p95/p99 for ``ExamQuestionAgent.send_message``.
+Exits with a non-zero status when a file fails to index or nothing is indexed.
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import sys
+import tempfile
+import time
+from typing import Awaitable, Callable, Dict, List
+
+import numpy as np
+
+from benchmarks.common import load_bench_config, write_results
+from benchmarks.fakes import (
+    TOPICS,
+    FakeChatOpenAI,
+    FakeDocumentAnalysisClient,
+    FakeEmbeddings,
+    Latency,
+    install_fake_encoding,
+    synthetic_exam_text,
+    synthetic_pdf,
+)
+from chatbot.chatbot import ExamQuestionAgent
+from chatbot.rag.exam_data_pipeline import ExamDataPipeline
+from chatbot.rag.parsing.pdf_parser import PDFParser
+from chatbot.rag.vector_store import VectorStore
+
+# At import time: the spawned chunking workers re-import this module, so they
+# count tokens with the fake encoding too
+install_fake_encoding()
+
+
+def percentiles(samples: List[float]) -> Dict[str, float]:
+    """p50/p95/p99 and mean of *samples* (seconds), in milliseconds."""
+    ms = np.asarray(samples) * 1000.0
+    return {
+        "p50_ms": round(float(np.percentile(ms, 50)), 2),
+        "p95_ms": round(float(np.percentile(ms, 95)), 2),
+        "p99_ms": round(float(np.percentile(ms, 99)), 2),
+        "mean_ms": round(float(ms.mean()), 2),
+    }
+
+
+async def run_load(
+    fn: Callable[[int], Awaitable[object]], requests: int, concurrency: int
+) -> Dict[str, float]:
+    """Call ``fn(i)`` *requests* times with *concurrency* calls in flight."""
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies: List[float] = []
+
+    async def one(i: int) -> None:
+        async with semaphore:
+            start = time.perf_counter()
+            await fn(i)
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(requests)))
+    elapsed = time.perf_counter() - start
+    return {
+        "requests": requests,
+        "concurrency": concurrency,
+        "seconds": round(elapsed, 4),
+        "per_sec": round(requests / elapsed, 2) if elapsed else None,
+        **percentiles(latencies),
+    }
+
+
+def write_corpus(
+    exams_dir: str, files: int, pages: int, scanned_ratio: float, seed: int
+) -> None:
+    """Write *files* PDFs with a text layer, except on the "scanned" pages."""
+    rng = random.Random(seed)
+    os.makedirs(exams_dir, exist_ok=True)
+    for i in range(files):
+        texts = synthetic_exam_text(rng.randint(0, 10**9), pages=pages)
+        data = synthetic_pdf([
+            None if rng.random() < scanned_ratio else text for text in texts
+        ])
+        with open(os.path.join(exams_dir, f"exam_{i:05d}.pdf"), "wb") as f:
+            f.write(data)
+
+
+def queries(n: int, seed: int) -> List[str]:
+    rng = random.Random(seed)
+    subjects = list(TOPICS)
+    result = []
+    for i in range(n):
+        subject = rng.choice(subjects)
+        result.append(f"{subject} exercises on {rng.choice(TOPICS[subject])} #{i}")
+    return result
+
+
+async def bench_size(args, files: int) -> Dict[str, object]:
+    with tempfile.TemporaryDirectory(prefix="edumind-bench-") as tmp:
+        exams_dir = os.path.join(tmp, "exams")
+        write_corpus(exams_dir, files, args.pages, args.scanned_ratio, args.seed)
+        config = load_bench_config(
+            exams_path=exams_dir,
+            force_reload=False,
+            index_on_startup=False,
+            vector_store={
+                "persist_directory": os.path.join(tmp, "index"),
+                "embedding_cache_path": "",
+                "backend": args.backend,
+            },
+            response_cache={"enabled": False},
+            parsing={
+                "cache_path": os.path.join(tmp, "pdf_pages.sqlite"),
+                "local_text_layer": not args.no_text_layer,
+            },
+            pipeline={"mode": args.mode},
+        )
+
+        llm = FakeChatOpenAI(
+            latency=Latency(args.llm_ms, args.llm_p95_ms),
+            token_latency=Latency(args.token_ms),
+            seed=args.seed,
+        )
+        embeddings = FakeEmbeddings(
+            size=args.dim, latency=Latency(args.embed_ms, args.embed_p95_ms), seed=args.seed
+        )
+        azure = FakeDocumentAnalysisClient(
+            latency=Latency(args.azure_ms, args.azure_p95_ms), seed=args.seed
+        )
+        vector_store = VectorStore(config, llm=llm, embeddings=embeddings)
+        pipeline = ExamDataPipeline(
+            config,
+            vector_store=vector_store,
+            pdf_parser=PDFParser(config, azure_client=azure),
+            output_dir=tmp,
+        )
+
+        # ── Indexing ─────────────────────────────────────────────────
+        start = time.perf_counter()
+        await pipeline.aprocess_exam_files()
+        seconds = time.perf_counter() - start
+        if pipeline.progress["state"] != "done":
+            raise RuntimeError(
+                f"Indexing {pipeline.progress['state']}: {pipeline.progress['error']} "
+                f"{pipeline.progress['failed_files']}"
+            )
+        chunks = vector_store.count()
+        if not chunks:
+            raise RuntimeError(f"Indexing {files} files produced no chunks")
+        indexing = {
+            "files": files,
+            "chunks": chunks,
+            "azure_requests": azure.requests,
+            "azure_pages": azure.pages_analysed,
+            "seconds": round(seconds, 4),
+            "files_per_sec": round(files / seconds, 2),
+            "chunks_per_sec": round(chunks / seconds, 2),
+            "writes": vector_store.writer.stats(),
+        }
+        print(f"[{files} files] indexing: {chunks} chunks in {seconds:.2f}s "
+              f"({indexing['chunks_per_sec']} chunks/sec)")
+        writes = indexing["writes"]
+        print(f"[{files} files] writes: {writes['documents']} documents in "
+              f"{writes['commits']} commits ({writes['docs_per_sec']} documents/sec)")
+
+        # ── Search ───────────────────────────────────────────────────
+        search_queries = queries(args.search_requests, args.seed)
+        search = await run_load(
+            lambda i: vector_store.search(search_queries[i], k=5),
+            args.search_requests,
+            args.concurrency,
+        )
+        print(f"[{files} files] search: {search['per_sec']} queries/sec, "
+              f"p95 {search['p95_ms']} ms")
+
+        # ── Chat ─────────────────────────────────────────────────────
+        agent = ExamQuestionAgent(
+            config, data_pipeline=pipeline, llm=llm, vector_store=vector_store
+        )
+        chat_messages = [f"Make me a {q}" for q in queries(args.chat_requests, args.seed + 1)]
+        chat = await run_load(
+            lambda i: agent.send_message(chat_messages[i]),
+            args.chat_requests,
+            args.concurrency,
+        )
+        print(f"[{files} files] chat: p50 {chat['p50_ms']} ms, p95 {chat['p95_ms']} ms, "
+              f"p99 {chat['p99_ms']} ms")
+
+        return {"files": files, "indexing": indexing, "search": search, "chat": chat}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 50])
+    parser.add_argument("--backend", default="chroma", choices=["chroma", "flat"])
+    parser.add_argument("--mode", default="staged", choices=["staged", "streaming"])
+    parser.add_argument("--pages", type=int, default=3, help="Pages per synthetic PDF")
+    parser.add_argument("--scanned-ratio", type=float, default=0.2,
+                        help="Share of pages without a text layer")
+    parser.add_argument("--no-text-layer", action="store_true",
+                        help="Send every page to (fake) Azure")
+    parser.add_argument("--dim", type=int, default=1536, help="Embedding size")
+    parser.add_argument("--llm-ms", type=float, default=0.0, help="Median LLM call latency")
+    parser.add_argument("--llm-p95-ms", type=float, default=None)
+    parser.add_argument("--token-ms", type=float, default=0.0, help="Median per streamed piece")
+    parser.add_argument("--embed-ms", type=float, default=0.0, help="Median embedding call latency")
+    parser.add_argument("--embed-p95-ms", type=float, default=None)
+    parser.add_argument("--azure-ms", type=float, default=0.0, help="Median document analysis latency")
+    parser.add_argument("--azure-p95-ms", type=float, default=None)
+    parser.add_argument("--search-requests", type=int, default=200)
+    parser.add_argument("--chat-requests", type=int, default=50)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default=None, help="Write results as JSON")
+    args = parser.parse_args()
+
+    try:
+        sizes = [asyncio.run(bench_size(args, files)) for files in args.sizes]
+    except RuntimeError as exc:
+        sys.exit(f"Benchmark failed: {exc}")
+    results = {
+        "settings": {k: v for k, v in vars(args).items() if k != "output"},
+        "sizes": sizes,
+    }
+    if args.output:
+        write_results(args.output, "e2e", results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+"""
+Micro-benchmark: Markdown conversion and Markdown-header chunking of the
+largest parsed exams, string-building converter versus the streaming one.
+
+Several files are concatenated into one "exam book" (``--repeat`` copies
+each) to reach the multi-megabyte documents seen in production:
+
+    python -m benchmarks.bench_markdown --files 5 --repeat 20
+"""
+
+import argparse
+import re
+import tracemalloc
+
+from benchmarks.common import (
+    PARSED_DIR,
+    largest_parsed_files,
+    load_bench_config,
+    read_parsed_text,
+    timed,
+    write_results,
+)
+from chatbot.rag.chunking.chunker import Chunker
+
+
+def legacy_convert_to_markdown(text: str) -> str:
+    """``Chunker.convert_to_markdown`` before the streaming converter."""
+    pages = text.split("\n\n")
+    all_text = []
+    for page_idx, page_text in enumerate(pages):
+        markdown_text = f"# Page {page_idx + 1}\n"
+        for line in page_text.split("\n"):
+            line = line.strip()
+            if not line:
+                continue
+            if len(line) < 50 or line.isupper():
+                markdown_text += f"## {line}\n"
+            elif re.match(r"(\S+\s+\S+\s+\S+)+", line):
+                cells = [cell.strip() for cell in line.split()]
+                if len(cells) >= 2:
+                    markdown_text += "## Table\n"
+                    markdown_text += "| " + " | ".join(cells) + " |\n"
+                    markdown_text += "| " + " | ".join(["---"] * len(cells)) + " |\n"
+                    markdown_text += "\n"
+            elif re.search(r"\\\[|\\\(|\\\{|\\\w+", line):
+                markdown_text += f"```latex\n{line}\n```\n"
+            else:
+                markdown_text += f"{line}\n"
+        markdown_text += "\n"
+        all_text.append(markdown_text.strip())
+    return "\n\n".join(all_text)
+
+
+def legacy_chunk(chunker: Chunker, text: str):
+    """Markdown chunking of the whole converted document at once."""
+    return [chunk for chunk, _ in chunker._split_markdown(legacy_convert_to_markdown(text))]
+
+
+def peak_megabytes(fn) -> float:
+    """Peak traced memory allocated while running *fn*, in MB."""
+    tracemalloc.start()
+    try:
+        fn()
+        return tracemalloc.get_traced_memory()[1] / 1e6
+    finally:
+        tracemalloc.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--files", type=int, default=5)
+    parser.add_argument("--repeat", type=int, default=10, help="Copies of each file per book")
+    parser.add_argument("--parsed-dir", default=PARSED_DIR)
+    parser.add_argument("--output", default=None, help="Write results as JSON")
+    args = parser.parse_args()
+
+    paths = largest_parsed_files(args.files, args.parsed_dir)
+    if not paths:
+        parser.error(f"no parsed exams in {args.parsed_dir}; index some exams first")
+    books = ["\n\n".join([read_parsed_text(path)] * args.repeat) for path in paths]
+    megabytes = sum(len(book.encode("utf-8")) for book in books) / 1e6
+
+    config = load_bench_config(chunking={"chunk_type": "MarkdownHeaderTextSplitter"})
+    chunker = Chunker(config)
+    results = {"books": len(books), "megabytes": round(megabytes, 2)}
+
+    before, before_s = timed(lambda: [legacy_convert_to_markdown(book) for book in books])
+    after, after_s = timed(lambda: [chunker.convert_to_markdown(book) for book in books])
+    if before != after:
+        raise SystemExit("Streaming converter output differs from the legacy converter")
+    results["convert"] = {"before_seconds": round(before_s, 4), "after_seconds": round(after_s, 4)}
+    print(f"convert: {before_s:.3f}s → {after_s:.3f}s for {megabytes:.1f} MB")
+
+    before, before_s = timed(lambda: [legacy_chunk(chunker, book) for book in books])
+    after, after_s = timed(lambda: [chunker.chunk(book) for book in books])
+    if before != after:
+        raise SystemExit("Streaming Markdown chunks differ from the legacy chunks")
+    n_chunks = sum(len(chunks) for chunks in after)
+    results["chunk"] = {
+        "chunks": n_chunks,
+        "before_seconds": round(before_s, 4),
+        "after_seconds": round(after_s, 4),
+    }
+    print(f"chunk:   {before_s:.3f}s → {after_s:.3f}s ({n_chunks} chunks)")
+
+    # Peak memory allocated while chunking the largest book
+    book = max(books, key=len)
+    before_mb = peak_megabytes(lambda: legacy_chunk(chunker, book))
+    after_mb = peak_megabytes(lambda: chunker.chunk(book))
+    results["chunk"]["before_peak_mb"] = round(before_mb, 2)
+    results["chunk"]["after_peak_mb"] = round(after_mb, 2)
+    print(f"peak:    {before_mb:.1f} MB → {after_mb:.1f} MB for a {len(book) / 1e6:.1f} MB book")
+
+    if args.output:
+        write_results(args.output, "markdown", results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""
+Helpers shared by the benchmark scripts.
+
+Benchmarks are run from the repository root, e.g.::
+
+    python -m benchmarks.bench_chunker --files 20
+"""
+
+import json
+import os
+import platform
+import subprocess
+import time
+from typing import Any, Dict, List
+
+import yaml
+
+from chatbot.rag.parsing.document import document_text, read_parsed_pages
+from config_loader import AppConfig
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PARSED_DIR = os.path.join(ROOT_DIR, "chatbot", "rag", "parsing", "parsed_data")
+
+
+def load_bench_config(**overrides: Any) -> AppConfig:
+    """Load ``config.yaml`` without requiring real API keys."""
+    with open(os.path.join(ROOT_DIR, "config.yaml"), "r") as f:
+        raw = yaml.safe_load(f)
+    raw["api"]["openai_api_key"] = raw["api"].get("openai_api_key") or "unused"
+    for section, values in overrides.items():
+        if isinstance(values, dict):
+            raw.setdefault(section, {}).update(values)
+        else:
+            raw[section] = values
+    return AppConfig(**raw)
+
+
+def largest_parsed_files(n: int, parsed_dir: str = PARSED_DIR) -> List[str]:
+    """Return the paths of the *n* largest parsed exam files."""
+    paths = [
+        os.path.join(parsed_dir, fname)
+        for fname in os.listdir(parsed_dir)
+        if fname.endswith((".parsed.jsonl", ".parsed.txt"))
+    ]
+    return sorted(paths, key=os.path.getsize, reverse=True)[:n]
+
+
+def read_parsed_text(path: str) -> str:
+    """Document text of a parsed exam file, in either parsed format."""
+    return document_text(read_parsed_pages(path))
+
+
+def timed(fn, *args, **kwargs):
+    """Run ``fn(*args, **kwargs)`` and return ``(result, seconds)``."""
+    start = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+def write_results(path: str, name: str, results: Dict[str, Any]) -> None:
+    """Write *results* as JSON together with run metadata."""
+    try:
+        commit = subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT_DIR, text=True
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    payload = {
+        "benchmark": name,
+        "commit": commit,
+        "python": platform.python_version(),
+        "timestamp": time.time(),
+        "results": results,
+    }
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(payload, f, indent=2)
@@ -0,0 +1,414 @@
+"""
+Deterministic stand-ins for the paid services, with simulated latency.
+
+* :class:`FakeChatOpenAI` answers every prompt the agent and the vector store
+  send with a canned, well-formed response (metadata JSON, exam plan JSON,
+  exercise text, ...), chosen by recognising the prompt.
+* :class:`FakeEmbeddings` returns unit vectors derived from a hash of the
+  text, so equal texts always get equal vectors.
+* :class:`FakeDocumentAnalysisClient` mimics ``begin_analyze_document`` of the
+  async Azure client and returns synthetic exam pages.
+* :class:`FakeEncoding` replaces tiktoken's encodings (see
+  :func:`install_fake_encoding`), which are otherwise downloaded on first use.
+
+Every fake takes a :class:`Latency` per call; the chat model also takes one
+per streamed token.  Latencies are drawn from seeded generators, so two runs
+with the same settings see the same delays.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+import math
+import random
+import re
+import threading
+import time
+from dataclasses import dataclass
+from types import SimpleNamespace
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from pydantic import ConfigDict, PrivateAttr
+
+from chatbot.rag.parsing.pdf_parser import count_pdf_pages
+
+SUBJECTS = ["Physics", "Chemistry", "Mathematics", "Biology", "History", "Geography"]
+BRANCHES = [
+    "general science",
+    "life science",
+    "arts and humanities",
+    "social and economic sciences",
+    "middle school certificate",
+]
+TOPICS = {
+    "Physics": ["mechanical energy", "electromagnetic induction", "RC circuits"],
+    "Chemistry": ["acid-base titration", "reaction kinetics", "esterification"],
+    "Mathematics": ["complex numbers", "sequences", "probability"],
+    "Biology": ["immunity", "genetics", "nervous communication"],
+    "History": ["the First World War", "the independence of Lebanon"],
+    "Geography": ["population growth", "water resources"],
+}
+
+
+# ---------------------------------------------------------------------- #
+# LATENCY                                                                #
+# ---------------------------------------------------------------------- #
+
+@dataclass
+class Latency:
+    """Log-normal delay given by its median and 95th percentile (ms)."""
+
+    median_ms: float = 0.0
+    p95_ms: Optional[float] = None
+
+    def sample(self, rng: random.Random) -> float:
+        """One delay, in seconds."""
+        if self.median_ms <= 0:
+            return 0.0
+        p95 = self.p95_ms or self.median_ms
+        sigma = math.log(max(p95, self.median_ms) / self.median_ms) / 1.645
+        return self.median_ms * math.exp(sigma * rng.gauss(0.0, 1.0)) / 1000.0
+
+
+class _Clock:
+    """Seeded, thread-safe source of :class:`Latency` samples."""
+
+    def __init__(self, seed: int):
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def delay(self, latency: Latency) -> float:
+        with self._lock:
+            return latency.sample(self._rng)
+
+
+def _seed(text: str) -> int:
+    return int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:8], "little")
+
+
+# ---------------------------------------------------------------------- #
+# CANNED CONTENT                                                         #
+# ---------------------------------------------------------------------- #
+
+def synthetic_exam_text(seed: int, pages: int = 3, lines_per_page: int = 25) -> List[str]:
+    """Pages of exam-like text, deterministic for a given *seed*."""
+    rng = random.Random(seed)
+    subject = rng.choice(SUBJECTS)
+    result = []
+    for page in range(pages):
+        lines = [f"{subject} exam – session {2000 + seed % 25} – page {page + 1}"]
+        for number in range(1, lines_per_page):
+            topic = rng.choice(TOPICS[subject])
+            points = rng.randint(1, 4)
+            lines.append(
+                f"Exercise {page + 1}.{number} ({points} points) on {topic}: "
+                f"show that the result holds for n = {rng.randint(2, 99)} and "
+                f"justify each step of the reasoning."
+            )
+        result.append("\n".join(lines))
+    return result
+
+
+def canned_response(prompt: str, exercises: int = 3) -> str:
+    """A well-formed answer to any prompt sent by the agent or vector store."""
+    rng = random.Random(_seed(prompt))
+    subject = rng.choice(SUBJECTS)
+    if "Extract the following JSON" in prompt:
+        return json.dumps({
+            "branch": rng.sample(BRANCHES, rng.randint(1, 2)),
+            "subject": subject,
+            "title": f"{subject} exercise on {rng.choice(TOPICS[subject])}",
+        })
+    if "structured exam plan" in prompt:
+        return json.dumps({"exercises": {
+            str(i): {
+                "topic": rng.choice(TOPICS[subject]),
+                "grade": "12",
+                "description": f"{subject} exercise {i}",
+                "general_question": "Answer the following questions.",
+                "subquestions": [f"Question {i}.{j}" for j in range(1, 4)],
+            }
+            for i in range(1, exercises + 1)
+        }})
+    if "filter the exercises" in prompt:
+        return "\n".join(synthetic_exam_text(rng.randint(0, 10**6), pages=1, lines_per_page=6))
+    if "generating a single exercise" in prompt:
+        return "\n".join(
+            f"{j}. {line}" for j, line in enumerate(
+                synthetic_exam_text(rng.randint(0, 10**6), pages=1, lines_per_page=5)[0]
+                .splitlines()[1:], 1
+            )
+        )
+    if "reformat the exam" in prompt:
+        return "# Exam\n\n" + prompt[-2000:]
+    if "key information is missing" in prompt:
+        return "CLEAR"
+    return "What would you like to practise next?"
+
+
+def _pdf_string(text: str) -> str:
+    text = text.encode("ascii", "replace").decode("ascii")
+    return "(" + text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)") + ")"
+
+
+def synthetic_pdf(pages: List[Optional[str]]) -> bytes:
+    """A minimal PDF with one page per item: text drawn in Helvetica, or blank for None.
+
+    Blank pages stand in for scanned ones (no text layer).
+    """
+    objects = [
+        "<< /Type /Catalog /Pages 2 0 R >>",
+        None,  # page tree, filled in below
+        "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    kids = []
+    for text in pages:
+        lines = (text or "").splitlines()
+        stream = "BT /F1 9 Tf 11 TL 40 800 Td " + " ".join(
+            f"{_pdf_string(line)} Tj T*" for line in lines
+        ) + " ET"
+        objects.append(f"<< /Length {len(stream)} >>\nstream\n{stream}\nendstream")
+        objects.append(
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] "
+            f"/Resources << /Font << /F1 3 0 R >> >> /Contents {len(objects)} 0 R >>"
+        )
+        kids.append(f"{len(objects)} 0 R")
+    objects[1] = f"<< /Type /Pages /Kids [{' '.join(kids)}] /Count {len(kids)} >>"
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, 1):
+        offsets.append(len(out))
+        out += f"{number} 0 obj\n{body}\nendobj\n".encode("latin-1")
+    xref = len(out)
+    out += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode()
+    for offset in offsets:
+        out += f"{offset:010d} 00000 n \n".encode()
+    out += (
+        f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\n"
+        f"startxref\n{xref}\n%%EOF\n"
+    ).encode()
+    return bytes(out)
+
+
+# ---------------------------------------------------------------------- #
+# CHAT MODEL                                                             #
+# ---------------------------------------------------------------------- #
+
+class FakeChatOpenAI(BaseChatModel):
+    """Drop-in for ``ChatOpenAI`` returning :func:`canned_response`."""
+
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    latency: Latency = Latency()
+    token_latency: Latency = Latency()
+    exercises: int = 3
+    seed: int = 0
+    _clock: _Clock = PrivateAttr()
+
+    def __init__(self, **kwargs: Any):
+        super().__init__(**kwargs)
+        self._clock = _Clock(self.seed)
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-chat-openai"
+
+    def _answer(self, messages: List[BaseMessage]) -> str:
+        return canned_response(str(messages[-1].content), self.exercises)
+
+    @staticmethod
+    def _pieces(text: str) -> List[str]:
+        return [text[i:i + 16] for i in range(0, len(text), 16)]
+
+    def _result(self, text: str) -> ChatResult:
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=text))])
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        time.sleep(self._clock.delay(self.latency))
+        return self._result(self._answer(messages))
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        await asyncio.sleep(self._clock.delay(self.latency))
+        return self._result(self._answer(messages))
+
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs) -> Iterator[ChatGenerationChunk]:
+        time.sleep(self._clock.delay(self.latency))
+        for piece in self._pieces(self._answer(messages)):
+            time.sleep(self._clock.delay(self.token_latency))
+            yield ChatGenerationChunk(message=AIMessageChunk(content=piece))
+
+    async def _astream(
+        self, messages, stop=None, run_manager=None, **kwargs
+    ) -> AsyncIterator[ChatGenerationChunk]:
+        await asyncio.sleep(self._clock.delay(self.latency))
+        for piece in self._pieces(self._answer(messages)):
+            await asyncio.sleep(self._clock.delay(self.token_latency))
+            yield ChatGenerationChunk(message=AIMessageChunk(content=piece))
+
+
+# ---------------------------------------------------------------------- #
+# EMBEDDINGS                                                             #
+# ---------------------------------------------------------------------- #
+
+class FakeEmbeddings(Embeddings):
+    """Drop-in for ``OpenAIEmbeddings``: hash-seeded unit vectors."""
+
+    def __init__(self, size: int = 1536, latency: Latency = Latency(), seed: int = 0):
+        self.size = size
+        self.latency = latency
+        self.model = f"fake-{size}"
+        self._clock = _Clock(seed)
+
+    def _vectors(self, texts: List[str]) -> List[List[float]]:
+        vectors = np.stack([
+            np.random.default_rng(_seed(text)).standard_normal(self.size, dtype=np.float32)
+            for text in texts
+        ]) if texts else np.zeros((0, self.size), dtype=np.float32)
+        vectors /= np.linalg.norm(vectors, axis=1, keepdims=True).clip(min=1e-12)
+        return vectors.tolist()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        time.sleep(self._clock.delay(self.latency))
+        return self._vectors(texts)
+
+    def embed_query(self, text: str) -> List[float]:
+        time.sleep(self._clock.delay(self.latency))
+        return self._vectors([text])[0]
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        await asyncio.sleep(self._clock.delay(self.latency))
+        return self._vectors(texts)
+
+    async def aembed_query(self, text: str) -> List[float]:
+        await asyncio.sleep(self._clock.delay(self.latency))
+        return self._vectors([text])[0]
+
+
+# ---------------------------------------------------------------------- #
+# TOKENIZER                                                              #
+# ---------------------------------------------------------------------- #
+
+class FakeEncoding:
+    """Offline stand-in for a tiktoken encoding.
+
+    Every word, run of punctuation or run of whitespace is one token (a word
+    keeps its leading space, as in OpenAI's encodings), which is close enough
+    to real counts for chunk sizes and prompt budgets.
+    """
+
+    name = "fake"
+    _PIECES = re.compile(r" ?\w+| ?[^\w\s]+|\s+")
+
+    def __init__(self):
+        self._ids: Dict[str, int] = {}
+        self._pieces: List[str] = []
+        self._lock = threading.Lock()
+
+    def encode_ordinary(self, text: str) -> List[int]:
+        pieces = self._PIECES.findall(text)
+        with self._lock:
+            for piece in pieces:
+                if piece not in self._ids:
+                    self._ids[piece] = len(self._pieces)
+                    self._pieces.append(piece)
+            return [self._ids[piece] for piece in pieces]
+
+    def encode(self, text: str, **kwargs: Any) -> List[int]:
+        return self.encode_ordinary(text)
+
+    def encode_ordinary_batch(self, texts: Sequence[str], num_threads: int = 8) -> List[List[int]]:
+        return [self.encode_ordinary(text) for text in texts]
+
+    def encode_batch(self, texts: Sequence[str], **kwargs: Any) -> List[List[int]]:
+        return self.encode_ordinary_batch(texts)
+
+    def decode(self, tokens: Sequence[int]) -> str:
+        with self._lock:
+            return "".join(self._pieces[token] for token in tokens)
+
+
+def install_fake_encoding() -> FakeEncoding:
+    """Serve every tiktoken encoding from one :class:`FakeEncoding`.
+
+    Must run before the first token is counted, in every process that counts
+    tokens (the chunking workers are spawned processes).
+    """
+    import tiktoken
+
+    from chatbot.rag.chunking.token_counter import get_encoding, get_token_counter
+
+    encoding = FakeEncoding()
+    tiktoken.get_encoding = lambda encoding_name: encoding
+    tiktoken.encoding_for_model = lambda model_name: encoding
+    get_encoding.cache_clear()
+    get_token_counter.cache_clear()
+    return encoding
+
+
+# ---------------------------------------------------------------------- #
+# AZURE DOCUMENT INTELLIGENCE                                            #
+# ---------------------------------------------------------------------- #
+
+class _FakePoller:
+    def __init__(self, pages: List[Tuple[int, str]], delay: float):
+        self._pages = pages
+        self._delay = delay
+
+    async def result(self) -> SimpleNamespace:
+        await asyncio.sleep(self._delay)
+        return SimpleNamespace(pages=[
+            SimpleNamespace(
+                page_number=number,
+                lines=[SimpleNamespace(content=line) for line in page.splitlines()],
+            )
+            for number, page in self._pages
+        ])
+
+
+def _page_numbers(pages: Optional[str], count: int) -> List[int]:
+    """Page numbers selected by an Azure ``pages`` argument like ``"1-3,5"``."""
+    if not pages:
+        return list(range(1, count + 1))
+    numbers = []
+    for part in pages.split(","):
+        first, _, last = part.strip().partition("-")
+        numbers.extend(range(int(first), int(last or first) + 1))
+    return [n for n in numbers if n <= count]
+
+
+class FakeDocumentAnalysisClient:
+    """Drop-in for the async ``DocumentAnalysisClient.begin_analyze_document``.
+
+    The synthetic pages are seeded by the document's bytes; documents that
+    pypdf can read get as many pages as they have, others *pages* pages.
+    ``requests`` and ``pages_analysed`` count the work done.
+    """
+
+    def __init__(self, latency: Latency = Latency(), pages: int = 3, seed: int = 0):
+        self.latency = latency
+        self.pages = pages
+        self.requests = 0
+        self.pages_analysed = 0
+        self._clock = _Clock(seed)
+
+    async def begin_analyze_document(
+        self, model_id: str, document: Any, pages: Optional[str] = None, **kwargs: Any
+    ) -> _FakePoller:
+        data = document.read() if hasattr(document, "read") else bytes(document)
+        seed = int.from_bytes(hashlib.sha256(data).digest()[:8], "little")
+        count = count_pdf_pages(data) or self.pages
+        texts = synthetic_exam_text(seed, pages=count)
+        numbers = _page_numbers(pages, count)
+        self.requests += 1
+        self.pages_analysed += len(numbers)
+        return _FakePoller(
+            [(n, texts[n - 1]) for n in numbers], self._clock.delay(self.latency)
+        )
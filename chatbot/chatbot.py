@@ -1,10 +1,14 @@
-from typing import List, Dict, Optional
+from typing import AsyncIterator, List, Dict, Optional
 import json
+import time
 import asyncio  # Ensure this is at the top of your file if not already
 
+import openai
 from langchain_openai import ChatOpenAI
+from langchain_core.documents import Document
+from langchain_core.language_models.chat_models import BaseChatModel
 from langchain_core.messages import (
-    SystemMessage, HumanMessage, BaseMessage
+    AIMessage, SystemMessage, HumanMessage, BaseMessage
 )
 from chatbot.prompts import (
     system_prompt,
@@ -18,6 +22,11 @@ from chatbot.prompts import (
 from chatbot.rag.vector_store import (
     VectorStore
 )
+from chatbot.prompt_builder import PromptBuilder
+from chatbot.rag.rerank import EmbeddingReranker
+from chatbot.response_cache import SemanticResponseCache
+from chatbot.telemetry import LLM_RETRIES, llm_call, observe_llm, span
+from chatbot.session_store import SessionStore, create_session_store
 from config_loader import AppConfig
 from chatbot.rag.exam_data_pipeline import ExamDataPipeline
 from loguru import logger
@@ -41,14 +50,30 @@ class ExamModel(BaseModel):
 class ExamQuestionAgent:
     """An intelligent agent for generating exam questions in a single call."""
 
-    def __init__(self, config: AppConfig, data_pipeline: Optional[ExamDataPipeline] = None):
+    # Errors worth retrying; the client's own retries are disabled so every
+    # attempt is counted in the LLM metrics
+    TRANSIENT_ERRORS = (
+        openai.APIConnectionError,
+        openai.APITimeoutError,
+        openai.RateLimitError,
+        openai.InternalServerError,
+    )
+
+    def __init__(
+        self,
+        config: AppConfig,
+        data_pipeline: Optional[ExamDataPipeline] = None,
+        llm: Optional[BaseChatModel] = None,
+        vector_store: Optional[VectorStore] = None,
+    ):
+        """*llm* and *vector_store* replace the clients built from *config*."""
         # Configuration ----------------------------------------------------
         self.config = config
         self.chat_config = config.chat
         self.llm_config = config.llm
 
         # LLM client -------------------------------------------------------
-        self.llm = ChatOpenAI(
+        self.llm = llm or ChatOpenAI(
             model=self.llm_config.model,
             temperature=self.llm_config.temperature,
             max_tokens=self.llm_config.max_tokens,
@@ -56,45 +81,147 @@ class ExamQuestionAgent:
             frequency_penalty=self.llm_config.frequency_penalty,
             presence_penalty=self.llm_config.presence_penalty,
             api_key=config.api.openai_api_key,
+            max_retries=0,
+        )
+
+        # Prompt assembly within token budgets ----------------------------
+        prompt_config = config.prompt
+        self.prompts = PromptBuilder(
+            self.llm_config.model,
+            context_window=prompt_config.context_window,
+            output_tokens=self.llm_config.max_tokens,
+            context_tokens=prompt_config.context_tokens,
+            section_tokens={
+                "message": prompt_config.message_tokens,
+                "exercise_json": prompt_config.exercise_tokens,
+            },
         )
 
         # Vector store for retrieval --------------------------------------
-        self.vector_store = VectorStore(config)
+        self.vector_store = vector_store or VectorStore(config)
+
+        # Local reranker choosing the context passed to each exercise -----
+        rerank_config = config.rerank
+        self.reranker: Optional[EmbeddingReranker] = (
+            EmbeddingReranker(
+                self.vector_store.embeddings,
+                top_n=rerank_config.top_n,
+                mmr=rerank_config.mmr,
+                mmr_lambda=rerank_config.mmr_lambda,
+            )
+            if rerank_config.enabled
+            else None
+        )
 
-        # Message history (system prompt + conversation turns) -------------
-        self.message_history: List[BaseMessage] = [
-            SystemMessage(content=system_prompt)
-        ]
+        # Semantic response cache -----------------------------------------
+        cache_config = config.response_cache
+        self.response_cache: Optional[SemanticResponseCache] = (
+            SemanticResponseCache(
+                cache_config.path,
+                self.vector_store.embeddings,
+                similarity_threshold=cache_config.similarity_threshold,
+                ttl_seconds=cache_config.ttl_seconds,
+                max_entries=cache_config.max_entries,
+            )
+            if cache_config.enabled
+            else None
+        )
+
+        # Per-session message history (conversation turns only) ----------
+        self.sessions: SessionStore = create_session_store(config)
 
         # Exam data pipeline ----------------------------------------------
-        self.data_pipeline = data_pipeline or ExamDataPipeline(config)
-        logger.info(
-            "Processing and indexing exam files on agent initialisation ..."
+        # Indexing is not run here so the agent is usable immediately against
+        # the existing index; call :py:meth:`index_exam_files` to refresh it.
+        self.data_pipeline = data_pipeline or ExamDataPipeline(
+            config, vector_store=self.vector_store
         )
-        self.data_pipeline.process_exam_files()
 
     # ------------------------------------------------------------------
     # PRIVATE HELPERS
     # ------------------------------------------------------------------
-    def _update_history(self, message: BaseMessage) -> None:
-        """Append *message* and trim history to the configured length."""
-        self.message_history.append(message)
-        max_history = self.chat_config.history_length
-        # Keep the system message plus the last *max_history* turns
-        if len(self.message_history) > max_history + 1:
-            self.message_history = [
-                self.message_history[0],
-                *self.message_history[-max_history:]
-            ]
+    async def _update_history(self, session_id: str, *messages: BaseMessage) -> None:
+        """Append *messages* to the session; it keeps the last turns only."""
+        await self.sessions.append(session_id, *messages)
+
+    async def _get_history(self, session_id: str) -> List[BaseMessage]:
+        """System prompt followed by the session's recent turns."""
+        return [
+            SystemMessage(content=system_prompt),
+            *await self.sessions.history(session_id),
+        ]
+
+    async def _ask(self, prompt_name: str, prompt: str) -> str:
+        """Send *prompt* to the LLM and return the stripped reply.
+
+        Every LLM call of the agent goes through here (or :py:meth:`_stream`),
+        timed as *prompt_name* and retried on transient errors.
+        """
+        with llm_call(prompt_name):
+            for attempt in range(self.llm_config.max_retries + 1):
+                try:
+                    response = await self.llm.agenerate([[HumanMessage(content=prompt)]])
+                    return response.generations[0][0].message.content.strip()
+                except self.TRANSIENT_ERRORS as exc:
+                    if attempt == self.llm_config.max_retries:
+                        raise
+                    await self._backoff(prompt_name, attempt, exc)
+
+    async def _stream(self, prompt_name: str, prompt: str) -> AsyncIterator[str]:
+        """Like :py:meth:`_ask`, yielding the reply as it is generated.
+
+        Only failures before the first piece of text are retried.  The time
+        to that first piece is timed as the ``llm.<prompt_name>.first_token`` stage.
+        """
+        started = time.perf_counter()
+        with span(f"llm.{prompt_name}.first_token"):
+            for attempt in range(self.llm_config.max_retries + 1):
+                stream = self.llm.astream([HumanMessage(content=prompt)])
+                try:
+                    first = await stream.__anext__()
+                    break
+                except StopAsyncIteration:
+                    return
+                except self.TRANSIENT_ERRORS as exc:
+                    if attempt == self.llm_config.max_retries:
+                        raise
+                    await self._backoff(prompt_name, attempt, exc)
+        # No span here: the block below yields to the caller
+        outcome = "error"
+        try:
+            if first.content:
+                yield first.content
+            async for chunk in stream:
+                if chunk.content:
+                    yield chunk.content
+            outcome = "ok"
+        finally:
+            observe_llm(prompt_name, time.perf_counter() - started, outcome)
+
+    async def _backoff(self, prompt_name: str, attempt: int, exc: Exception) -> None:
+        delay = min(0.5 * 2 ** attempt, 8.0)
+        logger.warning(
+            f"[ExamAgent] {prompt_name} failed ({type(exc).__name__}), retrying in {delay:.1f}s"
+        )
+        LLM_RETRIES.inc(prompt=prompt_name)
+        await asyncio.sleep(delay)
+
+    async def _retrieve(self, query: str, k: int = 5) -> List[Document]:
+        """Return the *k* most similar document chunks."""
+        with span("retrieval"):
+            return await self.vector_store.search(query, k=k)
 
     async def _get_relevant_context(self, query: str, k: int = 5) -> str:
         """Return *k* most similar document chunks as a single context string."""
-        relevant_docs = await self.vector_store.search(
-            query, k=k
-        )
-        if not relevant_docs:
-            return ""
+        return self._format_context(await self._retrieve(query, k=k))
+
+    @classmethod
+    def _format_context(cls, relevant_docs: List[Document]) -> str:
+        return "\n\n".join(cls._context_parts(relevant_docs))
 
+    @staticmethod
+    def _context_parts(relevant_docs: List[Document]) -> List[str]:
+        """One formatted block per chunk, in retrieval (relevance) order."""
         context_parts: list[str] = []
         for i, chunk in enumerate(relevant_docs):
             subject = chunk.metadata.get("subject", "Unknown")
@@ -105,64 +232,144 @@ class ExamQuestionAgent:
                 f"{doc}"
                 f"--------------------------------------------------------\n\n"
             )
-        return "\n\n".join(context_parts)
+        return context_parts
 
-    async def _generate_resume_question(self) -> str:
+    async def _generate_resume_question(self, session_id: str) -> str:
         """Craft a concise follow‑up question that naturally continues the session."""
         # Exclude the system prompt and take the last 3 turns
-        recent_messages: list[BaseMessage] = self.message_history[1:][-3:]
+        history = await self._get_history(session_id)
+        recent_messages: list[BaseMessage] = history[1:][-3:]
         if not recent_messages:
             return ""
 
         context_summary = "\n\n".join(
             f"{m.type}: {m.content}" for m in recent_messages
         )
-        resume_prompt_str = resume_prompt.format(context_summary=context_summary)
-        response = await self.llm.agenerate(
-            [[HumanMessage(content=resume_prompt_str)]]
+        resume_prompt_str = self.prompts.render(
+            "resume", resume_prompt, context_summary=context_summary
         )
-        return response.generations[0][0].message.content.strip()
+        return await self._ask("resume", resume_prompt_str)
 
     # ------------------------------------------------------------------
     # PUBLIC API
     # ------------------------------------------------------------------
-    async def send_message(self, message: str) -> str:
+    async def index_exam_files(self) -> None:
+        """Process and index exam files; progress is in ``data_pipeline.progress``."""
+        logger.info("Processing and indexing exam files ...")
+        await self.data_pipeline.aprocess_exam_files()
+
+    def is_ready(self) -> bool:
+        """True once the search indexes are loaded and not empty."""
+        if not self.vector_store.indexes_loaded:
+            return False
+        if self.data_pipeline.progress["state"] == "done":
+            return True
+        return self.vector_store.count() > 0
+
+    async def send_message(self, message: str, session_id: Optional[str] = None) -> str:
         """Processes user request, generates structured exam content as formatted text."""
+        exam_doc = ""
+        async for event in self.stream_message(message, session_id):
+            if event["event"] == "done":
+                exam_doc = event["data"]["response"]
+        return exam_doc
+
+    async def stream_message(
+        self, message: str, session_id: Optional[str] = None
+    ) -> AsyncIterator[dict]:
+        """Generate an exam like :py:meth:`send_message`, yielding progress events.
+
+        With a *session_id* the request and the generated exam are recorded
+        in that session's history.
+
+        Events are ``{"event": <name>, "data": <dict>}`` with names:
+        ``stage`` (a new step starts), ``plan`` (exercise keys, in order),
+        ``exercise`` (one exercise, as soon as it is generated), ``token``
+        (a piece of the compiled document) and finally ``done``.  A response
+        cache hit skips straight to ``done`` with ``"cached": True``.
+        """
+        if self.response_cache:
+            with span("response_cache"):
+                # Only answers for the same subject, branches and index qualify
+                cache_scope = await self.vector_store.query_scope(message)
+                cached = await self.response_cache.get(message, cache_scope)
+            if cached is not None:
+                logger.info("[ExamAgent] Serving exam from response cache.")
+                if session_id:
+                    await self._update_history(
+                        session_id, HumanMessage(content=message), AIMessage(content=cached)
+                    )
+                yield {"event": "done", "data": {"response": cached, "cached": True}}
+                return
+
         logger.info(
             "[ExamAgent] Retrieving relevant context for user message..."
         )
-        context = await self._get_relevant_context(message)
+        yield {"event": "stage", "data": {"stage": "retrieval"}}
+        docs = await self._retrieve(message)
 
         logger.info(
             "[ExamAgent] Parsing exam structure into exercises"
         )
-        exercises = await self._parse_exam_exercises(message, context)
+        yield {"event": "stage", "data": {"stage": "planning"}}
+        with span("planning"):
+            exercises = await self._parse_exam_exercises(message, docs)
+        keys = list(exercises.exercises.keys())
+        yield {"event": "plan", "data": {"exercises": keys}}
+
+        # Fill all exercises concurrently, reporting each as it finishes
+        yield {"event": "stage", "data": {"stage": "exercises"}}
+
+        async def _fill(key: str, exercise: ExerciseModel):
+            with span("fill_exercise"):
+                return key, await self._fill_exam_exercise(exercise, docs)
 
-        # Prepare tasks for all exercises
         tasks = [
-            self._fill_exam_exercise(exercise, context)
+            asyncio.create_task(_fill(key, exercise))
             for key, exercise in exercises.exercises.items()
         ]
-        keys = list(exercises.exercises.keys())
-
-        # Run all tasks concurrently
-        results = await asyncio.gather(*tasks)
-
-        # Map results back to their keys
-        questions = dict(zip(keys, results))
+        results: Dict[str, str] = {}
+        try:
+            for finished in asyncio.as_completed(tasks):
+                key, content = await finished
+                results[key] = content
+                yield {
+                    "event": "exercise",
+                    "data": {"key": key, "index": keys.index(key) + 1, "content": content},
+                }
+        finally:
+            # The consumer may stop early (e.g. client disconnect)
+            for task in tasks:
+                task.cancel()
+
+        # Map results back to their keys, in plan order
+        questions = {key: results[key] for key in keys}
 
         logger.info(
             "[ExamAgent] Compiling structured exam document"
         )
-        exam_doc = await self._compile_exam_document(
-            context, message, questions
-        )
+        yield {"event": "stage", "data": {"stage": "compiling"}}
+        parts: List[str] = []
+        async for token in self._stream_exam_document(questions):
+            parts.append(token)
+            yield {"event": "token", "data": {"text": token}}
+        exam_doc = "".join(parts).strip()
+        logger.info(f"[ExamAgent] Compiled exam document content: {exam_doc}")
+
         logger.info(
             "[ExamAgent] Exam generation complete."
         )
-        return exam_doc
+        if self.response_cache and exam_doc:
+            await self.response_cache.set(message, exam_doc, cache_scope)
+        if session_id:
+            await self._update_history(
+                session_id, HumanMessage(content=message), AIMessage(content=exam_doc)
+            )
+        yield {"event": "done", "data": {"response": exam_doc, "cached": False}}
 
-    async def _filter_to_only_related_questions(self, exercise: ExerciseModel, context: str) -> str:
+    async def _filter_to_only_related_questions(
+        self, exercise: ExerciseModel, docs: List[Document]
+    ) -> str:
         """Generate a formatted exam exercise (text, not JSON) using the LLM."""
         # Use model_dump() to get a dict, then remove 'subquestions'
         exercise_dict = exercise.model_dump()
@@ -171,68 +378,88 @@ class ExamQuestionAgent:
         exercise_dict.pop('subquestions', None)
         exercise_json = json.dumps(exercise_dict)
 
-        prompt = filter_related_questions_prompt.format(
+        prompt = self.prompts.render(
+            "filter_related_questions",
+            filter_related_questions_prompt,
+            context=self._context_parts(docs),
             exercise_json=exercise_json,
-            context=context
         )
 
-        response = await self.llm.agenerate([[HumanMessage(content=prompt)]])
-        content = response.generations[0][0].message.content.strip()
+        content = await self._ask("filter_related_questions", prompt)
         logger.info(
             f"[ExamAgent] Filtered exercise content: {content}"
         )
         return content
         
-    async def _fill_exam_exercise(self, exercise: ExerciseModel, context: str) -> str:
-        """Generate a formatted exam exercise (text, not JSON) using the LLM."""
+    async def _select_related_context(
+        self, exercise: ExerciseModel, docs: List[Document]
+    ) -> List[Document]:
+        """Keep the retrieved chunks closest to the exercise's topic and grade."""
+        with span("rerank"):
+            ranked = await self.reranker.rerank(f"{exercise.topic} ({exercise.grade})", docs)
+        logger.info(
+            f"[ExamAgent] Kept {len(ranked)} of {len(docs)} chunks for '{exercise.topic}'"
+        )
+        return ranked
+
+    async def _fill_exam_exercise(
+        self, exercise: ExerciseModel, docs: List[Document]
+    ) -> str:
+        """Generate a formatted exam exercise (text, not JSON) using the LLM.
+
+        The retrieved *docs* are narrowed to the exercise by the local
+        reranker or, when it is disabled, by an LLM filtering call.
+        """
         # Use model_dump() to get a dict, then remove 'subquestions'
         exercise_dict = exercise.model_dump()
         exercise_dict.pop('general_question', None)
         exercise_dict.pop('subquestions', None)
         exercise_json = json.dumps(exercise_dict)
-        
-        context = await self._filter_to_only_related_questions(exercise, context)
 
-        prompt = fill_exam_exercise_prompt.format(
+        if self.reranker:
+            ranked = await self._select_related_context(exercise, docs)
+            context = self._context_parts(ranked)
+        else:
+            context = [await self._filter_to_only_related_questions(exercise, docs)]
+
+        prompt = self.prompts.render(
+            "fill_exam_exercise",
+            fill_exam_exercise_prompt,
+            context=context,
             exercise_json=exercise_json,
-            context=context
         )
 
-        response = await self.llm.agenerate(
-            [[HumanMessage(content=prompt)]]
-        )
-        content = response.generations[0][0].message.content.strip()
-        return content
+        return await self._ask("fill_exam_exercise", prompt)
 
-    async def _compile_exam_document(
-            self,
-            context: str,
-            user_request: str,
-            questions: Dict[str, str]
-    ) -> str:
-        """Format the generated questions into a structured exam document string."""
+    def _compile_exam_prompt(self, questions: Dict[str, str]) -> str:
         doc_lines = []
         for idx, (key, qtext) in enumerate(questions.items(), 1):
             doc_lines.append(f"Exercise {idx}\n{qtext}\n")
-        
+
         exam = "\n".join(doc_lines)
-        prompt = compile_exam_document_prompt.format(exam=exam)
-        response = await self.llm.agenerate([[HumanMessage(content=prompt)]])
-        content = response.generations[0][0].message.content.strip()
-        logger.info(f"[ExamAgent] Compiled exam document content: {content}")
+        return self.prompts.render(
+            "compile_exam_document", compile_exam_document_prompt, exam=exam
+        )
 
-        return content
+    async def _stream_exam_document(
+            self, questions: Dict[str, str]
+    ) -> AsyncIterator[str]:
+        """Compile the generated questions into the exam document, streamed as it is generated."""
+        prompt = self._compile_exam_prompt(questions)
+        async for text in self._stream("compile_exam_document", prompt):
+            yield text
 
-    async def _parse_exam_exercises(self, message: str, context: str) -> ExamModel:
+    async def _parse_exam_exercises(self, message: str, docs: List[Document]) -> ExamModel:
         """Request and validate structured exam plan using Pydantic parsing only, via output_schema."""
 
-        prompt = parse_exam_exercises_prompt.format(
-            context=context,
-            message=message
+        prompt = self.prompts.render(
+            "parse_exam_exercises",
+            parse_exam_exercises_prompt,
+            context=self._context_parts(docs),
+            message=message,
         )
 
-        response = await self.llm.agenerate([[HumanMessage(content=prompt)]])
-        content = response.generations[0][0].message.content.strip()
+        content = await self._ask("parse_exam_exercises", prompt)
         logger.info(f"[ExamAgent] Received exam exercises content: {content}")
 
         # Remove markdown code fences if present
@@ -263,9 +490,10 @@ class ExamQuestionAgent:
     async def ask_for_clarification(self, message: str) -> dict:
         """Use the LLM to determine if clarification is needed and generate a follow-up question if so."""
         # Prompt the LLM to check for missing info and generate a clarification question if needed
-        prompt = clarification_prompt.format(message=message)
-        response = await self.llm.agenerate([[HumanMessage(content=prompt)]])
-        content = response.generations[0][0].message.content.strip()
+        prompt = self.prompts.render(
+            "clarification", clarification_prompt, message=message
+        )
+        content = await self._ask("clarification", prompt)
         if content.strip().upper() == 'CLEAR':
             return {"clarification_needed": False, "clarification": ""}
         else:
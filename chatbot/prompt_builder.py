@@ -0,0 +1,132 @@
+"""
+Token-budgeted prompt assembly.
+
+Every prompt the agent sends is rendered through :class:`PromptBuilder`,
+which caps each free-text section at its token budget, fills the remaining
+room with retrieved chunks in relevance order (dropping the least relevant
+ones instead of cutting the context mid-chunk) and logs the token count of
+every call.
+"""
+
+from __future__ import annotations
+
+import threading
+from typing import Dict, List, Optional, Sequence
+
+from loguru import logger
+
+from chatbot.rag.chunking.token_counter import get_token_counter
+
+
+class PromptBuilder:
+    def __init__(
+        self,
+        model: str,
+        context_window: int,
+        output_tokens: int,
+        context_tokens: int,
+        section_tokens: Optional[Dict[str, int]] = None,
+    ):
+        """
+        Args:
+            model: Model whose tokenizer is used for counting.
+            context_window: Total tokens the model accepts (prompt + output).
+            output_tokens: Tokens reserved for the completion (``max_tokens``).
+            context_tokens: Budget for retrieved chunks in a single prompt.
+            section_tokens: Budgets of other named template fields, e.g.
+                ``{"message": 1000}``; fields not listed are not capped.
+        """
+        self.counter = get_token_counter(model)
+        self.context_window = context_window
+        self.output_tokens = output_tokens
+        self.context_tokens = context_tokens
+        self.section_tokens = section_tokens or {}
+        self._stats: Dict[str, Dict[str, int]] = {}
+        self._lock = threading.Lock()
+
+    # ------------------------------------------------------------------ #
+    # BUDGETING                                                          #
+    # ------------------------------------------------------------------ #
+
+    def truncate(self, text: str, budget: int) -> str:
+        """Cut *text* to at most *budget* tokens."""
+        if self.counter.count(text) <= budget:
+            return text
+        encoding = self.counter.encoding
+        return encoding.decode(encoding.encode_ordinary(text)[:max(budget, 0)])
+
+    def fit_chunks(self, chunks: Sequence[str], budget: int) -> List[str]:
+        """Keep the most relevant *chunks* (given best first) that fit in *budget*.
+
+        A chunk that does not fit is skipped so that a smaller, less relevant
+        one may still be used.  If not even the best chunk fits, it is
+        truncated rather than leaving the prompt without context.
+        """
+        kept: List[str] = []
+        remaining = budget
+        for chunk, n_tokens in zip(chunks, self.counter.count_batch(list(chunks))):
+            if n_tokens <= remaining:
+                kept.append(chunk)
+                remaining -= n_tokens
+        if not kept and chunks and budget > 0:
+            kept.append(self.truncate(chunks[0], budget))
+        if len(kept) < len(chunks):
+            logger.debug(f"[Prompt] Kept {len(kept)} of {len(chunks)} chunks within {budget} tokens")
+        return kept
+
+    # ------------------------------------------------------------------ #
+    # RENDERING                                                          #
+    # ------------------------------------------------------------------ #
+
+    def render(
+        self,
+        name: str,
+        template: str,
+        context: Optional[Sequence[str]] = None,
+        separator: str = "\n\n",
+        **sections: str,
+    ) -> str:
+        """Format *template*, fitting every section into its budget.
+
+        *context* is the list of retrieved chunks, best first, substituted
+        for ``{context}``; it gets whatever is left of ``context_tokens``
+        once the template, the other sections and the reserved output fit
+        into the context window.
+        """
+        sections = {
+            key: self.truncate(value, self.section_tokens[key])
+            if key in self.section_tokens
+            else value
+            for key, value in sections.items()
+        }
+
+        if context is not None:
+            base_tokens = self.counter.count(template.format(context="", **sections))
+            room = self.context_window - self.output_tokens - base_tokens
+            budget = min(self.context_tokens, room)
+            sections["context"] = separator.join(self.fit_chunks(context, budget))
+
+        prompt = template.format(**sections)
+        self._record(name, self.counter.count(prompt))
+        return prompt
+
+    def _record(self, name: str, n_tokens: int) -> None:
+        logger.info(f"[Prompt] {name}: {n_tokens} tokens")
+        if n_tokens + self.output_tokens > self.context_window:
+            logger.warning(
+                f"[Prompt] {name} needs {n_tokens} + {self.output_tokens} output tokens, "
+                f"more than the {self.context_window} token context window"
+            )
+        with self._lock:
+            stats = self._stats.setdefault(name, {"calls": 0, "tokens": 0, "max_tokens": 0})
+            stats["calls"] += 1
+            stats["tokens"] += n_tokens
+            stats["max_tokens"] = max(stats["max_tokens"], n_tokens)
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        """Per-prompt call count, total and largest token count."""
+        with self._lock:
+            return {
+                name: {**stats, "avg_tokens": stats["tokens"] // stats["calls"]}
+                for name, stats in self._stats.items()
+            }
@@ -3,8 +3,12 @@
 Chunker using LangChain's TextSplitter for advanced chunking.
 """
 
-import tiktoken
+import json
+import os
+from typing import Iterable, Iterator, List, Tuple
+
 from config_loader import AppConfig
+from langchain_core.documents import Document
 from langchain_text_splitters import (
     RecursiveCharacterTextSplitter,
     TokenTextSplitter,
@@ -16,13 +20,29 @@ from loguru import logger
 from tqdm import tqdm
 
 from langchain_experimental.text_splitter import SemanticChunker
-from langchain_huggingface import HuggingFaceEmbeddings
+
+from chatbot.rag.chunking.token_counter import get_token_counter
+from chatbot.rag.embeddings import get_local_embeddings
+from chatbot.rag.parsing.document import (
+    PAGE_SEPARATOR,
+    PageLocator,
+    ParsedPage,
+    document_text,
+    read_parsed_pages,
+)
+
+_PAGE_HEADER = re.compile(r"Page (\d+)")
+# Markdown sections token-counted per batch when chunking page by page
+SECTION_BATCH = 512
+# A backslash before a bracket, brace or letter, e.g. \[, \frac
+_LATEX = re.compile(r"\\[\[({\w]")
 
 
 class Chunker:
     def __init__(self, config: AppConfig):
         """Initialize the Chunker with specified chunk size, overlap, and chunking method."""
         self.config = config
+        self.token_counter = get_token_counter("gpt-4")
         self.splitter = self._initialize_splitter(
             config.chunking.chunk_size,
             config.chunking.overlap,
@@ -30,6 +50,14 @@ class Chunker:
         )
         # self.splitter = TokenTextSplitter(chunk_size=chunk_size, chunk_overlap=overlap)
 
+        # Sub-splitter for oversized Markdown sections, built once
+        self.recursive_splitter = RecursiveCharacterTextSplitter(
+            chunk_size=config.chunking.chunk_size,
+            chunk_overlap=config.chunking.overlap,
+            separators=["\n\n", "\n", " ", ""],
+            length_function=self.token_counter,
+        )
+
     def _initialize_splitter(self, chunk_size, overlap, chunk_type):
         """
         Initialize the appropriate text splitter based on chunk_type.
@@ -45,9 +73,7 @@ class Chunker:
                 chunk_size=chunk_size,
                 chunk_overlap=overlap,
                 separators=["\n\n", "\n", " ", ""],
-                length_function=lambda x: len(
-                    tiktoken.encoding_for_model("gpt-4").encode(x)
-                ),
+                length_function=self.token_counter,
             )
         elif chunk_type == "TokenTextSplitter":
             return TokenTextSplitter(
@@ -69,7 +95,8 @@ class Chunker:
                 strip_headers=False,
             )
         elif chunk_type == "SemanticChunker":
-            embeddings = HuggingFaceEmbeddings(model_name="all-MiniLM-L6-v2")
+            # Same process-wide model as a local-backend vector store
+            embeddings = get_local_embeddings(self.config.embeddings)
             return SemanticChunker(
                 embeddings,
                 chunk_size=chunk_size,
@@ -86,54 +113,78 @@ class Chunker:
 
     @staticmethod
     def convert_to_markdown(text: str):
-        """Convert plain text from _parse_with_azure to Markdown format."""
-        try:
-            if text.startswith("[Azure Document Intelligence error"):
-                return text  # Propagate error from _parse_with_azure
-
-            # Split text into pages
-            pages = text.split("\n\n")
-            all_text = []
-
-            # Process each page
-            for page_idx, page_text in enumerate(pages):
-                markdown_text = f"# Page {page_idx + 1}\n"
-
-                # Heuristic conversion without Azure metadata
-                lines = page_text.split("\n")
-                for line in lines:
-                    line = line.strip()
-                    if not line:
-                        continue
-                    # Infer headers: short lines (<50 chars) or all-caps
-                    if len(line) < 50 or line.isupper():
-                        markdown_text += f"## {line}\n"
-                    # Detect potential tables (e.g., lines with consistent delimiters like |, tabs, or spaces)
-                    elif re.match(r"(\S+\s+\S+\s+\S+)+", line):
-                        # Simplified table detection: assume space-separated values
-                        cells = [cell.strip() for cell in line.split()]
-                        if len(cells) >= 2:  # Minimum for a table
-                            markdown_text += "## Table\n"
-                            markdown_text += "| " + " | ".join(cells) + " |\n"
-                            markdown_text += (
-                                "| " + " | ".join(["---"] * len(cells)) + " |\n"
-                            )
-                            markdown_text += "\n"
-                    # Detect equations (e.g., LaTeX-like patterns)
-                    elif re.search(r"\\\[|\\\(|\\\{|\\\w+", line):
-                        markdown_text += f"```latex\n{line}\n```\n"
-                    else:
-                        markdown_text += f"{line}\n"
-                markdown_text += "\n"
-
-                all_text.append(markdown_text.strip())
-
-            return "\n\n".join(all_text)
+        """Convert plain text from _parse_with_azure to Markdown format.
+
+        Pages are recovered from the blank lines between them; use
+        :meth:`pages_to_markdown` when the page structure is known.
+        """
+        if text.startswith("[Azure Document Intelligence error"):
+            return text  # Propagate error from _parse_with_azure
+        return Chunker.pages_to_markdown(
+            enumerate(text.split(PAGE_SEPARATOR), 1)
+        )
 
+    @staticmethod
+    def pages_to_markdown(pages: Iterable[Tuple[int, str]]) -> str:
+        """Convert ``(page_number, text)`` pairs to Markdown, one ``# Page N`` section each."""
+        try:
+            return "\n".join(iter_markdown_lines(pages))
         except Exception as e:
             logger.error(f"Markdown conversion error: {e}")
             return f"[Markdown conversion error: {e}]"
 
+    def _chunk_markdown(self, pages: Iterable[Tuple[int, str]]) -> Iterator[Tuple[str, dict]]:
+        """Convert and split one page at a time into ``(chunk, section headers)`` pairs.
+
+        Every page opens a new ``# Page N`` section, so no section spans two
+        pages and splitting page by page gives the same chunks as splitting
+        the whole document.  Sections are token-counted in batches of
+        :data:`SECTION_BATCH` across pages, as each batch call has a fixed cost.
+        """
+        sections: List[Document] = []
+        for number, text in pages:
+            sections.extend(
+                self.splitter.split_text("\n".join(page_markdown_lines(number, text)))
+            )
+            if len(sections) >= SECTION_BATCH:
+                yield from self._fit_sections(sections)
+                sections = []
+        yield from self._fit_sections(sections)
+
+    def _split_markdown(self, text: str) -> List[Tuple[str, dict]]:
+        """Split Markdown into ``(chunk, section headers)`` pairs within the token limit."""
+        return self._fit_sections(self.splitter.split_text(text))
+
+    def _fit_sections(self, markdown_chunks: List[Document]) -> List[Tuple[str, dict]]:
+        """Prefix Markdown sections with their headers and sub-split oversized ones."""
+        if not markdown_chunks:
+            return []
+
+        # Include metadata (headers) in the chunk content
+        chunk_texts = []
+        for chunk in markdown_chunks:
+            chunk_text = ""
+            if chunk.metadata:
+                for header_level, header_text in chunk.metadata.items():
+                    chunk_text += f"{header_level} {header_text}\n"
+            chunk_texts.append(chunk_text + chunk.page_content)
+
+        # Count all sections in one batch; only oversized ones need the
+        # (much more expensive) recursive sub-split
+        token_counts = self.token_counter.count_batch(chunk_texts)
+
+        # Sub-split large chunks to fit token limits
+        final_chunks = []
+        for chunk, chunk_text, n_tokens in zip(markdown_chunks, chunk_texts, token_counts):
+            if n_tokens <= self.config.chunking.chunk_size:
+                if chunk_text.strip():
+                    final_chunks.append((chunk_text.strip(), chunk.metadata))
+                continue
+            sub_chunks = self.recursive_splitter.split_text(chunk_text)
+            final_chunks.extend((sub_chunk, chunk.metadata) for sub_chunk in sub_chunks)
+
+        return final_chunks
+
     def chunk(self, text):
         """
         Split text into chunks.
@@ -143,41 +194,133 @@ class Chunker:
             raise ValueError("Input text must be a string.")
 
         if self.config.chunking.chunk_type == "MarkdownHeaderTextSplitter":
-            text = self.convert_to_markdown(text)
-            markdown_chunks = self.splitter.split_text(text)
-
-            # Sub-split large chunks to fit token limits
-            recursive_splitter = RecursiveCharacterTextSplitter(
-                chunk_size=self.config.chunking.chunk_size,
-                chunk_overlap=self.config.chunking.overlap,
-                separators=["\n\n", "\n", " ", ""],
-                length_function=lambda x: len(
-                    tiktoken.encoding_for_model("gpt-4").encode(x)
-                ),
-            )
-            final_chunks = []
-            for chunk in markdown_chunks:
-                # Include metadata (headers) in the chunk content
-                chunk_text = ""
-                if chunk.metadata:
-                    for header_level, header_text in chunk.metadata.items():
-                        chunk_text += f"{header_level} {header_text}\n"
-                chunk_text += chunk.page_content
-                # Sub-split the chunk
-                sub_chunks = recursive_splitter.split_text(chunk_text)
-                final_chunks.extend(sub_chunks)
-
-            return final_chunks
+            pages = enumerate(text.split(PAGE_SEPARATOR), 1)
+            return [chunk for chunk, _ in self._chunk_markdown(pages)]
 
         return self.splitter.split_text(text)
 
+    def chunk_pages(self, pages: Iterable[ParsedPage]) -> List[Tuple[str, List[int]]]:
+        """Split a parsed document into ``(chunk, page_numbers)`` pairs.
+
+        Markdown chunking consumes *pages* one at a time, so a streamed
+        document never needs to be held in memory as a whole.
+        """
+        if self.config.chunking.chunk_type == "MarkdownHeaderTextSplitter":
+            return [
+                (chunk, _header_pages(headers))
+                for chunk, headers in self._chunk_markdown(
+                    (page.number, page.text) for page in pages
+                )
+            ]
+
+        pages = list(pages)
+        text = document_text(pages)
+        locator = PageLocator(pages)
+        chunks = []
+        cursor = 0
+        for chunk in self.splitter.split_text(text):
+            # Chunks come in text order; overlapping ones start after the previous start
+            start = text.find(chunk, cursor)
+            if start < 0:
+                start = text.find(chunk)
+            if start < 0:  # e.g. SemanticChunker re-joins sentences
+                chunks.append((chunk, []))
+                continue
+            chunks.append((chunk, locator.pages(start, start + len(chunk))))
+            cursor = start + 1
+        return chunks
+
     def chunk_file(self, input_path, output_path):
-        """Read text from input_path, chunk it, and save to output_path."""
+        """Chunk the parsed document at input_path and save the chunks to output_path.
+
+        Each output line is a JSON record with the chunk ``text`` and the
+        ``pages`` it was taken from.  The output is written to a temporary
+        file and renamed into place, so readers never see a partially
+        written chunk file.
+
+        Returns:
+            int: Number of chunks written.
+        """
         logger.info(f"Reading and chunking file: {input_path}")
-        with open(input_path, "r", encoding="utf-8") as f:
-            text = f.read()
-        chunks = self.chunk(text)
+        chunks = self.chunk_pages(read_parsed_pages(input_path))
         logger.info(f"Writing {len(chunks)} chunks to {output_path}")
-        with open(output_path, "w", encoding="utf-8") as out:
-            for chunk in tqdm(chunks, desc=f"Writing chunks to {output_path}"):
-                out.write(chunk + "\n---\n")
+        tmp_path = f"{output_path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as out:
+                for chunk, pages in tqdm(chunks, desc=f"Writing chunks to {output_path}"):
+                    out.write(json.dumps({"text": chunk, "pages": pages}, ensure_ascii=False) + "\n")
+            os.replace(tmp_path, output_path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        return len(chunks)
+
+
+def page_markdown_lines(page_number: int, page_text: str) -> Iterator[str]:
+    """Yield the Markdown lines of one page, starting with its ``# Page N`` header."""
+    yield f"# Page {page_number}"
+    blank = False  # a table's trailing blank line, dropped at the end of the page
+    for line in page_text.split("\n"):
+        line = line.strip()
+        if not line:
+            continue
+        if blank:
+            yield ""
+            blank = False
+        # Infer headers: short lines (<50 chars) or all-caps
+        if len(line) < 50 or line.isupper():
+            yield f"## {line}"
+            continue
+        # Detect potential tables: three or more space-separated values
+        cells = line.split()
+        if len(cells) >= 3:
+            yield "## Table"
+            yield "| " + " | ".join(cells) + " |"
+            yield "| " + " | ".join(["---"] * len(cells)) + " |"
+            blank = True
+        # Detect equations (e.g., LaTeX-like patterns)
+        elif _LATEX.search(line):
+            yield "```latex"
+            yield line
+            yield "```"
+        else:
+            yield line
+
+
+def iter_markdown_lines(pages: Iterable[Tuple[int, str]]) -> Iterator[str]:
+    """Yield the Markdown lines of ``(page_number, text)`` pairs, pages separated by a blank line."""
+    for i, (number, text) in enumerate(pages):
+        if i:
+            yield ""
+        yield from page_markdown_lines(number, text)
+
+
+def _header_pages(headers: dict) -> List[int]:
+    """Page number from the ``# Page N`` section a Markdown chunk belongs to."""
+    match = _PAGE_HEADER.fullmatch(headers.get("Header 1", ""))
+    return [int(match.group(1))] if match else []
+
+
+def read_chunks(path: str) -> Iterator[Tuple[str, List[int]]]:
+    """Yield the ``(chunk, page_numbers)`` pairs of a chunk file.
+
+    Older ``.chunked.txt`` files (chunks separated by a line containing only
+    ``---``) carry no page numbers.
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        if path.endswith(".jsonl"):
+            for line in f:
+                if line.strip():
+                    record = json.loads(line)
+                    yield record["text"], record["pages"]
+            return
+        chunk = ""
+        for line in f:
+            if line.strip() == "---":  # newline delimiter
+                if chunk.strip():
+                    yield chunk.strip(), []
+                chunk = ""
+            else:
+                chunk += line
+        if chunk.strip():  # final chunk
+            yield chunk.strip(), []
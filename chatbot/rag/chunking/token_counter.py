@@ -0,0 +1,112 @@
+# chunking/token_counter.py
+"""
+Shared, cached token counting for the chunkers and prompt builders.
+
+Text splitters probe the length of many overlapping segments, so resolving
+the encoding on every call (``tiktoken.encoding_for_model``) and re-encoding
+identical segments dominates chunking time.  :class:`TokenCounter` resolves
+the encoding once, memoizes counts in a bounded LRU and counts batches of
+misses with tiktoken's multi-threaded batch encoder.
+"""
+
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+from typing import List, Sequence
+
+import tiktoken
+
+
+@lru_cache(maxsize=None)
+def get_encoding(model: str = "gpt-4") -> tiktoken.Encoding:
+    """Return the (process-wide cached) tiktoken encoding for *model*."""
+    try:
+        return tiktoken.encoding_for_model(model)
+    except KeyError:
+        # Model names tiktoken does not know yet; counts are close enough
+        return tiktoken.get_encoding("cl100k_base")
+
+
+class TokenCounter:
+    def __init__(
+        self,
+        model: str = "gpt-4",
+        cache_size: int = 16384,
+        max_cached_chars: int = 20000,
+    ):
+        """
+        Args:
+            model: Model whose tokenizer is used for counting.
+            cache_size: Maximum number of memoized counts.
+            max_cached_chars: Longer texts are counted but not memoized, which
+                keeps the cache's memory bounded.
+        """
+        self.model = model
+        self.cache_size = cache_size
+        self.max_cached_chars = max_cached_chars
+        self._cache: "OrderedDict[str, int]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def encoding(self) -> tiktoken.Encoding:
+        # Resolved lazily: loading an encoding may need a network download
+        return get_encoding(self.model)
+
+    def __call__(self, text: str) -> int:
+        """Alias for :meth:`count`, so instances work as ``length_function``."""
+        return self.count(text)
+
+    def count(self, text: str) -> int:
+        """Return the number of tokens in *text*."""
+        cached = self._lookup(text)
+        if cached is not None:
+            return cached
+        n_tokens = len(self.encoding.encode_ordinary(text))
+        self._store(text, n_tokens)
+        return n_tokens
+
+    def count_batch(self, texts: Sequence[str], num_threads: int = 8) -> List[int]:
+        """Return token counts for *texts*, encoding only uncached ones."""
+        counts: List[int] = [0] * len(texts)
+        misses: List[int] = []
+        for i, text in enumerate(texts):
+            cached = self._lookup(text)
+            if cached is None:
+                misses.append(i)
+            else:
+                counts[i] = cached
+
+        if misses:
+            encoded = self.encoding.encode_ordinary_batch(
+                [texts[i] for i in misses], num_threads=num_threads
+            )
+            for i, tokens in zip(misses, encoded):
+                counts[i] = len(tokens)
+                self._store(texts[i], len(tokens))
+        return counts
+
+    def _lookup(self, text: str):
+        with self._lock:
+            n_tokens = self._cache.get(text)
+            if n_tokens is None:
+                self.misses += 1
+                return None
+            self._cache.move_to_end(text)
+            self.hits += 1
+            return n_tokens
+
+    def _store(self, text: str, n_tokens: int) -> None:
+        if len(text) > self.max_cached_chars:
+            return
+        with self._lock:
+            self._cache[text] = n_tokens
+            if len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+
+@lru_cache(maxsize=None)
+def get_token_counter(model: str = "gpt-4") -> TokenCounter:
+    """Return the process-wide :class:`TokenCounter` for *model*."""
+    return TokenCounter(model)
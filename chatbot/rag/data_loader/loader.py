@@ -7,6 +7,8 @@ import os
 from loguru import logger
 from tqdm import tqdm
 
+from chatbot.rag.parsing.document import write_parsed_document
+
 
 class DataLoader:
     def load(self, path):
@@ -33,12 +35,21 @@ class DataLoader:
             raise FileNotFoundError(f"Path not found: {path}")
 
     def load_and_save(self, input_path, output_path):
-        """Load text from input_path and save to output_path."""
+        """Load text from input_path and save it as a parsed document to output_path.
+
+        Form feeds (``\\f``) in the text mark page breaks.
+        """
         data = self.load(input_path)
         # data is a dict: {filename: content}
-        for _, content in data.items():
+        for fname, content in data.items():
             logger.info(
                 f"Saving loaded content to {output_path}"
             )
-            with open(output_path, "w", encoding="utf-8") as f:
-                f.write(content) 
\ No newline at end of file
+            write_parsed_document(
+                output_path,
+                [
+                    (number, page.split("\n"))
+                    for number, page in enumerate(content.split("\f"), 1)
+                ],
+                fname,
+            )
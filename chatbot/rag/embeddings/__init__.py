@@ -0,0 +1,3 @@
+from .cache import CachedEmbeddings
+from .factory import create_embeddings, embedding_model_name, get_local_embeddings
+from .local import LocalEmbeddings
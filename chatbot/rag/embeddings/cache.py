@@ -0,0 +1,149 @@
+"""
+Disk-backed, content-addressed cache in front of any LangChain embedder.
+
+Vectors are keyed by ``sha256(model, kind, text)`` and stored in SQLite as
+raw float32 bytes.  Lookups are batched; only texts that miss the cache are
+sent to the underlying model, each distinct text at most once.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import os
+import sqlite3
+import threading
+from typing import Dict, List, Sequence
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+from loguru import logger
+
+from chatbot.telemetry import CACHE_LOOKUPS
+
+
+class CachedEmbeddings(Embeddings):
+    # SQLite limits the number of bound parameters per statement
+    LOOKUP_BATCH = 500
+
+    def __init__(self, underlying: Embeddings, path: str, model: str):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.underlying = underlying
+        self.model = model
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings "
+                "(key TEXT PRIMARY KEY, vector BLOB NOT NULL)"
+            )
+        self.hits = 0
+        self.misses = 0
+
+    # ------------------------------------------------------------------ #
+    # LangChain Embeddings interface                                     #
+    # ------------------------------------------------------------------ #
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        keys = [self._key("doc", text) for text in texts]
+        found = self._lookup(keys)
+        missing = self._missing(texts, keys, found)
+        if missing:
+            vectors = self.underlying.embed_documents(list(missing.values()))
+            found.update(self._store(list(missing), vectors))
+        return [found[key] for key in keys]
+
+    def embed_query(self, text: str) -> List[float]:
+        key = self._key("query", text)
+        found = self._lookup([key])
+        self._count(hits=int(key in found), misses=int(key not in found))
+        if key not in found:
+            found.update(self._store([key], [self.underlying.embed_query(text)]))
+        return found[key]
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        keys = [self._key("doc", text) for text in texts]
+        found = await asyncio.to_thread(self._lookup, keys)
+        missing = self._missing(texts, keys, found)
+        if missing:
+            vectors = await self.underlying.aembed_documents(list(missing.values()))
+            found.update(
+                await asyncio.to_thread(self._store, list(missing), vectors)
+            )
+        return [found[key] for key in keys]
+
+    async def aembed_query(self, text: str) -> List[float]:
+        key = self._key("query", text)
+        found = await asyncio.to_thread(self._lookup, [key])
+        self._count(hits=int(key in found), misses=int(key not in found))
+        if key not in found:
+            vector = await self.underlying.aembed_query(text)
+            found.update(await asyncio.to_thread(self._store, [key], [vector]))
+        return found[key]
+
+    # ------------------------------------------------------------------ #
+    # CACHE                                                              #
+    # ------------------------------------------------------------------ #
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+    def _count(self, hits: int, misses: int) -> None:
+        self.hits += hits
+        self.misses += misses
+        if hits:
+            CACHE_LOOKUPS.inc(hits, cache="embedding", result="hit")
+        if misses:
+            CACHE_LOOKUPS.inc(misses, cache="embedding", result="miss")
+
+    def _key(self, kind: str, text: str) -> str:
+        payload = f"{self.model}\0{kind}\0{text}".encode("utf-8")
+        return hashlib.sha256(payload).hexdigest()
+
+    def _missing(
+        self, texts: Sequence[str], keys: Sequence[str], found: Dict[str, List[float]]
+    ) -> Dict[str, str]:
+        """Map each distinct missing key to its text, counting hits/misses."""
+        missing: Dict[str, str] = {}
+        for key, text in zip(keys, texts):
+            if key not in found:
+                missing.setdefault(key, text)
+        self._count(
+            hits=len(keys) - sum(1 for key in keys if key in missing),
+            misses=len(missing),
+        )
+        if missing:
+            logger.debug(f"Embedding cache: {len(missing)} misses of {len(keys)}")
+        return missing
+
+    def _lookup(self, keys: Sequence[str]) -> Dict[str, List[float]]:
+        found: Dict[str, List[float]] = {}
+        unique = list(dict.fromkeys(keys))
+        with self._lock:
+            for start in range(0, len(unique), self.LOOKUP_BATCH):
+                batch = unique[start:start + self.LOOKUP_BATCH]
+                placeholders = ",".join("?" * len(batch))
+                rows = self._conn.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})",
+                    batch,
+                ).fetchall()
+                for key, blob in rows:
+                    found[key] = np.frombuffer(blob, dtype=np.float32).tolist()
+        return found
+
+    def _store(
+        self, keys: Sequence[str], vectors: Sequence[Sequence[float]]
+    ) -> Dict[str, List[float]]:
+        arrays = [np.asarray(vector, dtype=np.float32) for vector in vectors]
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings VALUES (?, ?)",
+                [(key, array.tobytes()) for key, array in zip(keys, arrays)],
+            )
+        # Return float32 values so hits and misses yield identical vectors
+        return {key: array.tolist() for key, array in zip(keys, arrays)}
@@ -0,0 +1,67 @@
+"""
+Embedding backend selection.
+
+Local models are expensive to load, so :func:`get_local_embeddings` keeps a
+single instance per model and settings in each process; the vector store and
+the semantic chunker share it.
+"""
+
+from __future__ import annotations
+
+from functools import lru_cache
+
+from langchain_core.embeddings import Embeddings
+from langchain_openai import OpenAIEmbeddings
+
+from chatbot.rag.embeddings.local import LocalEmbeddings
+from config_loader import AppConfig, EmbeddingConfig
+
+
+@lru_cache(maxsize=None)
+def _local_embeddings(
+    model_name: str,
+    device: str,
+    batch_size: int,
+    max_batch_tokens: int,
+    tokenizer_threads: int,
+) -> LocalEmbeddings:
+    return LocalEmbeddings(
+        model_name,
+        device=device,
+        batch_size=batch_size,
+        max_batch_tokens=max_batch_tokens,
+        tokenizer_threads=tokenizer_threads,
+    )
+
+
+def get_local_embeddings(embedding_config: EmbeddingConfig) -> LocalEmbeddings:
+    """Return the process-wide local model described by *embedding_config*."""
+    return _local_embeddings(
+        embedding_config.local_model,
+        embedding_config.device,
+        embedding_config.batch_size,
+        embedding_config.max_batch_tokens,
+        embedding_config.tokenizer_threads,
+    )
+
+
+def create_embeddings(config: AppConfig) -> Embeddings:
+    """Build the embedder selected by ``config.embeddings.backend``."""
+    embedding_config = config.embeddings
+    if embedding_config.backend == "openai":
+        kwargs = {"model": embedding_config.model} if embedding_config.model else {}
+        return OpenAIEmbeddings(api_key=config.api.openai_api_key, **kwargs)
+    if embedding_config.backend == "local":
+        return get_local_embeddings(embedding_config)
+    raise ValueError(
+        f"Unsupported embeddings backend: {embedding_config.backend}. "
+        "Supported backends are: openai, local"
+    )
+
+
+def embedding_model_name(config: AppConfig) -> str:
+    """Identifier of the configured embedding model, e.g. ``local:all-MiniLM-L6-v2``."""
+    embedding_config = config.embeddings
+    if embedding_config.backend == "local":
+        return f"local:{embedding_config.local_model}"
+    return f"{embedding_config.backend}:{embedding_config.model or 'default'}"
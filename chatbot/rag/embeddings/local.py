@@ -0,0 +1,138 @@
+"""
+Sentence embeddings computed locally on CPU (or GPU) with a Hugging Face model.
+
+Inputs are tokenized in a thread pool (fast tokenizers release the GIL),
+sorted by token length and grouped into batches bounded by a padded token
+budget, so short texts are not padded to the length of long ones.  Vectors
+are mean-pooled over the attention mask and L2-normalised, matching
+``sentence-transformers`` models such as ``all-MiniLM-L6-v2``.
+
+``torch`` and ``transformers`` are only needed when this backend is used.
+"""
+
+from __future__ import annotations
+
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Sequence
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+from loguru import logger
+
+
+class LocalEmbeddings(Embeddings):
+    def __init__(
+        self,
+        model_name: str = "sentence-transformers/all-MiniLM-L6-v2",
+        device: str = "cpu",
+        batch_size: int = 64,
+        max_batch_tokens: int = 16384,
+        max_length: int = 512,
+        tokenizer_threads: int = 4,
+    ):
+        """
+        Args:
+            model_name: Hugging Face model ID or local path.
+            device: Torch device the model runs on.
+            batch_size: Maximum texts per forward pass.
+            max_batch_tokens: Maximum padded tokens (texts x longest) per pass.
+            max_length: Texts are truncated to this many tokens.
+            tokenizer_threads: Threads used for tokenization.
+        """
+        try:
+            import torch
+            from transformers import AutoModel, AutoTokenizer
+        except ImportError as exc:
+            raise ImportError(
+                "embeddings.backend 'local' requires torch and transformers "
+                "(pip install -r requirements-local.txt)"
+            ) from exc
+
+        self.model = model_name
+        self.device = device
+        self.batch_size = batch_size
+        self.max_batch_tokens = max_batch_tokens
+        self.tokenizer_threads = tokenizer_threads
+        self._torch = torch
+        self._tokenizer = AutoTokenizer.from_pretrained(model_name)
+        self._model = AutoModel.from_pretrained(model_name).to(device).eval()
+        self.max_length = min(max_length, self._tokenizer.model_max_length)
+        self._pool = ThreadPoolExecutor(
+            max_workers=tokenizer_threads, thread_name_prefix="tokenize"
+        )
+        # One forward pass at a time; torch already uses every core for it
+        self._lock = threading.Lock()
+        logger.info(f"Loaded local embedding model {model_name} on {device}")
+
+    # ------------------------------------------------------------------ #
+    # BATCHING                                                           #
+    # ------------------------------------------------------------------ #
+
+    def _tokenize(self, texts: Sequence[str]) -> List[List[int]]:
+        """Token IDs of every text, tokenized in slices across the pool."""
+        n_slices = max(1, min(self.tokenizer_threads, len(texts) // 32))
+        step = -(-len(texts) // n_slices)
+        slices = [list(texts[i:i + step]) for i in range(0, len(texts), step)]
+        encoded = self._pool.map(
+            lambda part: self._tokenizer(
+                part, truncation=True, max_length=self.max_length
+            )["input_ids"],
+            slices,
+        )
+        return [ids for part in encoded for ids in part]
+
+    def _batches(self, lengths: Sequence[int]) -> List[List[int]]:
+        """Group text indices, longest first, under the padded-token budget."""
+        order = sorted(range(len(lengths)), key=lengths.__getitem__, reverse=True)
+        batches: List[List[int]] = []
+        current: List[int] = []
+        for index in order:
+            # Sorted descending, so the first text sets the padded length
+            longest = lengths[current[0]] if current else lengths[index]
+            if current and (
+                len(current) >= self.batch_size
+                or (len(current) + 1) * longest > self.max_batch_tokens
+            ):
+                batches.append(current)
+                current = []
+            current.append(index)
+        if current:
+            batches.append(current)
+        return batches
+
+    def _forward(self, batch: List[List[int]]) -> np.ndarray:
+        torch = self._torch
+        width = max(len(ids) for ids in batch)
+        pad_id = self._tokenizer.pad_token_id or 0
+        input_ids = torch.full((len(batch), width), pad_id, dtype=torch.long)
+        attention = torch.zeros((len(batch), width), dtype=torch.long)
+        for row, ids in enumerate(batch):
+            input_ids[row, :len(ids)] = torch.tensor(ids, dtype=torch.long)
+            attention[row, :len(ids)] = 1
+        input_ids, attention = input_ids.to(self.device), attention.to(self.device)
+
+        with self._lock, torch.inference_mode():
+            hidden = self._model(input_ids=input_ids, attention_mask=attention)[0]
+        mask = attention.unsqueeze(-1).to(hidden.dtype)
+        pooled = (hidden * mask).sum(dim=1) / mask.sum(dim=1).clamp(min=1e-9)
+        pooled = torch.nn.functional.normalize(pooled, p=2, dim=1)
+        return pooled.float().cpu().numpy()
+
+    # ------------------------------------------------------------------ #
+    # LangChain Embeddings interface                                     #
+    # ------------------------------------------------------------------ #
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        if not texts:
+            return []
+        token_ids = self._tokenize(texts)
+        vectors: List[np.ndarray] = [None] * len(texts)  # type: ignore[list-item]
+        for batch in self._batches([len(ids) for ids in token_ids]):
+            pooled = self._forward([token_ids[i] for i in batch])
+            for index, vector in zip(batch, pooled):
+                vectors[index] = vector
+        return np.stack(vectors).tolist()
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_documents([text])[0]
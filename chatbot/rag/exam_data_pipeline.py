@@ -1,11 +1,24 @@
 import os
 import asyncio
-from typing import List
+import hashlib
+import json
+import multiprocessing
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
 
 from chatbot.rag.data_loader.loader import DataLoader
+from chatbot.rag.parsing.document import (
+    EXTENSION as PARSED_EXTENSION,
+    LEGACY_EXTENSION as LEGACY_PARSED_EXTENSION,
+)
 from chatbot.rag.parsing.pdf_parser import PDFParser
-from chatbot.rag.chunking.chunker import Chunker
+from chatbot.rag.chunking.chunker import Chunker, read_chunks
+from chatbot.rag.embeddings import embedding_model_name
+from chatbot.rag.manifest import IndexManifest
 from chatbot.rag.vector_store import VectorStore
+from chatbot.telemetry import PIPELINE_FILE_SECONDS, PIPELINE_FILES, span
 from config_loader import AppConfig
 from loguru import logger
 from tqdm import tqdm
@@ -23,23 +36,63 @@ class ExamDataPipeline:
     that you don’t hit the dreaded «asyncio.run() cannot be called from a
     running event loop» error.  In that case the method returns the created
     :class:`asyncio.Task` so you can await it if you want.
+
+    Long-running services should instead await :pyfunc:`aprocess_exam_files`
+    in a background task and poll :pyattr:`progress` for readiness.
     """
 
     # ------------------------------------------------------------------ #
     # INITIALISATION                                                     #
     # ------------------------------------------------------------------ #
 
-    def __init__(self, config: AppConfig, max_concurrency: int = 10):
+    SUPPORTED_EXTENSIONS = (".pdf", ".txt")
+
+    def __init__(
+        self,
+        config: AppConfig,
+        max_concurrency: Optional[int] = None,
+        vector_store: Optional[VectorStore] = None,
+        pdf_parser: Optional[PDFParser] = None,
+        output_dir: Optional[str] = None,
+    ):
+        """
+        Args:
+            max_concurrency: Parse calls in flight; defaults to
+                ``pipeline.parse_concurrency``.
+            vector_store: Store to index into; built from *config* if omitted.
+            pdf_parser: Parser for PDF sources; built from *config* if omitted.
+            output_dir: Where the ``parsing/parsed_data`` and
+                ``chunking/chunked_data`` outputs go; defaults to this package.
+        """
         self.config = config
         self.exams_path = config.exams_path or os.path.join(
             os.path.dirname(__file__), "../exams_random"
         )
 
         self.data_loader = DataLoader()
-        self.pdf_parser = PDFParser(config)
+        self.pdf_parser = pdf_parser or PDFParser(config)
         self.chunker = Chunker(config)
-        self.vector_store = VectorStore(config)
-        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self.vector_store = vector_store or VectorStore(config)
+        self.manifest = IndexManifest(
+            os.path.join(self.vector_store.persist_directory, "index_manifest.sqlite")
+        )
+        self.output_dir = output_dir or os.path.dirname(__file__)
+        self.pipeline_config = config.pipeline
+        self._semaphore = asyncio.Semaphore(
+            max_concurrency or self.pipeline_config.parse_concurrency
+        )
+
+        # Indexing progress, readable while the pipeline runs --------------
+        self._progress_lock = threading.Lock()  # parse workers run in threads
+        self.progress: Dict[str, Any] = {
+            "state": "idle",  # idle → running → done | partial | failed
+            "stage": None,
+            "stages": {},
+            "started_at": None,
+            "finished_at": None,
+            "error": None,
+            "failed_files": {},  # stage → sources that failed it
+        }
 
     # ------------------------------------------------------------------ #
     # PUBLIC API (synchronous)                                           #
@@ -55,7 +108,7 @@ class ExamDataPipeline:
         caller can `await` the task if they choose.
         """
         try:
-            return asyncio.run(self._process_exam_files_async())
+            return asyncio.run(self.aprocess_exam_files())
         except RuntimeError as exc:
             if "asyncio.run() cannot be called from a running event loop" not in str(
                 exc
@@ -66,157 +119,584 @@ class ExamDataPipeline:
                 "Detected an active event‑loop – running pipeline as a task instead…"
             )
             loop = asyncio.get_running_loop()
-            task = loop.create_task(self._process_exam_files_async())
+            task = loop.create_task(self.aprocess_exam_files())
             return task  # caller may ignore or `await` the task
 
+    # ------------------------------------------------------------------ #
+    # PUBLIC API (asynchronous)                                          #
+    # ------------------------------------------------------------------ #
+
+    async def aprocess_exam_files(self) -> None:
+        """Run the full pipeline on the current event loop.
+
+        Progress is tracked in :pyattr:`progress`; a failure is logged and
+        recorded there instead of being raised, so the pipeline can run as a
+        fire-and-forget background task.
+        """
+        if self.progress["state"] == "running":
+            logger.warning("Indexing already running – ignoring new request")
+            return
+
+        self.progress.update(
+            state="running", stage=None, stages={},
+            started_at=time.time(), finished_at=None, error=None, failed_files={},
+        )
+        try:
+            await self._process_exam_files_async()
+        except Exception as exc:  # noqa: BLE001
+            logger.exception(f"⚠️  Indexing failed: {exc}")
+            self.progress.update(state="failed", error=str(exc))
+        else:
+            self._finish()
+        finally:
+            # Index changes are persisted once per run, not per commit
+            try:
+                await self.vector_store.flush_indexes()
+            except Exception as exc:  # noqa: BLE001 – rebuilt from the store on load
+                logger.error(f"⚠️  Persisting the search indexes failed: {exc}")
+            self.progress["finished_at"] = time.time()
+            self.pdf_parser.close()
+
     # ------------------------------------------------------------------ #
     # INTERNAL ASYNC IMPLEMENTATION                                      #
     # ------------------------------------------------------------------ #
 
     async def _process_exam_files_async(self) -> None:
-        base_dir = os.path.dirname(__file__)
+        base_dir = self.output_dir
         parsing_dir = os.path.join(base_dir, "parsing", "parsed_data")
         chunking_dir = os.path.join(base_dir, "chunking", "chunked_data")
         os.makedirs(parsing_dir, exist_ok=True)
         os.makedirs(chunking_dir, exist_ok=True)
 
-        # ── Stage 1 – PARSING (now async) ──────────────────────────────
-        await self._parse_all_exam_files_async(parsing_dir)
+        # ── Stage 0 – MANIFEST (hash sources, drop deleted ones) ──────
+        with span("pipeline.manifest"):
+            sources = await asyncio.to_thread(self._sync_manifest, parsing_dir)
+            await self._remove_deleted_sources(sources, parsing_dir, chunking_dir)
 
-        # ── Stage 2 – CHUNKING (still sync; usually CPU‑light) ─────────
-        self._chunk_all_parsed_files(parsing_dir, chunking_dir)
+        if self.pipeline_config.mode == "streaming":
+            with span("pipeline.streaming"):
+                await self._stream_all_files(sources, parsing_dir, chunking_dir)
+        else:
+            # ── Stage 1 – PARSING (now async) ──────────────────────────
+            with span("pipeline.parse"):
+                await self._parse_all_exam_files_async(sources, parsing_dir)
+
+            # ── Stage 2 – CHUNKING (CPU‑bound → process pool) ──────────
+            with span("pipeline.chunk"):
+                await self._chunk_all_parsed_files(sources, parsing_dir, chunking_dir)
+
+            # ── Stage 3 – EMBEDDING (async, unchanged) ────────────────
+            with span("pipeline.embed"):
+                await self._embed_all_chunked_files(sources, chunking_dir)
 
-        # ── Stage 3 – EMBEDDING (async, unchanged) ────────────────────
-        await self._embed_all_chunked_files(chunking_dir)
+        # ── Stage 4 – PRUNE (vectors no source references) ────────────
+        with span("pipeline.prune"):
+            await self._prune_unreferenced(sources)
+        # Retrain query metadata extraction here rather than on a request
+        await self.vector_store.refresh_query_extractor()
+        self._log_throughput()
 
     # ------------------------------------------------------------------ #
-    # STAGE 1 – PARSING (ASYNC)                                          #
+    # STAGE 0 – MANIFEST                                                 #
     # ------------------------------------------------------------------ #
 
-    async def _parse_all_exam_files_async(self, parsing_dir: str) -> None:
-        """Parse all exam files concurrently using asyncio threads."""
-
-        logger.info("Step 1/3 – Parsing exam files…")
-        tasks: List[asyncio.Task] = []
+    def _sync_manifest(self, parsing_dir: str) -> List[str]:
+        """Hash every supported source and register it in the manifest.
 
+        Returns the sources (paths relative to ``exams_path``) currently on
+        disk.  Sources without a manifest entry whose parse output already
+        exists are adopted as parsed, so existing parse results are reused.
+        """
+        config_hash = self._config_hash()
+        sources: List[str] = []
         for root, _, files in os.walk(self.exams_path):
             for fname in files:
+                if not fname.lower().endswith(self.SUPPORTED_EXTENSIONS):
+                    logger.debug(f"Skipping unsupported file: {fname}")
+                    continue
                 fpath = os.path.join(root, fname)
-                parsed_fname = f"{fname}.parsed.txt"
-                parsed_path = os.path.join(parsing_dir, parsed_fname)
+                source = os.path.relpath(fpath, self.exams_path)
+                self.manifest.track(
+                    source,
+                    self._file_hash(fpath),
+                    config_hash,
+                    parsed=os.path.exists(
+                        self._readable(self._parsed_path, parsing_dir, source)
+                    ),
+                )
+                sources.append(source)
+        return sources
+
+    async def _remove_deleted_sources(
+        self, sources: List[str], parsing_dir: str, chunking_dir: str
+    ) -> None:
+        """Drop vectors, outputs and manifest entries of deleted sources."""
+        deleted = set(self.manifest.sources()) - set(sources)
+        for source in deleted:
+            logger.info(f"Removing deleted source → {source}")
+            orphaned = self.manifest.orphaned(source, self.manifest.chunk_ids(source))
+            await self.vector_store.delete(orphaned)
+            for path in (
+                self._parsed_path(parsing_dir, source),
+                self._parsed_path(parsing_dir, source, legacy=True),
+                self._chunked_path(chunking_dir, source),
+                self._chunked_path(chunking_dir, source, legacy=True),
+            ):
+                if os.path.exists(path):
+                    os.remove(path)
+            self.manifest.remove(source)
+
+    def _pending(self, sources: List[str], stage: str) -> List[str]:
+        """Sources whose *stage* must run (previous stage done, this not)."""
+        stages = IndexManifest.STAGES
+        previous = stages[stages.index(stage) - 1] if stage != stages[0] else None
+        pending = []
+        for source in sources:
+            entry = self.manifest.get(source)
+            if previous and entry[f"{previous}_status"] != IndexManifest.DONE:
+                continue
+            if self.config.force_reload or entry[f"{stage}_status"] != IndexManifest.DONE:
+                pending.append(source)
+        return pending
 
-                if not self.config.force_reload:
-                    if os.path.exists(parsed_path):
-                        logger.debug(f"✓ Already parsed  {parsed_path}")
-                        continue
+    # ------------------------------------------------------------------ #
+    # STAGE 1 – PARSING (ASYNC)                                          #
+    # ------------------------------------------------------------------ #
 
-                # Use to_thread so the blocking I/O does not block the loop.
-                async def _worker(name: str, src: str, dst: str):
-                    async with self._semaphore:  # limit global concurrency
-                        await asyncio.to_thread(self._parse_single_file, name, src, dst)
+    async def _parse_all_exam_files_async(
+        self, sources: List[str], parsing_dir: str
+    ) -> None:
+        """Parse all exam files concurrently."""
 
-                tasks.append(asyncio.create_task(_worker(fname, fpath, parsed_path)))
+        logger.info("Step 1/3 – Parsing exam files…")
+        pending = self._pending(sources, "parse")
+        self._begin_stage("parse", len(pending))
 
+        tasks = [
+            asyncio.create_task(self._parse_source(source, parsing_dir))
+            for source in pending
+        ]
         if tasks:
             for f in tqdm(asyncio.as_completed(tasks), total=len(tasks)):
                 await f
         logger.info("✅  Parsing complete!")
 
-    def _parse_single_file(self, fname: str, fpath: str, parsed_path: str) -> None:
-        """Blocking helper – executed in a thread pool."""
-        if fname.lower().endswith(".txt"):
-            logger.info(f"Parsing TXT  → {fpath}")
-            self.data_loader.load_and_save(fpath, parsed_path)
-        elif fname.lower().endswith(".pdf"):
-            logger.info(f"Parsing PDF  → {fpath}")
-            try:
-                self.pdf_parser.parse_and_save(fpath, parsed_path)
-            except Exception as exc:  # noqa: BLE001
-                logger.error(f"⚠️  Failed to parse PDF {fpath}: {exc}")
-        else:
-            logger.debug(f"Skipping unsupported file: {fpath}")
+    async def _parse_source(self, source: str, parsing_dir: str) -> bool:
+        fpath = os.path.join(self.exams_path, source)
+        parsed_path = self._parsed_path(parsing_dir, source)
+        async with self._semaphore:  # limit global concurrency
+            return await self._parse_file(source, fpath, parsed_path)
+
+    async def _parse_file(self, source: str, fpath: str, parsed_path: str) -> bool:
+        """Parse one source: text files in a thread, PDFs with async Azure calls."""
+        started = time.perf_counter()
+        try:
+            if source.lower().endswith(".txt"):
+                logger.info(f"Parsing TXT  → {fpath}")
+                await asyncio.to_thread(self.data_loader.load_and_save, fpath, parsed_path)
+            else:
+                logger.info(f"Parsing PDF  → {fpath}")
+                await self.pdf_parser.aparse_and_save(fpath, parsed_path)
+        except Exception as exc:  # noqa: BLE001
+            logger.error(f"⚠️  Failed to parse {fpath}: {exc}")
+            self.manifest.set_status(source, "parse", IndexManifest.FAILED)
+            self._advance_stage("parse", started, failed=True, source=source)
+            return False
+        self.manifest.set_status(source, "parse", IndexManifest.DONE)
+        self.manifest.set_status(source, "chunk", IndexManifest.PENDING)
+        self._advance_stage("parse", started)
+        return True
 
     # ------------------------------------------------------------------ #
     # STAGE 2 – CHUNKING                                                 #
     # ------------------------------------------------------------------ #
 
-    def _chunk_all_parsed_files(self, parsing_dir: str, chunking_dir: str) -> None:
-        logger.info("Step 2/3 – Chunking parsed files…")
-        for parsed_fname in os.listdir(parsing_dir):
-            if not parsed_fname.endswith(".parsed.txt"):
-                continue
-
-            parsed_path = os.path.join(parsing_dir, parsed_fname)
-            chunked_fname = parsed_fname.replace(".parsed.txt", ".chunked.txt")
-            chunked_path = os.path.join(chunking_dir, chunked_fname)
+    async def _chunk_all_parsed_files(
+        self, sources: List[str], parsing_dir: str, chunking_dir: str
+    ) -> None:
+        """Chunk parsed files in parallel across a process pool.
 
-            if not self.config.force_reload:
-                if os.path.exists(chunked_path):
-                    logger.debug(f"✓ Already chunked {chunked_path}")
-                    continue
+        Token-based splitting is CPU-bound, so threads would serialise on the
+        GIL.  Each worker process builds its :class:`Chunker` once.
+        """
+        logger.info("Step 2/3 – Chunking parsed files…")
+        pending = self._pending(sources, "chunk")
+        self._begin_stage("chunk", len(pending))
+        if not pending:
+            return
+
+        with self._chunk_pool(self._chunk_workers(len(pending))) as pool:
+            tasks = [
+                asyncio.create_task(
+                    self._chunk_source(pool, source, parsing_dir, chunking_dir)
+                )
+                for source in pending
+            ]
+            for f in tqdm(asyncio.as_completed(tasks), total=len(tasks)):
+                await f
+        logger.info("✅  Chunking complete!")
+
+    def _chunk_workers(self, n_files: int) -> int:
+        return max(1, min(self.config.chunking.workers or os.cpu_count() or 1, n_files))
+
+    def _chunk_pool(self, workers: int) -> ProcessPoolExecutor:
+        logger.info(f"Chunking with {workers} worker processes")
+        # "spawn" avoids forking a process that already runs threads
+        return ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_chunk_worker,
+            initargs=(self.config,),
+        )
 
-            logger.info(f"Chunking     → {parsed_fname}")
-            self.chunker.chunk_file(parsed_path, chunked_path)
+    async def _chunk_source(
+        self,
+        pool: ProcessPoolExecutor,
+        source: str,
+        parsing_dir: str,
+        chunking_dir: str,
+    ) -> bool:
+        parsed_path = self._readable(self._parsed_path, parsing_dir, source)
+        chunked_path = self._chunked_path(chunking_dir, source)
+        started = time.perf_counter()
+        try:
+            n_chunks = await asyncio.get_running_loop().run_in_executor(
+                pool, _chunk_file_in_worker, parsed_path, chunked_path
+            )
+        except Exception as exc:  # noqa: BLE001
+            logger.error(f"⚠️  Failed to chunk {parsed_path}: {exc}")
+            self.manifest.set_status(source, "chunk", IndexManifest.FAILED)
+            self._advance_stage("chunk", started, failed=True, source=source)
+            return False
+        logger.info(f"Chunked      → {source} ({n_chunks} chunks)")
+        self.manifest.set_status(source, "chunk", IndexManifest.DONE)
+        self.manifest.set_status(source, "embed", IndexManifest.PENDING)
+        self._advance_stage("chunk", started)
+        return True
 
     # ------------------------------------------------------------------ #
     # STAGE 3 – EMBEDDING                                                #
     # ------------------------------------------------------------------ #
 
-    async def _embed_all_chunked_files(self, chunking_dir: str) -> None:
+    async def _embed_all_chunked_files(
+        self, sources: List[str], chunking_dir: str
+    ) -> None:
         logger.info("Step 3/3 – Embedding chunks into the vector store…")
-        tasks: List[asyncio.Task] = []
+        pending = self._pending(sources, "embed")
+        self._begin_stage("embed", len(pending))
 
-        for chunked_fname in os.listdir(chunking_dir):
-            if not chunked_fname.endswith(".chunked.txt"):
-                continue
+        semaphore = asyncio.Semaphore(self.pipeline_config.embed_concurrency)
 
-            chunked_path = os.path.join(chunking_dir, chunked_fname)
-            embedded_marker = f"{chunked_path}.embedded"
+        async def _worker(source: str):
+            async with semaphore:
+                await self._embed_source(source, chunking_dir)
 
-            if not self.config.force_reload:
-                if os.path.exists(embedded_marker):
-                    logger.debug(f"✓ Already embedded {chunked_path}")
-                    continue
+        if pending:
+            await asyncio.gather(*(_worker(source) for source in pending))
+        logger.info("✅  Embedding complete!")
 
-            docs = self._collect_docs_from_chunked(chunked_path)
+    async def _embed_source(self, source: str, chunking_dir: str) -> bool:
+        """Index the chunks of *source* and only then mark it as embedded."""
+        started = time.perf_counter()
+        chunked_path = self._readable(self._chunked_path, chunking_dir, source)
+        try:
+            docs, metadatas = await asyncio.to_thread(
+                self._collect_docs_from_chunked, chunked_path
+            )
             if not docs:
-                logger.warning(f"No chunks found in {chunked_fname}")
-                continue
+                logger.warning(f"No chunks found in {chunked_path}")
+            logger.info(f"Embedding {len(docs):>4} chunks from {source}")
+            await self.vector_store.add_documents(
+                docs, metadatas=metadatas, skip_existing=not self.config.force_reload
+            )
+        except Exception as exc:  # noqa: BLE001
+            logger.error(f"⚠️  Failed to embed {source}: {exc}")
+            self.manifest.set_status(source, "embed", IndexManifest.FAILED)
+            self._advance_stage("embed", started, failed=True, source=source)
+            return False
+
+        # Drop vectors this source no longer produces (and nobody else uses)
+        new_ids = {self.vector_store.chunk_id(doc) for doc in docs}
+        stale = [i for i in self.manifest.chunk_ids(source) if i not in new_ids]
+        await self.vector_store.delete(self.manifest.orphaned(source, stale))
+
+        self.manifest.set_chunk_ids(source, new_ids)
+        self.manifest.set_status(source, "embed", IndexManifest.DONE)
+        self._advance_stage("embed", started)
+        return True
+
+    async def _prune_unreferenced(self, sources: List[str]) -> None:
+        """Delete vectors no source references in the manifest.
+
+        These are left over from indexes built before chunk IDs were content
+        hashes (one document per file, random IDs).  Skipped while a source
+        is not embedded, since its IDs are only recorded once it is.
+        """
+        if any(self.manifest.status(s, "embed") != IndexManifest.DONE for s in sources):
+            logger.info("Not every source is embedded – skipping the prune")
+            return
+        referenced = await asyncio.to_thread(self.manifest.all_chunk_ids)
+        stored = await asyncio.to_thread(self.vector_store.ids)
+        unreferenced = [i for i in stored if i not in referenced]
+        if unreferenced:
+            logger.info(f"Pruning {len(unreferenced)} documents no source references")
+            await self.vector_store.delete(unreferenced)
 
-            logger.info(f"Embedding {len(docs):>4} chunks from {chunked_fname}")
+    # ------------------------------------------------------------------ #
+    # STREAMING MODE                                                     #
+    # ------------------------------------------------------------------ #
 
-            async def embed_and_mark(docs_snapshot: List[str]):
-                await self.vector_store.add_documents(docs_snapshot)
+    async def _stream_all_files(
+        self, sources: List[str], parsing_dir: str, chunking_dir: str
+    ) -> None:
+        """Run parse → chunk → embed as a streaming pipeline.
 
-            with open(embedded_marker, "w", encoding="utf-8") as fp:
-                fp.write("embedded")
+        Every file flows to the next stage as soon as it leaves the previous
+        one, through bounded queues: a slow stage fills its inbox and thereby
+        throttles the stages feeding it.  Files that only need a later stage
+        (e.g. re-chunking after a config change) enter the pipeline there.
+        """
+        logger.info("Streaming parse → chunk → embed…")
+        entry_points = {
+            stage: set(self._pending(sources, stage)) for stage in IndexManifest.STAGES
+        }
+        first_stage: Dict[str, str] = {}
+        for stage in reversed(IndexManifest.STAGES):
+            for source in entry_points[stage]:
+                first_stage[source] = stage
+        if not first_stage:
+            logger.info("✅  Nothing to index!")
+            return
+
+        # Stage totals: files entering at a stage plus those flowing into it
+        total = 0
+        for stage in IndexManifest.STAGES:
+            total += sum(1 for s in first_stage.values() if s == stage)
+            self._begin_stage(stage, total)
+        self.progress["stage"] = "streaming"
+
+        queue_size = self.pipeline_config.queue_size
+        parse_q: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        chunk_q: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        embed_q: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        inboxes = {"parse": parse_q, "chunk": chunk_q, "embed": embed_q}
+
+        parse_workers = self.pipeline_config.parse_concurrency
+        embed_workers = self.pipeline_config.embed_concurrency
+        chunk_workers = self._chunk_workers(self.progress["stages"]["chunk"]["total"])
+
+        with self._chunk_pool(chunk_workers) as pool:
+
+            async def _feed():
+                for source, stage in first_stage.items():
+                    await inboxes[stage].put(source)
+                for _ in range(parse_workers):
+                    await parse_q.put(None)
+
+            await asyncio.gather(
+                _feed(),
+                self._run_stream_stage(
+                    parse_q, chunk_q, chunk_workers, parse_workers,
+                    lambda source: self._parse_source(source, parsing_dir),
+                ),
+                self._run_stream_stage(
+                    chunk_q, embed_q, embed_workers, chunk_workers,
+                    lambda source: self._chunk_source(
+                        pool, source, parsing_dir, chunking_dir
+                    ),
+                ),
+                self._run_stream_stage(
+                    embed_q, None, 0, embed_workers,
+                    lambda source: self._embed_source(source, chunking_dir),
+                ),
+            )
+        logger.info("✅  Streaming indexing complete!")
 
-            tasks.append(asyncio.create_task(embed_and_mark(docs)))
+    @staticmethod
+    async def _run_stream_stage(
+        inbox: asyncio.Queue,
+        outbox: Optional[asyncio.Queue],
+        downstream_workers: int,
+        workers: int,
+        handler: Callable[[str], Awaitable[bool]],
+    ) -> None:
+        """Consume *inbox* with *workers* tasks, forwarding successes.
+
+        ``None`` is the end-of-stream marker: each worker stops on one, and
+        once all have stopped one marker per downstream worker is sent on.
+        """
 
-        if tasks:
-            await asyncio.gather(*tasks)
-        logger.info("✅  Embedding complete!")
+        async def _worker():
+            while True:
+                source = await inbox.get()
+                if source is None:
+                    return
+                if await handler(source) and outbox is not None:
+                    await outbox.put(source)
+
+        await asyncio.gather(*(_worker() for _ in range(workers)))
+        if outbox is not None:
+            for _ in range(downstream_workers):
+                await outbox.put(None)
 
     # ------------------------------------------------------------------ #
     # UTILITIES                                                          #
     # ------------------------------------------------------------------ #
 
+    def _begin_stage(self, stage: str, total: int) -> None:
+        self.progress["stage"] = stage
+        self.progress["stages"][stage] = {
+            "total": total,
+            "done": 0,
+            "failed": 0,
+            "failed_files": [],
+            "busy_seconds": 0.0,  # summed per-file processing time
+            "started_at": time.time(),
+            "last_finished_at": None,
+        }
+
+    def _advance_stage(
+        self, stage: str, started: float, failed: bool = False, source: str = ""
+    ) -> None:
+        """Count one finished file; *started* is its ``perf_counter`` start."""
+        seconds = time.perf_counter() - started
+        PIPELINE_FILES.inc(stage=stage, outcome="failed" if failed else "done")
+        PIPELINE_FILE_SECONDS.observe(seconds, stage=stage)
+        with self._progress_lock:
+            counters = self.progress["stages"].get(stage)
+            if counters is not None:
+                counters["failed" if failed else "done"] += 1
+                if failed:
+                    counters["failed_files"].append(source)
+                counters["busy_seconds"] += seconds
+                counters["last_finished_at"] = time.time()
+
+    def _finish(self) -> None:
+        """Set the final state: ``done``, or ``partial``/``failed`` when files failed.
+
+        A run with failures is ``failed`` when it embedded nothing at all.
+        """
+        stages = self.progress["stages"]
+        failed = {
+            stage: list(counters["failed_files"])
+            for stage, counters in stages.items()
+            if counters["failed"]
+        }
+        if not failed:
+            self.progress["state"] = "done"
+            return
+        embedded = stages.get("embed", {}).get("done", 0)
+        n_failed = len({source for sources in failed.values() for source in sources})
+        self.progress.update(
+            state="partial" if embedded else "failed",
+            failed_files=failed,
+            error=f"{n_failed} files failed to index",
+        )
+        logger.warning(f"⚠️  {n_failed} files failed to index: {failed}")
+
+    def _log_throughput(self) -> None:
+        """Log files/sec per stage over the stage's wall-clock time, and write throughput."""
+        for stage, counters in self.progress["stages"].items():
+            finished = counters["done"] + counters["failed"]
+            if not finished:
+                continue
+            wall = max(counters["last_finished_at"] - counters["started_at"], 1e-9)
+            counters["files_per_sec"] = round(counters["done"] / wall, 3)
+            logger.info(
+                f"[{stage}] {counters['done']}/{counters['total']} files "
+                f"({counters['failed']} failed) in {wall:.1f}s → "
+                f"{counters['files_per_sec']} files/s, "
+                f"busy {counters['busy_seconds']:.1f}s"
+            )
+
+        writes = self.vector_store.writer.stats()
+        self.progress["writes"] = writes
+        if writes["commits"]:
+            logger.info(
+                f"[write] {writes['documents']} documents in {writes['commits']} commits "
+                f"({writes['docs_per_commit']} per commit) → "
+                f"{writes['docs_per_sec']} documents/s, busy {writes['commit_seconds']}s"
+            )
+
+    def _config_hash(self) -> str:
+        """Hash of every setting that changes chunk boundaries or vectors."""
+        chunking = self.config.chunking
+        settings = {
+            "chunk_size": chunking.chunk_size,
+            "overlap": chunking.overlap,
+            "chunk_type": chunking.chunk_type,
+            "model": self.config.llm.model,
+            "embedding_model": embedding_model_name(self.config),
+        }
+        payload = json.dumps(settings, sort_keys=True).encode("utf-8")
+        return hashlib.sha256(payload).hexdigest()
+
+    @staticmethod
+    def _file_hash(path: str) -> str:
+        digest = hashlib.sha256()
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                digest.update(block)
+        return digest.hexdigest()
+
+    @staticmethod
+    def _output_name(source: str) -> str:
+        """File name for the outputs of *source*, unique per relative path.
+
+        Sources in sub-directories of ``exams_path`` get their directories
+        escaped into the name (``a/exam.pdf`` → ``a%2Fexam.pdf``), so equally
+        named files in different directories never share outputs.
+        """
+        name = source.replace("%", "%25")
+        for sep in filter(None, (os.sep, os.altsep)):
+            name = name.replace(sep, "%2F")
+        return name
+
+    @classmethod
+    def _parsed_path(cls, parsing_dir: str, source: str, legacy: bool = False) -> str:
+        extension = LEGACY_PARSED_EXTENSION if legacy else PARSED_EXTENSION
+        return os.path.join(parsing_dir, f"{cls._output_name(source)}{extension}")
+
+    @classmethod
+    def _chunked_path(cls, chunking_dir: str, source: str, legacy: bool = False) -> str:
+        extension = ".chunked.txt" if legacy else ".chunked.jsonl"
+        return os.path.join(chunking_dir, f"{cls._output_name(source)}{extension}")
+
+    @staticmethod
+    def _readable(path_of: Callable[..., str], directory: str, source: str) -> str:
+        """*path_of* output of *source*, or its pre-JSONL file if only that exists."""
+        path = path_of(directory, source)
+        legacy = path_of(directory, source, legacy=True)
+        return legacy if not os.path.exists(path) and os.path.exists(legacy) else path
+
     @staticmethod
-    def _collect_docs_from_chunked(chunked_path: str) -> List[str]:
-        """Return a list of text chunks separated by a line containing only '---'."""
+    def _collect_docs_from_chunked(chunked_path: str) -> Tuple[List[str], List[dict]]:
+        """Return the chunks of a chunk file and the page metadata of each."""
         docs: List[str] = []
-        with open(chunked_path, "r", encoding="utf-8") as cf:
-            chunk = ""
-            for line in cf:
-                if line.strip() == "---":  # newline delimiter
-                    if chunk.strip():
-                        docs.append(chunk.strip())
-                    chunk = ""
-                else:
-                    chunk += line
-            if chunk.strip():  # final chunk
-                docs.append(chunk.strip())
-        return ["\n".join(docs)]
+        metadatas: List[dict] = []
+        for chunk, pages in read_chunks(chunked_path):
+            docs.append(chunk)
+            metadatas.append(
+                {"page_start": min(pages), "page_end": max(pages)} if pages else {}
+            )
+        return docs, metadatas
+
+
+# ---------------------------------------------------------------------- #
+# CHUNKING WORKER PROCESSES                                              #
+# ---------------------------------------------------------------------- #
+
+_worker_chunker: Optional[Chunker] = None
+
+
+def _init_chunk_worker(config: AppConfig) -> None:
+    """Process-pool initializer: build one :class:`Chunker` per worker."""
+    global _worker_chunker
+    _worker_chunker = Chunker(config)
+
+
+def _chunk_file_in_worker(parsed_path: str, chunked_path: str) -> int:
+    return _worker_chunker.chunk_file(parsed_path, chunked_path)
 
 
 # ---------------------------------------------------------------------- #
@@ -0,0 +1,163 @@
+"""
+SQLite manifest recording what each exam source has gone through.
+
+For every source file the manifest keeps the content hash it was processed
+from, the hash of the chunking/indexing configuration, and a status per
+pipeline stage (parse → chunk → embed).  It also remembers which vector IDs
+each source contributed so vectors can be removed when a source changes or
+disappears.
+"""
+
+from __future__ import annotations
+
+import os
+import sqlite3
+import threading
+import time
+from typing import Iterable, List, Optional
+
+
+class IndexManifest:
+    STAGES = ("parse", "chunk", "embed")
+
+    PENDING = "pending"
+    DONE = "done"
+    FAILED = "failed"
+
+    def __init__(self, path: str):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.path = path
+        # Stages run in worker threads, so share one connection behind a lock
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        with self._lock, self._conn:
+            self._conn.executescript(
+                """
+                CREATE TABLE IF NOT EXISTS files (
+                    source       TEXT PRIMARY KEY,
+                    source_hash  TEXT NOT NULL,
+                    config_hash  TEXT NOT NULL,
+                    parse_status TEXT NOT NULL,
+                    chunk_status TEXT NOT NULL,
+                    embed_status TEXT NOT NULL,
+                    updated_at   REAL NOT NULL
+                );
+                CREATE TABLE IF NOT EXISTS chunks (
+                    source   TEXT NOT NULL,
+                    chunk_id TEXT NOT NULL,
+                    PRIMARY KEY (source, chunk_id)
+                );
+                CREATE INDEX IF NOT EXISTS chunks_by_id ON chunks (chunk_id);
+                """
+            )
+
+    # ------------------------------------------------------------------ #
+    # FILES                                                              #
+    # ------------------------------------------------------------------ #
+
+    def get(self, source: str) -> Optional[dict]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT * FROM files WHERE source = ?", (source,)
+            ).fetchone()
+        return dict(row) if row else None
+
+    def sources(self) -> List[str]:
+        with self._lock:
+            rows = self._conn.execute("SELECT source FROM files").fetchall()
+        return [row["source"] for row in rows]
+
+    def track(
+        self,
+        source: str,
+        source_hash: str,
+        config_hash: str,
+        parsed: bool = False,
+    ) -> None:
+        """Register *source* and reset the stages its hashes invalidate.
+
+        A new or modified source restarts from parsing (unless *parsed* says
+        an up-to-date parse output already exists); a configuration change
+        only restarts chunking and embedding.
+        """
+        entry = self.get(source)
+        if entry is None or entry["source_hash"] != source_hash:
+            parse_status = self.DONE if parsed and entry is None else self.PENDING
+            self._write(
+                source, source_hash, config_hash,
+                parse_status, self.PENDING, self.PENDING,
+            )
+        elif entry["config_hash"] != config_hash:
+            self._write(
+                source, source_hash, config_hash,
+                entry["parse_status"], self.PENDING, self.PENDING,
+            )
+
+    def _write(self, source, source_hash, config_hash, parse, chunk, embed) -> None:
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (source, source_hash, config_hash, parse, chunk, embed, time.time()),
+            )
+
+    def status(self, source: str, stage: str) -> Optional[str]:
+        entry = self.get(source)
+        return entry[f"{self._check_stage(stage)}_status"] if entry else None
+
+    def set_status(self, source: str, stage: str, status: str) -> None:
+        column = f"{self._check_stage(stage)}_status"
+        with self._lock, self._conn:
+            self._conn.execute(
+                f"UPDATE files SET {column} = ?, updated_at = ? WHERE source = ?",
+                (status, time.time(), source),
+            )
+
+    def remove(self, source: str) -> None:
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM files WHERE source = ?", (source,))
+            self._conn.execute("DELETE FROM chunks WHERE source = ?", (source,))
+
+    @classmethod
+    def _check_stage(cls, stage: str) -> str:
+        if stage not in cls.STAGES:
+            raise ValueError(f"Unknown stage: {stage}. Expected one of {cls.STAGES}")
+        return stage
+
+    # ------------------------------------------------------------------ #
+    # CHUNK IDS                                                          #
+    # ------------------------------------------------------------------ #
+
+    def chunk_ids(self, source: str) -> List[str]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT chunk_id FROM chunks WHERE source = ?", (source,)
+            ).fetchall()
+        return [row["chunk_id"] for row in rows]
+
+    def set_chunk_ids(self, source: str, chunk_ids: Iterable[str]) -> None:
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM chunks WHERE source = ?", (source,))
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO chunks VALUES (?, ?)",
+                ((source, chunk_id) for chunk_id in chunk_ids),
+            )
+
+    def all_chunk_ids(self) -> set[str]:
+        """Every chunk ID referenced by some source."""
+        with self._lock:
+            rows = self._conn.execute("SELECT DISTINCT chunk_id FROM chunks").fetchall()
+        return {row["chunk_id"] for row in rows}
+
+    def orphaned(self, source: str, chunk_ids: Iterable[str]) -> List[str]:
+        """Return the *chunk_ids* no source other than *source* references."""
+        with self._lock:
+            return [
+                chunk_id
+                for chunk_id in chunk_ids
+                if self._conn.execute(
+                    "SELECT 1 FROM chunks WHERE chunk_id = ? AND source != ? LIMIT 1",
+                    (chunk_id, source),
+                ).fetchone()
+                is None
+            ]
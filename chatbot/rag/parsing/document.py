@@ -0,0 +1,138 @@
+"""
+Page-aware parsed-document format.
+
+A parsed document is a JSON Lines file: a header, then one record per page
+with its lines and the character offset at which the page starts in the
+document text (lines joined by a newline, pages by a blank line)::
+
+    {"format": "edumind.parsed", "version": 1, "source": "exam.pdf", "pages": 2, "chars": 61}
+    {"page": 1, "offset": 0, "lines": ["BACCALAUREATE 2023", "Mathematics"]}
+    {"page": 2, "offset": 32, "lines": ["Exercise 1 (4 points)", "Solve x + 1 = 0"]}
+
+Readers memory-map the file and decode one page at a time, so whole
+documents are never copied around as strings, and a document can be
+re-chunked without being parsed again.  Files in the older ``.parsed.txt``
+format (pages joined by ``"\\n\\n"``) can still be read; their page numbers
+are recovered from the blank lines.
+"""
+
+from __future__ import annotations
+
+import bisect
+import json
+import mmap
+import os
+from dataclasses import dataclass
+from typing import Iterable, Iterator, List, Sequence, Tuple
+
+FORMAT = "edumind.parsed"
+VERSION = 1
+EXTENSION = ".parsed.jsonl"
+LEGACY_EXTENSION = ".parsed.txt"
+PAGE_SEPARATOR = "\n\n"
+
+
+@dataclass(frozen=True)
+class ParsedPage:
+    number: int  # 1-based page number in the source document
+    offset: int  # character offset of the page in the document text
+    lines: Tuple[str, ...]
+
+    @property
+    def text(self) -> str:
+        return "\n".join(self.lines)
+
+    @property
+    def end(self) -> int:
+        return self.offset + len(self.text)
+
+
+def build_pages(pages: Iterable[Tuple[int, Sequence[str]]]) -> List[ParsedPage]:
+    """Lay out ``(page_number, lines)`` pairs, in order, as :class:`ParsedPage`."""
+    built: List[ParsedPage] = []
+    offset = 0
+    for number, lines in pages:
+        page = ParsedPage(number, offset, tuple(lines))
+        built.append(page)
+        offset = page.end + len(PAGE_SEPARATOR)
+    return built
+
+
+def write_parsed_document(
+    path: str, pages: Iterable[Tuple[int, Sequence[str]]], source: str = ""
+) -> int:
+    """Write ``(page_number, lines)`` pairs to *path*; returns the page count.
+
+    The file is written to a temporary path and renamed into place, so
+    readers never see a partially written document.
+    """
+    built = build_pages(pages)
+    header = {
+        "format": FORMAT,
+        "version": VERSION,
+        "source": source,
+        "pages": len(built),
+        "chars": built[-1].end if built else 0,
+    }
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(json.dumps(header, ensure_ascii=False) + "\n")
+            for page in built:
+                record = {"page": page.number, "offset": page.offset, "lines": page.lines}
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return len(built)
+
+
+def read_parsed_pages(path: str) -> Iterator[ParsedPage]:
+    """Yield the pages of the parsed document at *path*, in order."""
+    if path.endswith(LEGACY_EXTENSION):
+        yield from _read_legacy(path)
+        return
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            header = json.loads(mapped.readline())
+            if header.get("format") != FORMAT:
+                raise ValueError(f"{path} is not a parsed document")
+            for line in iter(mapped.readline, b""):
+                record = json.loads(line)
+                yield ParsedPage(record["page"], record["offset"], tuple(record["lines"]))
+
+
+def _read_legacy(path: str) -> Iterator[ParsedPage]:
+    with open(path, "r", encoding="utf-8") as f:
+        text = f.read()
+    yield from build_pages(
+        (number, page.split("\n"))
+        for number, page in enumerate(text.split(PAGE_SEPARATOR), 1)
+    )
+
+
+def document_text(pages: Iterable[ParsedPage]) -> str:
+    """The document text the page offsets refer to."""
+    return PAGE_SEPARATOR.join(page.text for page in pages)
+
+
+class PageLocator:
+    """Maps character spans of the document text back to page numbers."""
+
+    def __init__(self, pages: Sequence[ParsedPage]):
+        self._starts = [page.offset for page in pages]
+        self._pages = list(pages)
+
+    def pages(self, start: int, end: int) -> List[int]:
+        """Numbers of the pages overlapping the text span ``[start, end)``."""
+        first = max(bisect.bisect_right(self._starts, start) - 1, 0)
+        numbers = []
+        for page in self._pages[first:]:
+            if page.offset >= end:
+                break
+            if page.end > start or page.offset == start:
+                numbers.append(page.number)
+        return numbers
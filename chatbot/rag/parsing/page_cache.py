@@ -0,0 +1,87 @@
+"""
+Disk-backed cache of parsed PDF pages.
+
+Pages are keyed by the SHA-256 of the PDF's bytes and their page number, so
+a document is never sent for analysis twice, whatever its file name or
+location, and a partly analysed document only needs its missing pages.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import os
+import sqlite3
+import threading
+from typing import Dict, Iterable, Optional, Tuple
+
+
+def pdf_sha256(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+class PageCache:
+    def __init__(self, path: str):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS documents (
+                    sha        TEXT PRIMARY KEY,
+                    page_count INTEGER NOT NULL
+                )
+                """
+            )
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS pages (
+                    sha    TEXT NOT NULL,
+                    page   INTEGER NOT NULL,
+                    text   TEXT NOT NULL,
+                    engine TEXT NOT NULL,
+                    PRIMARY KEY (sha, page)
+                )
+                """
+            )
+
+    def page_count(self, sha: str) -> Optional[int]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT page_count FROM documents WHERE sha = ?", (sha,)
+            ).fetchone()
+        return row[0] if row else None
+
+    def pages(self, sha: str) -> Dict[int, str]:
+        """Cached pages of the document, by 1-based page number."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT page, text FROM pages WHERE sha = ?", (sha,)
+            ).fetchall()
+        return dict(rows)
+
+    def put(
+        self,
+        sha: str,
+        pages: Iterable[Tuple[int, str]],
+        engine: str,
+        page_count: Optional[int] = None,
+    ) -> None:
+        """Store ``(page_number, text)`` pairs analysed by *engine*."""
+        rows = [(sha, page, text, engine) for page, text in pages]
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO pages (sha, page, text, engine) VALUES (?, ?, ?, ?)",
+                rows,
+            )
+            if page_count is not None:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO documents (sha, page_count) VALUES (?, ?)",
+                    (sha, page_count),
+                )
+
+    def stats(self) -> dict:
+        with self._lock:
+            documents = self._conn.execute("SELECT COUNT(*) FROM documents").fetchone()[0]
+            pages = self._conn.execute("SELECT COUNT(*) FROM pages").fetchone()[0]
+        return {"documents": documents, "pages": pages}
@@ -1,50 +1,277 @@
 """
-PDFParser using OpenAI GPT-4o vision API for robust PDF extraction.
+PDF text extraction: the embedded text layer first, Azure Document
+Intelligence for the pages where it is missing or unusable.
+
+Each page's text layer is extracted with pypdf in a process pool and scored
+(:func:`text_quality`); only pages scoring below
+``parsing.min_text_quality`` are sent to Azure.  Parsed pages are cached by
+the PDF's SHA-256 (see :class:`PageCache`), so re-parsing a known document
+costs no work at all.  Azure page ranges of at most
+``parsing.pages_per_request`` pages are analysed concurrently with the async
+client, then all pages are reassembled in page order and saved as a
+page-aware parsed document (see :mod:`chatbot.rag.parsing.document`).
 """
 
+import asyncio
+import io
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, List, Optional
+
 from openai import OpenAI
-from azure.ai.formrecognizer import DocumentAnalysisClient
+from azure.ai.formrecognizer.aio import DocumentAnalysisClient
 from azure.core.credentials import AzureKeyCredential
 from loguru import logger
-from tqdm import tqdm
+from pypdf import PdfReader
+from chatbot.rag.parsing.document import PAGE_SEPARATOR, write_parsed_document
+from chatbot.rag.parsing.page_cache import PageCache, pdf_sha256
+from chatbot.rag.parsing.text_layer import score_text_pages
+from chatbot.telemetry import PDF_PAGES, span
 from config_loader import AppConfig
 
 
+def count_pdf_pages(data: bytes) -> Optional[int]:
+    """Number of pages of the PDF in *data*, or None if it cannot be read."""
+    try:
+        return len(PdfReader(io.BytesIO(data), strict=False).pages)
+    except Exception as e:  # noqa: BLE001 – such PDFs are analysed whole
+        logger.debug(f"Could not count PDF pages: {e}")
+        return None
+
+
+def page_ranges(pages: List[int], max_pages: int) -> List[str]:
+    """Group sorted page numbers into Azure ``pages`` ranges like ``"1-4"``."""
+    ranges: List[List[int]] = []
+    for page in pages:
+        if ranges and page == ranges[-1][-1] + 1 and len(ranges[-1]) < max_pages:
+            ranges[-1].append(page)
+        else:
+            ranges.append([page])
+    return [f"{r[0]}-{r[-1]}" if len(r) > 1 else str(r[0]) for r in ranges]
+
+
+def _read_bytes(path) -> bytes:
+    with open(path, "rb") as f:
+        return f.read()
+
+
 class PDFParser:
-    def __init__(self, config: AppConfig):
+    def __init__(
+        self, config: AppConfig, azure_client: Optional[DocumentAnalysisClient] = None
+    ):
+        """
+        Args:
+            azure_client: Async Document Intelligence client to use; by default
+                one is opened per document from the configured endpoint and key.
+        """
         self.config = config
+        self.parsing_config = config.parsing
         self.api_key = config.api.openai_api_key
         self.client = OpenAI(api_key=self.api_key)
         self.azure_endpoint = config.api.azure_formrecognizer_endpoint
         self.azure_key = config.api.azure_formrecognizer_key
-        self.azure_client = DocumentAnalysisClient(
-            self.azure_endpoint, AzureKeyCredential(self.azure_key)
-        )
+        self.azure_client = azure_client
+        cache_path = self.parsing_config.cache_path
+        self.cache: Optional[PageCache] = PageCache(cache_path) if cache_path else None
+        self._pool: Optional[ProcessPoolExecutor] = None
 
     def parse(self, pdf_path):
-        return self._parse_with_azure(pdf_path)
+        """Blocking variant of :meth:`aparse`, for use outside an event loop."""
+        return asyncio.run(self.aparse(pdf_path))
 
-    def _parse_with_azure(self, pdf_path):
-        if not self.azure_client:
-            raise RuntimeError("Azure Document Intelligence client not initialized.")
+    async def aparse(self, pdf_path) -> str:
+        """Text of the PDF, pages separated by a blank line."""
         try:
-            with open(pdf_path, "rb") as f:
-                poller = self.azure_client.begin_analyze_document(
-                    "prebuilt-document", document=f
-                )
-                result = poller.result()
-            all_text = []
-            for page in tqdm(result.pages, desc=(f"Parsing Azure pages in {pdf_path}")):
-                page_lines = [line.content for line in page.lines]
-                all_text.append(" ".join(page_lines))
-            return "\n\n".join(all_text)
+            pages = await self.aparse_pages(pdf_path)
         except Exception as e:
             logger.error(f"Azure Document Intelligence error: {e}")
             return f"[Azure Document Intelligence error: {e}]"
+        return PAGE_SEPARATOR.join(pages[p] for p in sorted(pages))
+
+    async def aparse_pages(self, pdf_path) -> Dict[int, str]:
+        """Text of every page of the PDF (lines separated by newlines), by page number."""
+        data = await asyncio.to_thread(_read_bytes, pdf_path)
+        sha = pdf_sha256(data)
+        pages: Dict[int, str] = {}
+        page_count = None
+        if self.cache:
+            pages = await asyncio.to_thread(self.cache.pages, sha)
+            page_count = await asyncio.to_thread(self.cache.page_count, sha)
+        if page_count is not None and len(pages) >= page_count:
+            logger.info(f"Parse cache hit ({page_count} pages) → {pdf_path}")
+            PDF_PAGES.inc(page_count, source="cache")
+            return pages
+        PDF_PAGES.inc(len(pages), source="cache")
+
+        local = None
+        if self.parsing_config.local_text_layer:
+            local = await self._parse_text_layer(pdf_path, sha, pages)
+            if local is not None:
+                page_count = len(local)
+        missing = (
+            [p for p in range(1, page_count + 1) if p not in pages]
+            if page_count is not None
+            else None
+        )
+        if missing == []:
+            return pages
+
+        if local is not None and not self._azure_configured():
+            logger.warning(
+                f"Keeping the text layer of {len(missing)} low-quality pages of "
+                f"{pdf_path}: Azure Document Intelligence is not configured"
+            )
+            # Not cached, so the pages are analysed once Azure is set up
+            pages.update({p: local[p - 1] for p in missing})
+            PDF_PAGES.inc(len(missing), source="local_fallback")
+        else:
+            pages.update(
+                await self._parse_with_azure(pdf_path, data, sha, missing, page_count)
+            )
+        return pages
+
+    # ------------------------------------------------------------------ #
+    # LOCAL TEXT LAYER                                                   #
+    # ------------------------------------------------------------------ #
+
+    def _local_pool(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            workers = self.parsing_config.local_workers or os.cpu_count() or 1
+            # "spawn" avoids forking a process that already runs threads
+            self._pool = ProcessPoolExecutor(
+                max_workers=workers, mp_context=multiprocessing.get_context("spawn")
+            )
+        return self._pool
+
+    def close(self) -> None:
+        """Stop the text-layer worker processes; they restart on demand."""
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+
+    async def _parse_text_layer(
+        self, pdf_path, sha: str, pages: Dict[int, str]
+    ) -> Optional[List[str]]:
+        """Add the pages whose text layer is good enough to *pages* (and the cache).
+
+        Returns every page's text layer, or None if the PDF cannot be read.
+        """
+        with span("pdf_text_layer"):
+            scored = await asyncio.get_running_loop().run_in_executor(
+                self._local_pool(),
+                score_text_pages,
+                str(pdf_path),
+                self.parsing_config.min_page_chars,
+            )
+        if scored is None:
+            return None
+        good = {
+            number: text
+            for number, (text, quality) in enumerate(scored, 1)
+            if number not in pages and quality >= self.parsing_config.min_text_quality
+        }
+        if self.cache:
+            await asyncio.to_thread(self.cache.put, sha, good.items(), "local", len(scored))
+        pages.update(good)
+        PDF_PAGES.inc(len(good), source="local")
+        logger.info(
+            f"Text layer of {pdf_path}: {len(good)} of {len(scored)} pages usable"
+        )
+        return [text for text, _ in scored]
+
+    # ------------------------------------------------------------------ #
+    # AZURE DOCUMENT INTELLIGENCE                                        #
+    # ------------------------------------------------------------------ #
+
+    def _azure_configured(self) -> bool:
+        return self.azure_client is not None or bool(self.azure_endpoint and self.azure_key)
+
+    @asynccontextmanager
+    async def _azure(self) -> AsyncIterator[DocumentAnalysisClient]:
+        if self.azure_client is not None:
+            yield self.azure_client
+            return
+        if not self._azure_configured():
+            raise RuntimeError("Azure Document Intelligence client not initialized.")
+        async with DocumentAnalysisClient(
+            self.azure_endpoint, AzureKeyCredential(self.azure_key)
+        ) as client:
+            yield client
+
+    async def _parse_with_azure(
+        self,
+        pdf_path,
+        data: bytes,
+        sha: str,
+        missing: Optional[List[int]],
+        page_count: Optional[int],
+    ) -> Dict[int, str]:
+        """Analyse the *missing* pages (None: the whole document) with Azure."""
+        if missing is None:
+            page_count = await asyncio.to_thread(count_pdf_pages, data)
+            if page_count is not None:
+                missing = list(range(1, page_count + 1))
+        ranges: List[Optional[str]] = (
+            page_ranges(missing, self.parsing_config.pages_per_request)
+            if missing is not None
+            else [None]  # unreadable locally: send the whole document
+        )
+        logger.info(
+            f"Analysing {pdf_path} with Azure "
+            f"({len(missing) if missing is not None else 'all'} pages, {len(ranges)} requests)"
+        )
+        semaphore = asyncio.Semaphore(self.parsing_config.range_concurrency)
+        async with self._azure() as client:
+            results = await asyncio.gather(*(
+                self._analyze_range(client, semaphore, data, sha, range_, page_count)
+                for range_ in ranges
+            ))
+        pages: Dict[int, str] = {}
+        for result in results:
+            pages.update(result)
+        PDF_PAGES.inc(len(pages), source="azure")
+        return pages
+
+    async def _analyze_range(
+        self,
+        client: DocumentAnalysisClient,
+        semaphore: asyncio.Semaphore,
+        data: bytes,
+        sha: str,
+        pages: Optional[str],
+        page_count: Optional[int],
+    ) -> Dict[int, str]:
+        """Analyse the page range *pages* (None: all) and cache its pages."""
+        kwargs = {"pages": pages} if pages else {}
+        async with semaphore:
+            with span("azure_analyze"):
+                poller = await client.begin_analyze_document(
+                    self.parsing_config.azure_model, document=data, **kwargs
+                )
+                result = await poller.result()
+        texts = {
+            page.page_number: "\n".join(line.content for line in page.lines)
+            for page in result.pages
+        }
+        if self.cache:
+            await asyncio.to_thread(
+                self.cache.put, sha, texts.items(), "azure", page_count or len(texts)
+            )
+        return texts
 
     def parse_and_save(self, input_path, output_path):
-        """Parse PDF and save extracted text to output_path."""
-        logger.info(f"Saving parsed text to {output_path}")
-        text = self.parse(input_path)
-        with open(output_path, "w", encoding="utf-8") as f:
-            f.write(text)
+        """Parse PDF and save its pages as a parsed document to output_path."""
+        asyncio.run(self.aparse_and_save(input_path, output_path))
+
+    async def aparse_and_save(self, input_path, output_path):
+        """Async variant of :meth:`parse_and_save`."""
+        pages = await self.aparse_pages(input_path)
+        logger.info(f"Saving {len(pages)} parsed pages to {output_path}")
+        await asyncio.to_thread(
+            write_parsed_document,
+            output_path,
+            [(number, pages[number].split("\n")) for number in sorted(pages)],
+            os.path.basename(str(input_path)),
+        )
@@ -0,0 +1,77 @@
+"""
+Local extraction of a PDF's embedded text layer, with a per-page quality score.
+
+Most exam PDFs are generated digitally and carry usable text; only scanned
+pages (no text) and pages whose fonts do not map to Unicode (``(cid:12)``
+runs, private-use or replacement characters, visually ordered Arabic
+presentation forms) need OCR.  :func:`text_quality` tells them apart.
+
+This module only depends on ``pypdf`` so it stays cheap to import in the
+parser's worker processes.
+"""
+
+from __future__ import annotations
+
+import re
+import unicodedata
+from typing import List, Optional, Tuple
+
+from pypdf import PdfReader
+
+_CID = re.compile(r"\(cid:\d+\)")
+# Arabic presentation forms: glyph codes in visual order, not logical text
+_PRESENTATION_FORMS = re.compile("[\ufb50-\ufdff\ufe70-\ufeff]")
+# Longer "words" are usually lines extracted without their spaces
+MAX_WORD_CHARS = 30
+
+
+def extract_text_pages(path: str) -> Optional[List[str]]:
+    """Text of every page of the PDF at *path*, or None if it cannot be read.
+
+    Each page's non-blank lines are joined with newlines, like the Azure output.
+    """
+    try:
+        reader = PdfReader(path, strict=False)
+        pages = []
+        for page in reader.pages:
+            try:
+                text = page.extract_text() or ""
+            except Exception:  # noqa: BLE001 – one broken page goes to OCR
+                text = ""
+            pages.append("\n".join(line.strip() for line in text.splitlines() if line.strip()))
+        return pages
+    except Exception:  # noqa: BLE001 – unreadable PDFs are analysed with Azure
+        return None
+
+
+def score_text_pages(path: str, min_chars: int = 40) -> Optional[List[Tuple[str, float]]]:
+    """``(text, quality)`` of every page; run in a worker process."""
+    pages = extract_text_pages(path)
+    if pages is None:
+        return None
+    return [(text, text_quality(text, min_chars)) for text in pages]
+
+
+def text_quality(text: str, min_chars: int = 40) -> float:
+    """Score in [0, 1] of how usable an extracted page text is.
+
+    Pages with fewer than *min_chars* visible characters score 0 (scanned
+    or image-only).  Otherwise the score is the share of visible characters
+    that are not garbage, times the share that sits in plausible words.
+    """
+    visible = sum(1 for c in text if not c.isspace())
+    if visible < min_chars:
+        return 0.0
+    cleaned = _CID.sub("\ufffd", text)  # one bad glyph per CID
+    bad = cleaned.count("\ufffd")
+    bad += len(_PRESENTATION_FORMS.findall(cleaned))
+    bad += sum(
+        1 for c in cleaned
+        if not c.isspace() and unicodedata.category(c) in ("Cc", "Co", "Cn")
+    )
+    visible = sum(1 for c in cleaned if not c.isspace())
+    clean_share = max(0.0, 1.0 - bad / visible)
+
+    words = cleaned.split()
+    in_words = sum(len(w) for w in words if len(w) <= MAX_WORD_CHARS)
+    return clean_share * in_words / visible
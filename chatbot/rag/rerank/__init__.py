@@ -0,0 +1 @@
+from .reranker import EmbeddingReranker
@@ -0,0 +1,77 @@
+"""
+Local reranking of retrieved chunks against a short topic description.
+
+Chunks are scored by cosine similarity between their full text (the
+``full_chunk`` metadata, not the short ``branch | subject | title`` string
+used for retrieval) and the topic.  Chunk vectors are cached by the
+embedding cache, so a chunk retrieved again is not embedded again.
+Optionally, maximal marginal relevance trades a little relevance for less
+redundancy among the passages kept.
+"""
+
+from __future__ import annotations
+
+from typing import List, Sequence
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+
+
+class EmbeddingReranker:
+    def __init__(
+        self,
+        embeddings: Embeddings,
+        top_n: int = 3,
+        mmr: bool = True,
+        mmr_lambda: float = 0.7,
+    ):
+        self.embeddings = embeddings
+        self.top_n = top_n
+        self.mmr = mmr
+        self.mmr_lambda = mmr_lambda
+
+    @staticmethod
+    def _unit(vectors: Sequence[Sequence[float]]) -> np.ndarray:
+        matrix = np.asarray(vectors, dtype=np.float32)
+        norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+        return matrix / np.maximum(norms, 1e-12)
+
+    @staticmethod
+    def _passage(doc: Document) -> str:
+        """The text a chunk is scored on: its full text when stored."""
+        return doc.metadata.get("full_chunk") or doc.page_content
+
+    def _select(self, relevance: np.ndarray, docs_matrix: np.ndarray, n: int) -> List[int]:
+        """Indices of the *n* passages to keep, best first."""
+        if not self.mmr:
+            return np.argsort(-relevance, kind="stable")[:n].tolist()
+
+        similarity = docs_matrix @ docs_matrix.T
+        selected: List[int] = []
+        # Highest similarity of every candidate to anything already selected
+        redundancy = np.full(len(relevance), -np.inf, dtype=np.float32)
+        available = np.ones(len(relevance), dtype=bool)
+        for _ in range(n):
+            penalty = np.where(np.isfinite(redundancy), redundancy, 0.0)
+            score = self.mmr_lambda * relevance - (1 - self.mmr_lambda) * penalty
+            score[~available] = -np.inf
+            best = int(np.argmax(score))
+            selected.append(best)
+            available[best] = False
+            redundancy = np.maximum(redundancy, similarity[best])
+        return selected
+
+    async def rerank(
+        self, query: str, docs: List[Document], top_n: int | None = None
+    ) -> List[Document]:
+        """Return the *top_n* of *docs* most relevant to *query*."""
+        n = min(top_n or self.top_n, len(docs))
+        if n == 0:
+            return []
+        query_vector = self._unit(await self.embeddings.aembed_query(query))
+        docs_matrix = self._unit(
+            await self.embeddings.aembed_documents([self._passage(doc) for doc in docs])
+        )
+        relevance = docs_matrix @ query_vector
+        return [docs[i] for i in self._select(relevance, docs_matrix, n)]
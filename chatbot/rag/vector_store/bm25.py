@@ -0,0 +1,241 @@
+"""Okapi BM25 inverted index over chunk text.
+
+The persisted index is a CSR layout of NumPy arrays (``offsets`` into the
+``docs``/``tfs`` posting arrays, one row per term) that is memory-mapped on
+load.  Documents added afterwards go into an in-memory delta that is merged
+into a fresh set of arrays on :meth:`BM25Index.persist`.  Persisting
+rebuilds every array, so callers batch many changes per persist
+(see :attr:`BM25Index.pending`).
+"""
+from __future__ import annotations
+
+import json
+import os
+import shutil
+import threading
+from collections import Counter, defaultdict
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+import numpy as np
+
+from chatbot.rag.vector_store.query_meta import normalize
+
+_ARRAYS = ("offsets", "docs", "tfs", "doc_len")
+
+
+def tokenize(text: str) -> List[str]:
+    return normalize(text).split()
+
+
+class BM25Index:
+    """Incrementally built BM25 index keyed by document ID."""
+
+    def __init__(self, path: str, k1: float = 1.5, b: float = 0.75):
+        self.path = path
+        self.k1 = k1
+        self.b = b
+        self._lock = threading.RLock()
+        self._load()
+
+    # ----------------------------- Persistence ---------------------------- #
+    def _load(self) -> None:
+        index_file = os.path.join(self.path, "index.json")
+        if os.path.exists(index_file):
+            with open(index_file, encoding="utf-8") as f:
+                meta = json.load(f)
+            terms, doc_ids = meta["terms"], meta["doc_ids"]
+            arrays = {
+                name: np.load(os.path.join(self.path, f"{name}.npy"), mmap_mode="r")
+                for name in _ARRAYS
+            }
+        else:
+            terms, doc_ids = [], []
+            arrays = {
+                "offsets": np.zeros(1, dtype=np.int64),
+                "docs": np.zeros(0, dtype=np.int32),
+                "tfs": np.zeros(0, dtype=np.float32),
+                "doc_len": np.zeros(0, dtype=np.int32),
+            }
+
+        self._terms: Dict[str, int] = {t: i for i, t in enumerate(terms)}
+        self._term_list: List[str] = list(terms)
+        self._offsets = arrays["offsets"]
+        self._docs = arrays["docs"]
+        self._tfs = arrays["tfs"]
+        self._base_len = arrays["doc_len"]
+        self._doc_ids: List[str] = list(doc_ids)
+        self._doc_index: Dict[str, int] = {d: i for i, d in enumerate(doc_ids)}
+        self._alive = np.ones(len(doc_ids), dtype=bool)
+        # Postings of documents added since the last persist
+        self._delta: Dict[str, List[Tuple[int, int]]] = defaultdict(list)
+        self._delta_len: List[int] = []
+        self._lengths_cache: np.ndarray | None = None
+        self._dirty = False
+        self.pending = 0  # documents added or deleted since the last persist
+
+    def persist(self) -> None:
+        """Merge pending changes into a new set of arrays and swap them in."""
+        with self._lock:
+            if not self._dirty:
+                return
+            n_terms = len(self._term_list)
+            base_terms = np.repeat(
+                np.arange(len(self._offsets) - 1), np.diff(self._offsets)
+            )
+            delta_terms, delta_docs, delta_tfs = [], [], []
+            for term, postings in self._delta.items():
+                tid = self._terms[term]
+                for doc, tf in postings:
+                    delta_terms.append(tid)
+                    delta_docs.append(doc)
+                    delta_tfs.append(tf)
+            term_of = np.concatenate([base_terms, np.asarray(delta_terms, dtype=np.int64)])
+            docs = np.concatenate([self._docs, np.asarray(delta_docs, dtype=np.int32)])
+            tfs = np.concatenate([self._tfs, np.asarray(delta_tfs, dtype=np.float32)])
+
+            # Drop deleted documents and renumber the survivors densely
+            alive = self._alive
+            keep = alive[docs]
+            doc_remap = np.cumsum(alive) - 1
+            term_of, docs, tfs = term_of[keep], doc_remap[docs[keep]], tfs[keep]
+
+            # Drop terms left without postings
+            counts = np.bincount(term_of, minlength=n_terms)
+            used = counts > 0
+            term_remap = np.cumsum(used) - 1
+            term_of = term_remap[term_of]
+            terms = [t for t, u in zip(self._term_list, used) if u]
+
+            order = np.argsort(term_of, kind="stable")
+            arrays = {
+                "offsets": np.concatenate([[0], np.cumsum(counts[used])]).astype(np.int64),
+                "docs": docs[order].astype(np.int32),
+                "tfs": tfs[order].astype(np.float32),
+                "doc_len": self._lengths()[alive].astype(np.int32),
+            }
+            doc_ids = [d for d, a in zip(self._doc_ids, alive) if a]
+
+            tmp = f"{self.path}.tmp"
+            shutil.rmtree(tmp, ignore_errors=True)
+            os.makedirs(tmp)
+            for name, array in arrays.items():
+                np.save(os.path.join(tmp, f"{name}.npy"), array)
+            with open(os.path.join(tmp, "index.json"), "w", encoding="utf-8") as f:
+                json.dump({"terms": terms, "doc_ids": doc_ids}, f, ensure_ascii=False)
+
+            old = f"{self.path}.old"
+            shutil.rmtree(old, ignore_errors=True)
+            if os.path.exists(self.path):
+                os.replace(self.path, old)
+            os.replace(tmp, self.path)
+            shutil.rmtree(old, ignore_errors=True)
+            self._load()
+
+    # ------------------------------ Updates ------------------------------- #
+    def add(self, ids: Iterable[str], texts: Iterable[str]) -> int:
+        """Index *texts* under *ids*; IDs already indexed are skipped."""
+        added = 0
+        with self._lock:
+            for doc_id, text in zip(ids, texts):
+                current = self._doc_index.get(doc_id)
+                if current is not None and self._alive[current]:
+                    continue
+                doc = len(self._doc_ids)
+                tokens = tokenize(text)
+                for term, tf in Counter(tokens).items():
+                    if term not in self._terms:
+                        self._terms[term] = len(self._term_list)
+                        self._term_list.append(term)
+                    self._delta[term].append((doc, tf))
+                self._doc_ids.append(doc_id)
+                self._doc_index[doc_id] = doc
+                self._delta_len.append(len(tokens))
+                added += 1
+            if added:
+                self._alive = np.concatenate([self._alive, np.ones(added, dtype=bool)])
+                self._lengths_cache = None
+                self._dirty = True
+                self.pending += added
+        return added
+
+    def delete(self, ids: Iterable[str]) -> None:
+        with self._lock:
+            for doc_id in ids:
+                doc = self._doc_index.pop(doc_id, None)
+                if doc is not None:
+                    self._alive[doc] = False
+                    self._dirty = True
+                    self.pending += 1
+
+    def __len__(self) -> int:
+        return len(self._doc_index)
+
+    def __contains__(self, doc_id: str) -> bool:
+        return doc_id in self._doc_index
+
+    # ------------------------------ Scoring ------------------------------- #
+    def _lengths(self) -> np.ndarray:
+        if self._lengths_cache is None:
+            self._lengths_cache = np.concatenate(
+                [self._base_len, np.asarray(self._delta_len, dtype=np.int32)]
+            ).astype(np.float32)
+        return self._lengths_cache
+
+    def _postings(self, term: str) -> Tuple[np.ndarray, np.ndarray]:
+        tid = self._terms.get(term)
+        if tid is None:
+            return np.zeros(0, dtype=np.int32), np.zeros(0, dtype=np.float32)
+        if tid < len(self._offsets) - 1:
+            start, end = self._offsets[tid], self._offsets[tid + 1]
+            docs, tfs = self._docs[start:end], self._tfs[start:end]
+        else:
+            docs, tfs = np.zeros(0, dtype=np.int32), np.zeros(0, dtype=np.float32)
+        delta = self._delta.get(term)
+        if delta:
+            extra = np.asarray(delta, dtype=np.int64)
+            docs = np.concatenate([docs, extra[:, 0].astype(np.int32)])
+            tfs = np.concatenate([tfs, extra[:, 1].astype(np.float32)])
+        return docs, tfs
+
+    def search(
+        self, query: str, k: int = 10, allowed: Optional[Set[str]] = None
+    ) -> List[Tuple[str, float]]:
+        """Return up to *k* ``(doc_id, score)`` pairs, best first.
+
+        With *allowed* only those document IDs are scored; corpus statistics
+        still cover the whole index.
+        """
+        with self._lock:
+            n_alive = len(self._doc_index)
+            if not n_alive:
+                return []
+            alive = self._alive
+            candidates = alive
+            if allowed is not None:
+                candidates = np.zeros_like(alive)
+                rows = [self._doc_index[i] for i in allowed if i in self._doc_index]
+                candidates[rows] = True
+            lengths = self._lengths()
+            avgdl = float(lengths[alive].mean()) or 1.0
+            scores = np.zeros(len(self._doc_ids), dtype=np.float32)
+            for term in set(tokenize(query)):
+                docs, tfs = self._postings(term)
+                live = alive[docs]
+                docs, tfs = docs[live], tfs[live]
+                df = docs.size
+                wanted = candidates[docs]
+                docs, tfs = docs[wanted], tfs[wanted]
+                if not docs.size:
+                    continue
+                idf = np.log1p((n_alive - df + 0.5) / (df + 0.5))
+                norm = self.k1 * (1 - self.b + self.b * lengths[docs] / avgdl)
+                # Postings hold one entry per document, so plain indexing is safe
+                scores[docs] += idf * tfs * (self.k1 + 1) / (tfs + norm)
+
+            hits = np.flatnonzero(scores)
+            if not hits.size:
+                return []
+            if hits.size > k:
+                hits = hits[np.argpartition(-scores[hits], k - 1)[:k]]
+            hits = hits[np.argsort(-scores[hits], kind="stable")]
+            return [(self._doc_ids[i], float(scores[i])) for i in hits]
@@ -0,0 +1,68 @@
+"""Batched writes to a Chroma collection through chromadb's public API.
+
+LangChain's :class:`Chroma` wrapper keeps its client and collection private
+and has no upsert with precomputed embeddings, metadata-only update or cheap
+count.  :class:`ChromaCollection` opens the collection with a client it owns
+(and hands that client to the wrapper), and splits every write into batches
+no larger than the client accepts.
+"""
+from __future__ import annotations
+
+from typing import List, Optional
+
+import chromadb
+from loguru import logger
+
+# Used when the client cannot tell its limit (older or remote clients);
+# well below the limit of chromadb's default SQLite backend.
+DEFAULT_MAX_BATCH_SIZE = 1000
+COLLECTION_NAME = "langchain"  # the LangChain wrapper's default collection
+
+
+class ChromaCollection:
+    def __init__(self, persist_directory: str, name: str = COLLECTION_NAME):
+        self.client = chromadb.PersistentClient(path=persist_directory)
+        self.collection = self.client.get_or_create_collection(
+            name=name, embedding_function=None
+        )
+        self.max_batch_size = self._max_batch_size()
+
+    def _max_batch_size(self) -> int:
+        try:
+            return int(self.client.get_max_batch_size())
+        except Exception as exc:  # noqa: BLE001
+            logger.debug(
+                f"Chroma client has no batch size limit ({exc}), "
+                f"using {DEFAULT_MAX_BATCH_SIZE}"
+            )
+            return DEFAULT_MAX_BATCH_SIZE
+
+    def _batches(self, n: int) -> List[slice]:
+        size = self.max_batch_size
+        return [slice(start, start + size) for start in range(0, n, size)]
+
+    def upsert(
+        self,
+        ids: List[str],
+        embeddings: List[List[float]],
+        documents: List[str],
+        metadatas: List[dict],
+    ) -> None:
+        for batch in self._batches(len(ids)):
+            self.collection.upsert(
+                ids=ids[batch],
+                embeddings=embeddings[batch],
+                documents=documents[batch],
+                metadatas=metadatas[batch],
+            )
+
+    def update_metadatas(self, ids: List[str], metadatas: List[dict]) -> None:
+        for batch in self._batches(len(ids)):
+            self.collection.update(ids=ids[batch], metadatas=metadatas[batch])
+
+    def delete(self, ids: Optional[List[str]] = None) -> None:
+        for batch in self._batches(len(ids or [])):
+            self.collection.delete(ids=ids[batch])
+
+    def count(self) -> int:
+        return self.collection.count()
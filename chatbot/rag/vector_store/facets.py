@@ -0,0 +1,95 @@
+"""Branch/subject facets stored alongside every indexed chunk.
+
+A chunk can belong to several branches, so besides the display string each
+branch is stored as its own boolean metadata field (``branch_life_science``)
+that a backend can filter on exactly.  :class:`FacetIndex` keeps the set of
+document IDs for every facet value in memory so that retrievers without a
+metadata filter of their own (BM25) can be narrowed the same way.
+"""
+from __future__ import annotations
+
+import threading
+from collections import defaultdict
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+BRANCH_PREFIX = "branch_"
+
+
+def branch_field(branch: str) -> str:
+    """Metadata field flagging membership of *branch*."""
+    return BRANCH_PREFIX + "_".join(branch.lower().split())
+
+
+def facet_fields(branches: Iterable[str]) -> Dict[str, bool]:
+    return {branch_field(branch): True for branch in branches}
+
+
+def branch_filter(branches: List[str]) -> dict:
+    """``where`` filter matching documents in any of *branches*."""
+    clauses = [{branch_field(branch): True} for branch in dict.fromkeys(branches)]
+    if not clauses:
+        return {}
+    return clauses[0] if len(clauses) == 1 else {"$or": clauses}
+
+
+def is_facet(key: str) -> bool:
+    return key == "subject" or key.startswith(BRANCH_PREFIX)
+
+
+class FacetIndex:
+    """Document IDs per ``(field, value)`` facet, kept in memory."""
+
+    def __init__(self) -> None:
+        self._ids: Dict[Tuple[str, Any], Set[str]] = defaultdict(set)
+        self._facets: Dict[str, List[Tuple[str, Any]]] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._facets)
+
+    def add(self, ids: Iterable[str], metadatas: Iterable[dict]) -> None:
+        with self._lock:
+            for id_, meta in zip(ids, metadatas):
+                self._remove(id_)
+                facets = [(k, v) for k, v in (meta or {}).items() if is_facet(k)]
+                for facet in facets:
+                    self._ids[facet].add(id_)
+                self._facets[id_] = facets
+
+    def remove(self, ids: Iterable[str]) -> None:
+        with self._lock:
+            for id_ in ids:
+                self._remove(id_)
+
+    def _remove(self, id_: str) -> None:
+        for facet in self._facets.pop(id_, []):
+            self._ids[facet].discard(id_)
+
+    def match(self, where: Optional[dict]) -> Optional[Set[str]]:
+        """IDs matching a ``where`` filter, or ``None`` when it is empty."""
+        if not where:
+            return None
+        with self._lock:
+            return self._match(where)
+
+    def _match(self, where: dict) -> Set[str]:
+        result: Optional[Set[str]] = None
+        for key, cond in where.items():
+            if key == "$and":
+                ids = set.intersection(*(self._match(sub) for sub in cond))
+            elif key == "$or":
+                ids = set().union(*(self._match(sub) for sub in cond))
+            else:
+                if not isinstance(cond, dict):
+                    cond = {"$eq": cond}
+                ids = set()
+                for op, value in cond.items():
+                    if op == "$eq":
+                        ids |= self._ids.get((key, value), set())
+                    elif op == "$in":
+                        for v in value:
+                            ids |= self._ids.get((key, v), set())
+                    else:
+                        raise ValueError(f"Unsupported facet operator: {op}")
+            result = ids if result is None else result & ids
+        return result or set()
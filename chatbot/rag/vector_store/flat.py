@@ -0,0 +1,540 @@
+"""Brute-force vector store over a memory-mapped NumPy matrix.
+
+Embeddings live in ``vectors.npy`` (L2-normalised, float32 or float16) and are
+scored with a single matmul; documents and metadata are appended to
+``docs.jsonl`` and mirrored in memory as columns.  Metadata updates are
+appended to ``metadata.jsonl`` instead of re-adding the documents.
+``meta.json`` records how many rows and bytes are committed, so a crash
+between appends and :meth:`persist` leaves the store at its last persisted
+state.
+
+Deleted and replaced rows are only marked dead; once they make up
+``compact_dead_fraction`` of the rows, :meth:`persist` rewrites the live rows
+into a new *generation* of files (``vectors.<n>.npy`` ...) and commits the
+switch in ``meta.json``, so other processes keep reading a consistent set.
+
+Every process holding the store keeps the ids, texts and metadata of all rows
+in memory (only the vectors are memory-mapped), so this backend suits indexes
+whose documents fit in each worker's memory.
+
+The class implements the subset of the Chroma API that
+:class:`~chatbot.rag.vector_store.store.VectorStore` relies on (``get`` with
+``ids``/``where``/``include``, ``delete``, ``persist`` and
+``similarity_search`` with a ``filter``), so either can back it.
+"""
+from __future__ import annotations
+
+import json
+import os
+import threading
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.vectorstores import VectorStore as LangchainVectorStore
+from loguru import logger
+
+_MIN_CAPACITY = 1024
+_COPY_BLOCK = 65536
+
+
+class FlatVectorStore(LangchainVectorStore):
+    """Exact top-k search over a memory-mapped embedding matrix."""
+
+    def __init__(
+        self,
+        path: str,
+        embedding_function: Embeddings,
+        dtype: str = "float32",
+        compact_dead_fraction: float = 0.3,
+    ):
+        if dtype not in ("float32", "float16"):
+            raise ValueError(f"Unsupported flat index dtype: {dtype}")
+        self.path = path
+        self.embedding_function = embedding_function
+        self.dtype = np.dtype(dtype)
+        self.compact_dead_fraction = compact_dead_fraction
+        self._lock = threading.RLock()
+        os.makedirs(path, exist_ok=True)
+        self._load()
+
+    @property
+    def embeddings(self) -> Embeddings:
+        return self.embedding_function
+
+    # ----------------------------- Persistence ---------------------------- #
+    def _file(self, name: str, generation: Optional[int] = None) -> str:
+        """Path of *name*; data files carry their generation once compacted."""
+        generation = self._generation if generation is None else generation
+        if generation and name != "meta.json":
+            stem, ext = os.path.splitext(name)
+            name = f"{stem}.{generation}{ext}"
+        return os.path.join(self.path, name)
+
+    def _read_meta(self) -> Dict[str, Any]:
+        try:
+            with open(os.path.join(self.path, "meta.json"), encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+
+    def _load(self) -> None:
+        """Load the committed state, retrying if a compaction replaced it meanwhile."""
+        for attempt in range(3):
+            try:
+                self._mtime = self._meta_mtime()
+                self._reset(self._read_meta())
+                return
+            except FileNotFoundError:
+                if attempt == 2:
+                    raise
+
+    def _reset(self, meta: Dict[str, Any]) -> None:
+        self._generation = int(meta.get("generation", 0))
+        if meta.get("dtype"):
+            # The on-disk dtype wins over the configured one
+            self.dtype = np.dtype(meta["dtype"])
+        self._rows = 0
+        self._ids: List[str] = []
+        self._texts: List[str] = []
+        self._metadatas: List[dict] = []
+        self._alive = np.zeros(0, dtype=bool)
+        self._index: Dict[str, int] = {}
+        self._docs_bytes = 0
+        self._updates_bytes = 0
+        self._vectors: Optional[np.memmap] = None
+        self._codes: Dict[str, tuple[np.ndarray, Dict[Any, int]]] = {}
+        self._bitmaps: Dict[tuple[str, Any], np.ndarray] = {}
+        self._catch_up(meta)
+
+    def _catch_up(self, meta: Dict[str, Any]) -> None:
+        """Read the rows and metadata updates committed after the loaded ones.
+
+        Rows and updates appended after the last persist are not committed;
+        they are ignored here and overwritten on the next append.
+        """
+        rows = int(meta.get("rows", 0))
+        self._dim = meta.get("dim")
+        docs_bytes = int(meta.get("docs_bytes", 0))
+        if docs_bytes > self._docs_bytes:
+            with open(self._file("docs.jsonl"), "rb") as f:
+                f.seek(self._docs_bytes)
+                committed = f.read(docs_bytes - self._docs_bytes)
+            for line in committed.splitlines():
+                row = json.loads(line)
+                self._ids.append(row["id"])
+                self._texts.append(row["text"])
+                self._metadatas.append(row["metadata"])
+            self._docs_bytes = docs_bytes
+
+        updates_bytes = int(meta.get("updates_bytes", 0))
+        if updates_bytes > self._updates_bytes:
+            with open(self._file("metadata.jsonl"), "rb") as f:
+                f.seek(self._updates_bytes)
+                committed = f.read(updates_bytes - self._updates_bytes)
+            for line in committed.splitlines():
+                update = json.loads(line)
+                self._metadatas[update["row"]] = update["metadata"]
+            self._updates_bytes = updates_bytes
+            self._codes.clear()
+            self._bitmaps.clear()
+
+        if rows and os.path.exists(self._file("vectors.npy")):
+            self._vectors = np.load(self._file("vectors.npy"), mmap_mode="r+")
+        alive_file = self._file("alive.npy")
+        alive = (
+            np.load(alive_file)[:rows].copy()
+            if os.path.exists(alive_file)
+            else np.ones(rows, dtype=bool)
+        )
+        # Only rows that were added or changed state need re-indexing
+        changed = np.flatnonzero(alive[: self._rows] != self._alive[: self._rows])
+        for row in [*changed.tolist(), *range(self._rows, rows)]:
+            if alive[row]:
+                self._index[self._ids[row]] = row
+            elif self._index.get(self._ids[row]) == row:
+                del self._index[self._ids[row]]
+        self._alive = alive
+        self._rows = rows
+
+    def _meta_mtime(self) -> tuple[int, int]:
+        # meta.json is replaced, not rewritten: a new inode marks a commit
+        # even within the file system's timestamp granularity
+        try:
+            stat = os.stat(os.path.join(self.path, "meta.json"))
+        except FileNotFoundError:
+            return (0, 0)
+        return (stat.st_ino, stat.st_mtime_ns)
+
+    def _refresh(self) -> None:
+        """Pick up rows persisted by another process (e.g. another worker)."""
+        if self._meta_mtime() == self._mtime:
+            return
+        with self._lock:
+            mtime = self._meta_mtime()
+            if mtime == self._mtime:
+                return
+            meta = self._read_meta()
+            if (
+                int(meta.get("generation", 0)) != self._generation
+                or int(meta.get("docs_bytes", 0)) < self._docs_bytes
+            ):
+                self._load()  # compacted meanwhile: start over
+                return
+            try:
+                self._catch_up(meta)
+                self._mtime = mtime
+            except FileNotFoundError:
+                self._load()
+
+    def persist(self) -> None:
+        """Flush appended rows and commit them in ``meta.json``.
+
+        Compacts the store first when enough of its rows are dead.
+        """
+        with self._lock:
+            if self._rows and (
+                1 - len(self._index) / self._rows >= self.compact_dead_fraction
+            ):
+                self.compact()
+                return
+            if self._vectors is not None:
+                self._vectors.flush()
+            np.save(self._file("alive.npy"), self._alive)
+            self._write_meta()
+
+    def _write_meta(self) -> None:
+        meta = {
+            "generation": self._generation,
+            "rows": self._rows,
+            "dim": self._dim,
+            "dtype": self.dtype.name,
+            "docs_bytes": self._docs_bytes,
+            "updates_bytes": self._updates_bytes,
+        }
+        tmp = os.path.join(self.path, "meta.json.tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+        os.replace(tmp, os.path.join(self.path, "meta.json"))
+        self._mtime = self._meta_mtime()
+
+    def compact(self) -> None:
+        """Rewrite only the live rows into a new generation of files and commit it."""
+        with self._lock:
+            live = np.flatnonzero(self._alive[: self._rows])
+            old, new = self._generation, self._generation + 1
+            vectors = None
+            if self._vectors is not None:
+                vectors = np.lib.format.open_memmap(
+                    self._file("vectors.npy", new),
+                    mode="w+",
+                    dtype=self.dtype,
+                    shape=(max(_MIN_CAPACITY, len(live)), self._dim),
+                )
+                for start in range(0, len(live), _COPY_BLOCK):
+                    rows = live[start:start + _COPY_BLOCK]
+                    vectors[start:start + len(rows)] = self._vectors[rows]
+                vectors.flush()
+            lines = b"".join(
+                json.dumps(
+                    {
+                        "id": self._ids[row],
+                        "text": self._texts[row],
+                        "metadata": self._metadatas[row],
+                    },
+                    ensure_ascii=False,
+                ).encode("utf-8") + b"\n"
+                for row in live
+            )
+            with open(self._file("docs.jsonl", new), "wb") as f:
+                f.write(lines)
+            alive = np.ones(len(live), dtype=bool)
+            np.save(self._file("alive.npy", new), alive)
+
+            self._generation = new
+            self._vectors = vectors
+            self._ids = [self._ids[row] for row in live]
+            self._texts = [self._texts[row] for row in live]
+            self._metadatas = [self._metadatas[row] for row in live]
+            self._index = {id_: row for row, id_ in enumerate(self._ids)}
+            self._alive = alive
+            logger.info(f"Compacted the flat index from {self._rows} to {len(live)} rows")
+            self._rows = len(live)
+            self._docs_bytes = len(lines)
+            self._updates_bytes = 0
+            self._codes.clear()
+            self._bitmaps.clear()
+            self._write_meta()
+            for name in ("vectors.npy", "docs.jsonl", "alive.npy", "metadata.jsonl"):
+                try:
+                    os.remove(self._file(name, old))
+                except FileNotFoundError:
+                    pass
+
+    def _ensure_capacity(self, rows: int) -> None:
+        capacity = 0 if self._vectors is None else self._vectors.shape[0]
+        if rows <= capacity:
+            return
+        new_capacity = max(_MIN_CAPACITY, capacity * 2, rows)
+        tmp = self._file("vectors.npy.tmp")
+        grown = np.lib.format.open_memmap(
+            tmp, mode="w+", dtype=self.dtype, shape=(new_capacity, self._dim)
+        )
+        if self._vectors is not None:
+            grown[: self._rows] = self._vectors[: self._rows]
+        grown.flush()
+        del grown
+        os.replace(tmp, self._file("vectors.npy"))
+        self._vectors = np.load(self._file("vectors.npy"), mmap_mode="r+")
+
+    # ------------------------------ Updates ------------------------------- #
+    def add_texts(
+        self,
+        texts: Iterable[str],
+        metadatas: Optional[List[dict]] = None,
+        ids: Optional[List[str]] = None,
+        **kwargs: Any,
+    ) -> List[str]:
+        """Embed and append *texts*; an existing ID is replaced."""
+        texts = list(texts)
+        if not texts:
+            return []
+        metadatas = metadatas or [{} for _ in texts]
+        if ids is None:
+            raise ValueError("FlatVectorStore requires explicit document ids")
+        self.add_embeddings(texts, self.embedding_function.embed_documents(texts), metadatas, ids)
+        return list(ids)
+
+    def add_embeddings(
+        self,
+        texts: List[str],
+        embeddings: List[List[float]],
+        metadatas: List[dict],
+        ids: List[str],
+    ) -> None:
+        """Append *texts* with their precomputed *embeddings*; an existing ID is replaced."""
+        if not texts:
+            return
+        vectors = np.asarray(embeddings, dtype=np.float32)
+        vectors /= np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+        self._append(list(ids), list(texts), list(metadatas), vectors)
+
+    def _append(
+        self,
+        ids: List[str],
+        texts: List[str],
+        metadatas: List[dict],
+        vectors: np.ndarray,
+    ) -> None:
+        """Append rows, superseding any live row with the same ID."""
+        with self._lock:
+            if self._dim is None:
+                self._dim = vectors.shape[1]
+            start = self._rows
+            self._ensure_capacity(start + len(texts))
+            self._vectors[start:start + len(texts)] = vectors.astype(self.dtype)
+            lines = b"".join(
+                json.dumps(
+                    {"id": id_, "text": text, "metadata": meta}, ensure_ascii=False
+                ).encode("utf-8") + b"\n"
+                for id_, text, meta in zip(ids, texts, metadatas)
+            )
+            with open(self._file("docs.jsonl"), "ab") as f:
+                f.truncate(self._docs_bytes)
+                f.write(lines)
+            self._docs_bytes += len(lines)
+            for offset, id_ in enumerate(ids):
+                old = self._index.get(id_)
+                if old is not None:
+                    self._alive[old] = False
+                self._index[id_] = start + offset
+            self._ids.extend(ids)
+            self._texts.extend(texts)
+            self._metadatas.extend(metadatas)
+            self._alive = np.concatenate([self._alive, np.ones(len(texts), dtype=bool)])
+            self._rows += len(texts)
+
+    def update_metadatas(self, ids: List[str], metadatas: List[dict]) -> None:
+        """Replace the metadata of existing documents, keeping their rows."""
+        with self._lock:
+            updates = [
+                (self._index[id_], meta)
+                for id_, meta in zip(ids, metadatas)
+                if id_ in self._index
+            ]
+            if not updates:
+                return
+            lines = b"".join(
+                json.dumps({"row": row, "metadata": meta}, ensure_ascii=False).encode(
+                    "utf-8"
+                ) + b"\n"
+                for row, meta in updates
+            )
+            with open(self._file("metadata.jsonl"), "ab") as f:
+                f.truncate(self._updates_bytes)
+                f.write(lines)
+            self._updates_bytes += len(lines)
+            for row, meta in updates:
+                self._metadatas[row] = meta
+            # Columns are rebuilt from the new metadata on the next filter
+            self._codes.clear()
+            self._bitmaps.clear()
+
+    def delete(self, ids: Optional[List[str]] = None, **kwargs: Any) -> Optional[bool]:
+        with self._lock:
+            for id_ in ids or []:
+                row = self._index.pop(id_, None)
+                if row is not None:
+                    self._alive[row] = False
+        return True
+
+    def count(self) -> int:
+        self._refresh()
+        return len(self._index)
+
+    # ---------------------------- Filtering ------------------------------- #
+    def _column(self, key: str) -> tuple[np.ndarray, Dict[Any, int]]:
+        """Dictionary-encoded metadata column, extended for new rows."""
+        codes, vocab = self._codes.get(key, (np.zeros(0, dtype=np.int32), {}))
+        if len(codes) < self._rows:
+            extra = [
+                vocab.setdefault(meta.get(key), len(vocab))
+                for meta in self._metadatas[len(codes):self._rows]
+            ]
+            codes = np.concatenate([codes, np.asarray(extra, dtype=np.int32)])
+            self._codes[key] = (codes, vocab)
+        return codes, vocab
+
+    def _bitmap(self, key: str, value: Any) -> np.ndarray:
+        """Precomputed row bitmap of one facet value, extended for new rows."""
+        bitmap = self._bitmaps.get((key, value))
+        if bitmap is None or len(bitmap) < self._rows:
+            codes, vocab = self._column(key)
+            start = 0 if bitmap is None else len(bitmap)
+            new = codes[start:self._rows] == vocab.get(value, -1)
+            bitmap = new if bitmap is None else np.concatenate([bitmap, new])
+            self._bitmaps[(key, value)] = bitmap
+        return bitmap
+
+    def _mask(self, where: Optional[dict]) -> np.ndarray:
+        """Boolean row mask for a Chroma-style ``where`` filter."""
+        mask = self._alive[: self._rows].copy()
+        if not where:
+            return mask
+        for key, cond in where.items():
+            if key == "$and":
+                for sub in cond:
+                    mask &= self._mask(sub)
+                continue
+            if key == "$or":
+                mask &= np.logical_or.reduce([self._mask(sub) for sub in cond])
+                continue
+            if not isinstance(cond, dict):
+                cond = {"$eq": cond}
+            for op, value in cond.items():
+                if op in ("$in", "$nin"):
+                    hit = np.zeros(self._rows, dtype=bool)
+                    for v in value:
+                        hit |= self._bitmap(key, v)
+                elif op in ("$eq", "$ne"):
+                    hit = self._bitmap(key, value)
+                else:
+                    raise ValueError(f"Unsupported filter operator: {op}")
+                mask &= ~hit if op in ("$nin", "$ne") else hit
+        return mask
+
+    # ------------------------------ Reading ------------------------------- #
+    def get(
+        self,
+        ids: Optional[Sequence[str]] = None,
+        where: Optional[dict] = None,
+        include: Sequence[str] = ("documents", "metadatas"),
+    ) -> Dict[str, Any]:
+        self._refresh()
+        with self._lock:
+            if ids is not None:
+                rows = [self._index[id_] for id_ in ids if id_ in self._index]
+                if where:
+                    mask = self._mask(where)
+                    rows = [row for row in rows if mask[row]]
+            else:
+                rows = np.flatnonzero(self._mask(where)).tolist()
+            return {
+                "ids": [self._ids[row] for row in rows],
+                "documents": (
+                    [self._texts[row] for row in rows] if "documents" in include else None
+                ),
+                "metadatas": (
+                    [self._metadatas[row] for row in rows] if "metadatas" in include else None
+                ),
+            }
+
+    @staticmethod
+    def _scores(matrix: np.ndarray, query: np.ndarray, block: int = 65536) -> np.ndarray:
+        """Cosine scores of unit-norm rows against *query*, computed in float32."""
+        if matrix.dtype == np.float32:
+            return matrix @ query
+        # BLAS has no float16 kernels; upcast one block at a time
+        return np.concatenate([
+            matrix[start:start + block].astype(np.float32) @ query
+            for start in range(0, len(matrix), block)
+        ])
+
+    def similarity_search_by_vector(
+        self,
+        embedding: List[float],
+        k: int = 4,
+        filter: Optional[dict] = None,
+        **kwargs: Any,
+    ) -> List[Document]:
+        self._refresh()
+        with self._lock:
+            if not self._rows or self._vectors is None:
+                return []
+            mask = self._mask(filter)
+            vectors = self._vectors
+            rows = self._rows
+        query = np.asarray(embedding, dtype=np.float32)
+        query /= max(float(np.linalg.norm(query)), 1e-12)
+
+        candidates = np.flatnonzero(mask)
+        if not candidates.size:
+            return []
+        if candidates.size * 4 >= rows:
+            # Scanning contiguous rows beats gathering a large candidate set
+            scores = self._scores(vectors[:rows], query)[candidates]
+        else:
+            scores = self._scores(vectors[candidates], query)
+        k = min(k, candidates.size)
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top], kind="stable")]
+        return [
+            Document(page_content=self._texts[row], metadata=self._metadatas[row])
+            for row in candidates[top]
+        ]
+
+    def similarity_search(
+        self,
+        query: str,
+        k: int = 4,
+        filter: Optional[dict] = None,
+        **kwargs: Any,
+    ) -> List[Document]:
+        embedding = self.embedding_function.embed_query(query)
+        return self.similarity_search_by_vector(embedding, k, filter=filter)
+
+    @classmethod
+    def from_texts(
+        cls,
+        texts: List[str],
+        embedding: Embeddings,
+        metadatas: Optional[List[dict]] = None,
+        ids: Optional[List[str]] = None,
+        path: str = ".flat_index",
+        **kwargs: Any,
+    ) -> "FlatVectorStore":
+        store = cls(path, embedding, **kwargs)
+        store.add_texts(texts, metadatas, ids=ids)
+        store.persist()
+        return store
@@ -0,0 +1,190 @@
+"""Local, LLM-free guess of a query's branch and subject.
+
+The extractor is built from the metadata that is already in the index: every
+indexed ``subject`` becomes an alias of itself, a small table of known
+aliases (English, French and Arabic spellings) is mapped onto those subjects,
+and a hashed character n-gram centroid classifier covers queries that do not
+name their subject outright.
+"""
+from __future__ import annotations
+
+import re
+import zlib
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+# ------------------------------ Dictionaries ------------------------------ #
+BRANCH_ALIASES: Dict[str, List[str]] = {
+    "general science": [
+        "general science", "general sciences", "gs", "sg",
+        "sciences generales", "علوم عامة",
+    ],
+    "life science": [
+        "life science", "life sciences", "ls", "sv",
+        "sciences de la vie", "علوم الحياة",
+    ],
+    "arts and humanities": [
+        "arts and humanities", "humanities", "literature and humanities", "lh",
+        "lettres et humanites", "اداب وانسانيات", "آداب وإنسانيات", "انسانيات",
+    ],
+    "social and economic sciences": [
+        "social and economic sciences", "sociology and economics",
+        "sciences economiques et sociales", "اجتماع واقتصاد",
+    ],
+    "middle school certificate": [
+        "middle school certificate", "middle school", "brevet", "grade 9",
+        "شهادة متوسطة", "الشهادة المتوسطة", "متوسطة",
+    ],
+}
+
+SUBJECT_ALIASES: Dict[str, List[str]] = {
+    "mathematics": ["mathematics", "math", "maths", "mathematiques", "رياضيات"],
+    "physics": ["physics", "physique", "فيزياء"],
+    "chemistry": ["chemistry", "chimie", "كيمياء"],
+    "biology": ["biology", "life and earth sciences", "svt", "biologie", "علوم الحياة", "احياء"],
+    "arabic": ["arabic", "arabe", "لغة عربية", "عربي"],
+    "english": ["english", "anglais", "لغة انكليزية", "انكليزي"],
+    "french": ["french", "francais", "لغة فرنسية", "فرنسي"],
+    "history": ["history", "histoire", "تاريخ"],
+    "geography": ["geography", "geographie", "جغرافيا"],
+    "civics": ["civics", "civic education", "education civique", "تربية مدنية"],
+    "philosophy": ["philosophy", "philosophie", "فلسفة"],
+    "economics": ["economics", "economy", "economie", "اقتصاد"],
+    "sociology": ["sociology", "sociologie", "اجتماع", "علم الاجتماع"],
+}
+
+_DIACRITICS = re.compile(r"[ً-ْـ]")
+_ALEF = re.compile(r"[أإآ]")
+_ACCENTS = str.maketrans("éèêëàâîïôûùç", "eeeeaaiiouuc")
+_TOKEN = re.compile(r"\w+")
+
+# Longest alias, in tokens, looked up in a query
+_MAX_ALIAS_TOKENS = 4
+
+
+def normalize(text: str) -> str:
+    """Lower-case, strip accents/diacritics and the Arabic article; one space between tokens."""
+    text = _ALEF.sub("ا", _DIACRITICS.sub("", text.lower())).translate(_ACCENTS)
+    tokens = []
+    for tok in _TOKEN.findall(text):
+        if tok.startswith("وال") and len(tok) > 5:
+            tok = tok[3:]
+        elif tok.startswith("ال") and len(tok) > 4:
+            tok = tok[2:]
+        tokens.append(tok)
+    return " ".join(tokens)
+
+
+def _hash_features(texts: List[str], dim: int) -> np.ndarray:
+    """L2-normalised hashed character 3-gram counts, one row per text."""
+    rows = np.zeros((len(texts), dim), dtype=np.float32)
+    for i, text in enumerate(texts):
+        padded = f" {text} "
+        idx = [
+            zlib.crc32(padded[j:j + 3].encode("utf-8")) % dim
+            for j in range(len(padded) - 2)
+        ]
+        if idx:
+            np.add.at(rows[i], idx, 1.0)
+    norms = np.linalg.norm(rows, axis=1, keepdims=True)
+    return rows / np.maximum(norms, 1e-12)
+
+
+@dataclass
+class QueryMeta:
+    branch: List[str] = field(default_factory=list)
+    subject: Optional[str] = None
+    confidence: float = 0.0
+
+
+class QueryMetaExtractor:
+    """Keyword/alias lookup backed by a nearest-centroid subject classifier."""
+
+    def __init__(self, records: Iterable[Tuple[str, str]], dim: int = 4096):
+        """*records* are ``(text, subject)`` pairs taken from the index."""
+        self.dim = dim
+        texts: Dict[str, List[str]] = {}
+        counts: Counter[str] = Counter()
+        for text, subject in records:
+            if not subject or subject == "UNKNOWN":
+                continue
+            counts[subject] += 1
+            texts.setdefault(subject, []).append(normalize(text))
+
+        # Aliases map normalised phrases onto the subject names as indexed
+        self.subject_aliases: Dict[str, str] = {}
+        for canonical, aliases in SUBJECT_ALIASES.items():
+            keys = {normalize(a) for a in aliases}
+            matches = [
+                s for s in counts
+                if normalize(s) in keys or normalize(canonical) in normalize(s)
+            ]
+            if matches:
+                target = max(matches, key=counts.__getitem__)
+                for key in keys:
+                    self.subject_aliases[key] = target
+        for subject in counts:
+            self.subject_aliases[normalize(subject)] = subject
+
+        self.branch_aliases: Dict[str, str] = {
+            normalize(alias): branch
+            for branch, aliases in BRANCH_ALIASES.items()
+            for alias in aliases
+        }
+
+        self.subjects = list(texts)
+        if self.subjects:
+            centroids = np.stack(
+                [_hash_features(texts[s], dim).mean(axis=0) for s in self.subjects]
+            )
+            norms = np.linalg.norm(centroids, axis=1, keepdims=True)
+            self.centroids = centroids / np.maximum(norms, 1e-12)
+        else:
+            self.centroids = np.zeros((0, dim), dtype=np.float32)
+
+    def __len__(self) -> int:
+        return len(self.subjects)
+
+    @staticmethod
+    def _match(tokens: List[str], aliases: Dict[str, str]) -> List[str]:
+        """Values of every alias found in *tokens*, longest phrases first."""
+        found: List[str] = []
+        taken = [False] * len(tokens)
+        for size in range(min(_MAX_ALIAS_TOKENS, len(tokens)), 0, -1):
+            for start in range(len(tokens) - size + 1):
+                if any(taken[start:start + size]):
+                    continue
+                value = aliases.get(" ".join(tokens[start:start + size]))
+                if value is not None:
+                    taken[start:start + size] = [True] * size
+                    if value not in found:
+                        found.append(value)
+        return found
+
+    def extract(self, query: str) -> QueryMeta:
+        normalized = normalize(query)
+        tokens = normalized.split()
+        branches = self._match(tokens, self.branch_aliases)
+
+        subjects = self._match(tokens, self.subject_aliases)
+        if len(subjects) == 1:
+            return QueryMeta(branch=branches, subject=subjects[0], confidence=1.0)
+
+        if not self.subjects or not normalized:
+            return QueryMeta(branch=branches)
+
+        scores = self.centroids @ _hash_features([normalized], self.dim)[0]
+        if subjects:
+            # Several subjects named: let the classifier break the tie
+            candidates = [self.subjects.index(s) for s in subjects if s in self.subjects]
+            best = max(candidates, key=scores.__getitem__, default=int(np.argmax(scores)))
+        else:
+            best = int(np.argmax(scores))
+        return QueryMeta(
+            branch=branches,
+            subject=self.subjects[best],
+            confidence=float(scores[best]),
+        )
@@ -1,6 +1,12 @@
 from __future__ import annotations
 
+import hashlib
 import json
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
 from typing import List, TypedDict
 
 from loguru import logger
@@ -9,9 +15,19 @@ from tqdm import tqdm
 
 from langchain_community.vectorstores.chroma import Chroma
 from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models.chat_models import BaseChatModel
 from langchain_core.messages import HumanMessage
-from langchain_openai import OpenAIEmbeddings, ChatOpenAI
+from langchain_openai import ChatOpenAI
 
+from chatbot.rag.embeddings import CachedEmbeddings, create_embeddings
+from chatbot.rag.vector_store.bm25 import BM25Index
+from chatbot.rag.vector_store.chroma import ChromaCollection
+from chatbot.rag.vector_store.facets import FacetIndex, branch_filter, facet_fields
+from chatbot.rag.vector_store.flat import FlatVectorStore
+from chatbot.rag.vector_store.query_meta import QueryMetaExtractor
+from chatbot.rag.vector_store.writer import GroupCommitWriter
+from chatbot.telemetry import CACHE_LOOKUPS, llm_call, span
 from config_loader import AppConfig
 import asyncio
 
@@ -61,16 +77,41 @@ class VectorStore:
         "JSON:"
     )
 
-    def __init__(self, config: AppConfig):
+    def __init__(
+        self,
+        config: AppConfig,
+        llm: BaseChatModel | None = None,
+        embeddings: Embeddings | None = None,
+    ):
+        """*llm* and *embeddings* replace the clients built from *config*."""
         self.config = config
-        persist_directory = (
-            config.vector_store.get("persist_directory", ".chroma_db")
-            if config.vector_store
-            else ".chroma_db"
+        vs_config = config.vector_store or {}
+        persist_directory = vs_config.get("persist_directory", ".chroma_db")
+        self.persist_directory = persist_directory
+        self._version_path = os.path.join(persist_directory, "index_version")
+        # Metadata extraction is one LLM round-trip per chunk, so indexing
+        # sends chunks in batches with a bounded number of calls in flight.
+        self.metadata_batch_size = int(vs_config.get("metadata_batch_size", 32))
+        self.metadata_concurrency = int(vs_config.get("metadata_concurrency", 8))
+        # All writes of concurrent indexing tasks are committed by one writer
+        self.writer = GroupCommitWriter(
+            self._upsert,
+            self._delete,
+            batch_size=int(vs_config.get("write_batch_size", 512)),
+            window_ms=float(vs_config.get("write_window_ms", 50)),
         )
 
-        self.embeddings = OpenAIEmbeddings(api_key=config.api.openai_api_key)
-        self.llm = ChatOpenAI(
+        embeddings = embeddings or create_embeddings(config)
+        # Content-addressed cache: unchanged text is never re-embedded
+        cache_path = vs_config.get("embedding_cache_path", ".cache/embeddings.sqlite")
+        self.embeddings = (
+            CachedEmbeddings(
+                embeddings, cache_path, model=getattr(embeddings, "model", "default")
+            )
+            if cache_path
+            else embeddings
+        )
+        self.llm = llm or ChatOpenAI(
             model=config.llm.model,
             # temperature=config.llm.temperature,
             max_tokens=config.llm.max_tokens,
@@ -79,18 +120,83 @@ class VectorStore:
             presence_penalty=config.llm.presence_penalty,
             api_key=config.api.openai_api_key,
         )
-        self.db = Chroma(
-            persist_directory=persist_directory,
-            embedding_function=self.embeddings,
+        self.backend = vs_config.get("backend", "chroma")
+        # Batched Chroma writes; the LangChain wrapper shares its client
+        self.collection: ChromaCollection | None = None
+        if self.backend == "chroma":
+            self.collection = ChromaCollection(persist_directory)
+            self.db = Chroma(
+                client=self.collection.client,
+                persist_directory=persist_directory,
+                embedding_function=self.embeddings,
+            )
+        elif self.backend == "flat":
+            self.db = FlatVectorStore(
+                os.path.join(persist_directory, "flat"),
+                self.embeddings,
+                dtype=vs_config.get("flat_dtype", "float32"),
+                compact_dead_fraction=float(
+                    vs_config.get("flat_compact_dead_fraction", 0.3)
+                ),
+            )
+        else:
+            raise ValueError(f"Unknown vector_store.backend: {self.backend}")
+
+        # Query metadata is guessed locally; the LLM is only asked when the
+        # local extractor is less confident than this threshold.
+        self.query_meta_threshold = float(vs_config.get("query_meta_threshold", 0.3))
+        self.query_meta_refresh_seconds = float(
+            vs_config.get("query_meta_refresh_seconds", 300)
         )
+        self.query_cache_size = int(vs_config.get("query_cache_size", 1024))
+        self._query_extractor: QueryMetaExtractor | None = None
+        self._query_extractor_version: str | None = None
+        self._query_extractor_built_at = 0.0
+        self._query_extractor_task: asyncio.Task | None = None
+        self._query_cache: OrderedDict[str, ExamMeta] = OrderedDict()
+
+        # Lexical index over the full chunk text, fused with vector results
+        self.hybrid_search = bool(vs_config.get("hybrid_search", True))
+        self.rrf_k = int(vs_config.get("rrf_k", 60))
+        self.bm25 = BM25Index(os.path.join(persist_directory, "bm25"))
+        self.bm25_persist_every = int(vs_config.get("bm25_persist_every", 20000))
+        self.facets = FacetIndex()
+        # Loaded on first use (see :meth:`load_indexes`), not here: it reads
+        # every stored document and must not delay the API from starting.
+        self.indexes_loaded = False
+        self._indexes_lock = threading.Lock()
 
     # -------------------------- Metadata extraction ----------------------- #
     async def _extract_meta(self, chunk: str) -> ExamMeta | None:
         prompt = self.JSON_PROMPT.format(chunk=chunk[:4000])  # protect token budget
-        raw = await self.llm.agenerate([[HumanMessage(content=prompt)]])
+        with llm_call("extract_meta"):
+            raw = await self.llm.agenerate([[HumanMessage(content=prompt)]])
         txt = raw.generations[0][0].message.content.strip()
         return self._safe_parse(txt)
 
+    async def _extract_meta_batch(
+        self, chunks: List[str], max_concurrency: int
+    ) -> List[ExamMeta | None]:
+        """Extract metadata for *chunks* concurrently, preserving input order."""
+        semaphore = asyncio.Semaphore(max_concurrency)
+
+        async def _one(chunk: str) -> ExamMeta | None:
+            async with semaphore:
+                return await self._extract_meta(chunk)
+
+        with span("extract_meta_batch"):
+            results = await asyncio.gather(
+                *(_one(chunk) for chunk in chunks), return_exceptions=True
+            )
+        metas: List[ExamMeta | None] = []
+        for result in results:
+            if isinstance(result, Exception):
+                logger.warning(f"Metadata extraction failed: {result}")
+                metas.append(None)
+                continue
+            metas.append(result)
+        return metas
+
     @classmethod
     def _normalise_branches(cls, branches: List[str]) -> List[str]:
         # Lower‑case, strip, and keep only allowed branches
@@ -114,52 +220,378 @@ class VectorStore:
             return None
 
     # ------------------------------ Indexing ------------------------------ #
-    async def add_documents(self, chunks: List[str]) -> None:
-        docs: List[Document] = []
-        for chunk in tqdm(chunks, desc="Extracting metadata"):
-            meta = await self._extract_meta(chunk)
-            if not meta:
-                # fallback – store without filtering fields
-                meta = ExamMeta(
-                    branch=["general science"], subject="UNKNOWN", title="Untitled"
-                )
+    @staticmethod
+    def chunk_id(chunk: str) -> str:
+        """Deterministic document ID derived from the chunk's content."""
+        return hashlib.sha256(chunk.encode("utf-8")).hexdigest()
 
-            docs.append(
-                Document(
-                    page_content=meta.to_embedding_text(),
-                    metadata={  # type: ignore[arg-type]
-                        "branch": "|".join(
-                            meta.branch
-                        ),  # Store as pipe-separated string
-                        "subject": meta.subject,
-                        "full_chunk": chunk,
-                    },
-                )
+    def _existing_ids(self, ids: List[str]) -> set[str]:
+        """Return the subset of *ids* already stored in the vector store."""
+        if not ids:
+            return set()
+        return set(self.db.get(ids=ids, include=[])["ids"])
+
+    async def add_documents(
+        self,
+        chunks: List[str],
+        batch_size: int | None = None,
+        max_concurrency: int | None = None,
+        skip_existing: bool = True,
+        metadatas: List[dict] | None = None,
+    ) -> None:
+        """Extract metadata for *chunks* and upsert them into the vector store.
+
+        *metadatas* (one per chunk, e.g. the pages a chunk comes from) are
+        stored alongside the extracted metadata.
+
+        Every chunk is stored as its own document under a content-hash ID, so
+        re-indexing the same text overwrites instead of duplicating.  With
+        *skip_existing* chunks whose ID is already stored are not sent to the
+        LLM at all.
+
+        Chunks are processed in batches of *batch_size*; within a batch up to
+        *max_concurrency* LLM calls run at once.  Each batch is embedded as
+        soon as its metadata is ready and handed to :attr:`writer`, which
+        commits the batches of all concurrent callers together.
+        """
+        if metadatas is not None and len(metadatas) != len(chunks):
+            raise ValueError(
+                f"Got {len(metadatas)} metadatas for {len(chunks)} chunks"
             )
+        await self.aload_indexes()
+        batch_size = batch_size or self.metadata_batch_size
+        max_concurrency = max_concurrency or self.metadata_concurrency
+
+        # Deduplicate identical chunks, keeping first-seen order
+        by_id: dict[str, str] = {}
+        extra: dict[str, dict] = {}
+        for chunk, chunk_meta in zip(chunks, metadatas or [{}] * len(chunks)):
+            id_ = self.chunk_id(chunk)
+            by_id.setdefault(id_, chunk)
+            extra.setdefault(id_, chunk_meta)
+        ids = list(by_id)
+        if skip_existing:
+            existing = await asyncio.to_thread(self._existing_ids, ids)
+            if existing:
+                logger.debug(f"Skipping {len(existing)} already indexed chunks")
+            ids = [id_ for id_ in ids if id_ not in existing]
+        if not ids:
+            return
 
-        logger.info(f"Adding {len(docs)} documents to Chroma")
-        self.db.add_documents(docs)
+        added = 0
+        for start in tqdm(
+            range(0, len(ids), batch_size), desc="Extracting metadata"
+        ):
+            batch_ids = ids[start:start + batch_size]
+            batch = [by_id[id_] for id_ in batch_ids]
+            metas = await self._extract_meta_batch(batch, max_concurrency)
+            docs = [
+                self._to_document(chunk, meta, extra[id_])
+                for id_, chunk, meta in zip(batch_ids, batch, metas)
+            ]
+            with span("embed_documents"):
+                vectors = await self.embeddings.aembed_documents(
+                    [doc.page_content for doc in docs]
+                )
+            with span("vector_store_write"):
+                await self.writer.write(batch_ids, docs, vectors)
+            added += len(docs)
+
+        logger.info(f"Upserted {added} documents into the vector store")
+
+    def _upsert(
+        self, ids: List[str], docs: List[Document], vectors: List[List[float]]
+    ) -> None:
+        """Write embedded documents and persist them; run by :attr:`writer`."""
+        texts = [doc.page_content for doc in docs]
+        metadatas = [doc.metadata for doc in docs]
+        if isinstance(self.db, FlatVectorStore):
+            self.db.add_embeddings(texts, vectors, metadatas, ids)
+        else:
+            self.collection.upsert(ids, vectors, texts, metadatas)
+        self.db.persist()
+        self.bm25.add(ids, [meta["full_chunk"] for meta in metadatas])
+        self.facets.add(ids, metadatas)
+        self._maybe_persist_bm25()
+        self._bump_index_version()
+
+    @property
+    def index_version(self) -> str:
+        """Token that changes whenever documents are written or deleted.
+
+        It is kept in a file so that indexing in another process (e.g.
+        ``python -m chatbot.rag.exam_data_pipeline``) changes it too.
+        """
+        try:
+            with open(self._version_path, "r", encoding="utf-8") as f:
+                return f.read().strip()
+        except FileNotFoundError:
+            return ""
+
+    def _bump_index_version(self) -> None:
+        os.makedirs(self.persist_directory, exist_ok=True)
+        tmp = f"{self._version_path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(uuid.uuid4().hex)
+        os.replace(tmp, self._version_path)
+
+    def count(self) -> int:
+        """Number of documents currently indexed."""
+        if isinstance(self.db, FlatVectorStore):
+            return self.db.count()
+        return self.collection.count()
+
+    def ids(self) -> List[str]:
+        """IDs of every document currently indexed."""
+        return self.db.get(include=[])["ids"]
+
+    async def delete(self, ids: List[str]) -> None:
+        """Remove the documents with the given *ids* from the vector store."""
+        if not ids:
+            return
+        await self.aload_indexes()
+        await self.writer.delete(ids)
+        logger.info(f"Deleted {len(ids)} documents from the vector store")
+
+    def _delete(self, ids: List[str]) -> None:
+        """Delete documents and persist; run by :attr:`writer`."""
+        if isinstance(self.db, FlatVectorStore):
+            self.db.delete(ids)
+        else:
+            self.collection.delete(ids)
         self.db.persist()
+        self.bm25.delete(ids)
+        self.facets.remove(ids)
+        self._maybe_persist_bm25()
+        self._bump_index_version()
+
+    def _maybe_persist_bm25(self) -> None:
+        # Persisting rebuilds the whole index under its lock, blocking
+        # searches, so changes stay in the in-memory delta until enough
+        # accumulate or :meth:`flush_indexes` is called.  Documents lost from
+        # the delta on a crash are re-added from the store on the next load.
+        if self.bm25.pending >= self.bm25_persist_every:
+            self.bm25.persist()
+
+    async def flush_indexes(self) -> None:
+        """Persist index changes still held in memory (e.g. after indexing)."""
+        await asyncio.to_thread(self.bm25.persist)
+
+    def _update_metadatas(self, ids: List[str], metadatas: List[dict]) -> None:
+        if isinstance(self.db, FlatVectorStore):
+            self.db.update_metadatas(ids, metadatas)
+        else:
+            self.collection.update_metadatas(ids, metadatas)
+        self.db.persist()
+
+    def load_indexes(self) -> None:
+        """Load the facet and BM25 indexes once; later calls return at once."""
+        with self._indexes_lock:
+            if not self.indexes_loaded:
+                self._load_indexes()
+                self.indexes_loaded = True
+
+    async def aload_indexes(self) -> None:
+        if not self.indexes_loaded:
+            await asyncio.to_thread(self.load_indexes)
+
+    def _load_indexes(self) -> None:
+        """Build the facet index and bring older documents up to date.
+
+        Documents indexed before branches were stored as facet fields get
+        them added in place; chunks missing from the BM25 index are added.
+        """
+        data = self.db.get(include=["metadatas"])
+        ids, metadatas = data["ids"], [meta or {} for meta in data["metadatas"]]
+
+        stale = []
+        for i, meta in enumerate(metadatas):
+            branches = [b for b in meta.get("branch", "").split("|") if b]
+            fields = facet_fields(branches)
+            if any(key not in meta for key in fields):
+                metadatas[i] = {**meta, **fields}
+                stale.append(i)
+        if stale:
+            self._update_metadatas(
+                [ids[i] for i in stale], [metadatas[i] for i in stale]
+            )
+            logger.info(f"Added branch facet fields to {len(stale)} documents")
+        self.facets.add(ids, metadatas)
+
+        if self.hybrid_search:
+            missing = [
+                (id_, meta["full_chunk"])
+                for id_, meta in zip(ids, metadatas)
+                if id_ not in self.bm25 and meta.get("full_chunk")
+            ]
+            if missing:
+                missing_ids, texts = zip(*missing)
+                self.bm25.add(missing_ids, texts)
+                self.bm25.persist()
+                logger.info(f"Added {len(missing)} indexed chunks to the BM25 index")
+
+    @staticmethod
+    def _to_document(
+        chunk: str, meta: ExamMeta | None, extra: dict | None = None
+    ) -> Document:
+        if not meta:
+            # fallback – store without filtering fields
+            meta = ExamMeta(
+                branch=["general science"], subject="UNKNOWN", title="Untitled"
+            )
+
+        return Document(
+            page_content=meta.to_embedding_text(),
+            metadata={  # type: ignore[arg-type]
+                "branch": "|".join(meta.branch),  # Store as pipe-separated string
+                "subject": meta.subject,
+                "full_chunk": chunk,
+                # One boolean field per branch so filters match multi-branch chunks
+                **facet_fields(meta.branch),
+                **(extra or {}),
+            },
+        )
 
     # ----------------------------- Retrieval ------------------------------ #
+    def _build_query_extractor(self) -> QueryMetaExtractor:
+        """Train the local extractor on the metadata currently indexed."""
+        data = self.db.get(include=["metadatas", "documents"])
+        records = []
+        for doc, meta in zip(data["documents"], data["metadatas"]):
+            meta = meta or {}
+            text = f"{doc}\n{meta.get('full_chunk', '')[:500]}"
+            records.append((text, meta.get("subject", "")))
+        return QueryMetaExtractor(records)
+
+    async def refresh_query_extractor(self) -> None:
+        """Retrain the local extractor if the index changed since it was built.
+
+        Runs after indexing and in the background; requests keep using the
+        previous extractor until the new one is ready, or if retraining fails.
+        """
+        try:
+            version = self.index_version
+            if self._query_extractor is None or version != self._query_extractor_version:
+                extractor = await asyncio.to_thread(self._build_query_extractor)
+                self._query_extractor = extractor
+                self._query_extractor_version = version
+                self._query_cache.clear()
+                logger.debug(
+                    f"Query metadata extractor trained on {len(extractor)} subjects"
+                )
+        except Exception as exc:  # noqa: BLE001
+            logger.warning(f"Retraining the query metadata extractor failed: {exc}")
+        self._query_extractor_built_at = time.monotonic()
+
+    def _get_query_extractor(self) -> QueryMetaExtractor | None:
+        """Return the local extractor; retrain it in the background when due."""
+        due = (
+            time.monotonic() - self._query_extractor_built_at
+            >= self.query_meta_refresh_seconds
+        )
+        refreshing = self._query_extractor_task and not self._query_extractor_task.done()
+        if due and not refreshing:
+            self._query_extractor_task = asyncio.get_running_loop().create_task(
+                self.refresh_query_extractor()
+            )
+        return self._query_extractor
+
+    async def _extract_query_meta(self, query: str) -> ExamMeta | None:
+        """Guess the query's metadata locally, asking the LLM only when unsure."""
+        extractor = self._get_query_extractor()
+        if extractor is None:
+            logger.debug("Query metadata extractor not trained yet, asking the LLM")
+            return await self._extract_meta(query)
+        local = extractor.extract(query)
+        if local.subject and local.confidence >= self.query_meta_threshold:
+            return ExamMeta(branch=local.branch, subject=local.subject, title=query[:200])
+        logger.debug(
+            f"Local query metadata not confident ({local.confidence:.2f}), asking the LLM"
+        )
+        return await self._extract_meta(query)
+
+    async def _query_meta(self, query: str) -> ExamMeta:
+        """Metadata of the user query, extracted the same way as for chunks."""
+        key = " ".join(query.split()).lower()
+        cached = self._query_cache.get(key)
+        CACHE_LOOKUPS.inc(cache="query", result="miss" if cached is None else "hit")
+        if cached is not None:
+            self._query_cache.move_to_end(key)
+            return cached
+
+        meta = await self._extract_query_meta(query) or ExamMeta(
+            branch=["general science"], subject="UNKNOWN", title=query[:60]
+        )
+        self._query_cache[key] = meta
+        if len(self._query_cache) > self.query_cache_size:
+            self._query_cache.popitem(last=False)
+        return meta
+
     async def _prepare_query(self, query: str) -> tuple[str, dict]:
         """
         Parse the user query the same way we parsed the chunks.
         Returns (embedding_text, chroma_filter)
         """
-        meta = await self._extract_meta(query) or ExamMeta(
-            branch=["general science"], subject="UNKNOWN", title=query[:60]
-        )
-        # Chroma filter: match any overlap between stored branches and query branches
-        # Now that branch is a pipe-separated string, use $contains for filtering
-        filter_: dict = (
-            {"branch": {"$in": meta.branch[0].split("|")}} if meta.branch else {}
-        )
-        return meta.to_embedding_text(), filter_
+        meta = await self._query_meta(query)
+        # Match any overlap between stored branches and query branches
+        return meta.to_embedding_text(), branch_filter(meta.branch)
+
+    async def query_scope(self, query: str) -> str:
+        """Subject, branches and index version the answer to *query* depends on.
+
+        Only the local extractor is used, never the LLM, so looking a request
+        up in the response cache stays cheap.  While no subject can be told
+        (extractor not trained yet, nothing indexed) the normalised query
+        itself stands in for it, which limits cache hits to repeated requests.
+        """
+        extractor = self._get_query_extractor()
+        local = extractor.extract(query) if extractor is not None else None
+        if local is None or not local.subject:
+            return f"?{' '.join(query.split()).lower()}||{self.index_version}"
+        branches = ",".join(sorted(local.branch))
+        return f"{local.subject.lower()}|{branches}|{self.index_version}"
+
+    def _vector_search(self, embedding_text: str, k: int, filter_: dict) -> List[Document]:
+        with span("vector_search"):
+            # The store first applies the metadata filter, then similarity search
+            return self.db.similarity_search(embedding_text, k, filter_ or None)
+
+    def _lexical_search(self, query: str, k: int, filter_: dict) -> List[Document]:
+        """BM25 top-*k*, restricted to documents matching the metadata filter."""
+        with span("lexical_search"):
+            allowed = self.facets.match(filter_)
+            ids = [id_ for id_, _ in self.bm25.search(query, k, allowed=allowed)]
+            if not ids:
+                return []
+            data = self.db.get(ids=ids, include=["documents", "metadatas"])
+        found = {
+            id_: Document(page_content=doc, metadata=meta or {})
+            for id_, doc, meta in zip(data["ids"], data["documents"], data["metadatas"])
+        }
+        return [found[id_] for id_ in ids if id_ in found]
+
+    def _fuse(self, rankings: List[List[Document]], k: int) -> List[Document]:
+        """Reciprocal-rank fusion of several ranked result lists."""
+        scores: dict[str, float] = {}
+        docs: dict[str, Document] = {}
+        for ranking in rankings:
+            for rank, doc in enumerate(ranking):
+                key = self.chunk_id(doc.metadata.get("full_chunk", doc.page_content))
+                scores[key] = scores.get(key, 0.0) + 1.0 / (self.rrf_k + rank + 1)
+                docs.setdefault(key, doc)
+        best = sorted(scores, key=scores.__getitem__, reverse=True)[:k]
+        return [docs[key] for key in best]
 
     async def search(self, query: str, k: int = 5):
-        embedding_text, filter_ = await self._prepare_query(query)
-        # Chroma will first apply the metadata filter, then similarity search
-        return await asyncio.to_thread(
-            self.db.similarity_search, embedding_text, k, filter_
+        await self.aload_indexes()
+        with span("prepare_query"):
+            embedding_text, filter_ = await self._prepare_query(query)
+        if not self.hybrid_search:
+            return await asyncio.to_thread(self._vector_search, embedding_text, k, filter_)
+        # Over-fetch from both retrievers so fusion has something to re-rank
+        fetch_k = k * 4
+        vector_docs, lexical_docs = await asyncio.gather(
+            asyncio.to_thread(self._vector_search, embedding_text, fetch_k, filter_),
+            asyncio.to_thread(self._lexical_search, query, fetch_k, filter_),
         )
+        return self._fuse([vector_docs, lexical_docs], k)
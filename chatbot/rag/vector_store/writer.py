@@ -0,0 +1,168 @@
+"""
+Single writer for the vector store, with group commit.
+
+Producers (one per file being indexed) hand their embedded documents to
+:meth:`GroupCommitWriter.write` and wait until the documents are persisted.
+One writer task drains the queue.  When fewer than *batch_size* documents
+are queued, it waits up to *window_ms* for more.  It then writes everything
+queued in one call and persists once.  Producers that arrive while a batch
+is being committed join the next one.  The store thus sees a single
+writer, and one persist per batch instead of one per file.
+
+Deletions go through the same queue, so the store's mutations are
+serialised in the order they were requested.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Callable, Deque, List, Optional
+
+from langchain_core.documents import Document
+from loguru import logger
+
+from chatbot.telemetry import STORE_COMMIT_SECONDS, STORE_DOCUMENTS_WRITTEN
+
+UpsertFn = Callable[[List[str], List[Document], List[List[float]]], None]
+DeleteFn = Callable[[List[str]], None]
+
+
+@dataclass
+class _Pending:
+    ids: List[str]
+    documents: Optional[List[Document]]  # None: delete *ids*
+    vectors: Optional[List[List[float]]]
+    future: asyncio.Future
+
+
+class GroupCommitWriter:
+    def __init__(
+        self,
+        upsert: UpsertFn,
+        delete: DeleteFn,
+        batch_size: int = 512,
+        window_ms: float = 50.0,
+    ):
+        """
+        Args:
+            upsert: Writes ``(ids, documents, vectors)`` and persists them;
+                called from a worker thread.
+            delete: Deletes ``ids`` and persists; called from a worker thread.
+            batch_size: Documents committed together at most.  One write
+                larger than this is still committed whole.
+            window_ms: How long to wait for more writes before committing a
+                batch smaller than *batch_size*.
+        """
+        self._upsert = upsert
+        self._delete = delete
+        self.batch_size = batch_size
+        self.window = window_ms / 1000
+        self._queue: Deque[_Pending] = deque()
+        self._task: Optional[asyncio.Task] = None
+        self.documents = 0
+        self.commits = 0
+        self.commit_seconds = 0.0
+
+    async def write(
+        self, ids: List[str], documents: List[Document], vectors: List[List[float]]
+    ) -> None:
+        """Queue documents for the next commit and wait until they are persisted."""
+        if ids:
+            await self._submit(_Pending(ids, documents, vectors, self._future()))
+
+    async def delete(self, ids: List[str]) -> None:
+        """Queue a deletion and wait until it is persisted."""
+        if ids:
+            await self._submit(_Pending(ids, None, None, self._future()))
+
+    def stats(self) -> dict:
+        """Documents written, commits and throughput over the commit time."""
+        return {
+            "documents": self.documents,
+            "commits": self.commits,
+            "docs_per_commit": round(self.documents / self.commits, 1) if self.commits else None,
+            "commit_seconds": round(self.commit_seconds, 3),
+            "docs_per_sec": (
+                round(self.documents / self.commit_seconds, 1) if self.commit_seconds else None
+            ),
+        }
+
+    @staticmethod
+    def _future() -> asyncio.Future:
+        return asyncio.get_running_loop().create_future()
+
+    async def _submit(self, pending: _Pending) -> None:
+        self._queue.append(pending)
+        # The writer task exits once the queue is empty, so it never
+        # outlives the event loop that started it
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+        await pending.future
+
+    async def _run(self) -> None:
+        while self._queue:
+            if self._queue[0].documents is None:
+                await self._commit([self._queue.popleft()])
+                continue
+            if self._queued_documents() < self.batch_size and self.window:
+                await asyncio.sleep(self.window)
+            batch = [self._queue.popleft()]
+            size = len(batch[0].ids)
+            while (
+                self._queue
+                and self._queue[0].documents is not None
+                and size + len(self._queue[0].ids) <= self.batch_size
+            ):
+                batch.append(self._queue.popleft())
+                size += len(batch[-1].ids)
+            await self._commit(batch)
+
+    def _queued_documents(self) -> int:
+        size = 0
+        for pending in self._queue:
+            if pending.documents is None:
+                break
+            size += len(pending.ids)
+        return size
+
+    async def _commit(self, batch: List[_Pending]) -> None:
+        start = time.perf_counter()
+        try:
+            if batch[0].documents is None:
+                await asyncio.to_thread(self._delete, batch[0].ids)
+                written = 0
+            else:
+                # One row per ID: the last write wins, as with separate upserts
+                rows = {}
+                for pending in batch:
+                    rows.update(zip(pending.ids, zip(pending.documents, pending.vectors)))
+                ids = list(rows)
+                await asyncio.to_thread(
+                    self._upsert,
+                    ids,
+                    [document for document, _ in rows.values()],
+                    [vector for _, vector in rows.values()],
+                )
+                written = len(ids)
+        except Exception as exc:  # noqa: BLE001 – reported to every producer
+            for pending in batch:
+                if not pending.future.done():
+                    pending.future.set_exception(exc)
+            return
+        seconds = time.perf_counter() - start
+        if written:
+            self.documents += written
+            self.commits += 1
+            self.commit_seconds += seconds
+            STORE_DOCUMENTS_WRITTEN.inc(written)
+            STORE_COMMIT_SECONDS.observe(seconds)
+            logger.debug(
+                f"Committed {written} documents from {len(batch)} writers "
+                f"in {seconds * 1000:.1f} ms"
+            )
+        for pending in batch:
+            if not pending.future.done():
+                pending.future.set_result(None)
@@ -0,0 +1,297 @@
+"""
+Semantic cache for generated exam responses.
+
+Requests are normalised and embedded; a new request whose embedding is close
+enough (cosine similarity ≥ threshold) to a cached one reuses its response.
+Every entry belongs to a *scope* (e.g. the subject and branches extracted from
+the request plus the index version) and only entries of the same scope are
+compared, so near-identical requests for another subject or branch, or
+answers generated from an older index, are never served.
+Entries live in SQLite so they survive restarts, expire after a TTL and are
+evicted least-recently-used once the cache is full.  Embeddings are also kept
+in memory as one normalised float32 matrix, so a lookup is a single matmul.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+from loguru import logger
+
+from chatbot.telemetry import CACHE_LOOKUPS
+
+
+class SemanticResponseCache:
+    def __init__(
+        self,
+        path: str,
+        embeddings: Embeddings,
+        similarity_threshold: float = 0.95,
+        ttl_seconds: float = 24 * 3600,
+        max_entries: int = 1000,
+    ):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.embeddings = embeddings
+        self.similarity_threshold = similarity_threshold
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._lock, self._conn:
+            columns = [
+                row[1] for row in self._conn.execute("PRAGMA table_info(responses)")
+            ]
+            if columns and "scope" not in columns:
+                # Entries cached without a scope cannot be trusted; start over
+                logger.info("Dropping response cache entries without a scope")
+                self._conn.execute("DROP TABLE responses")
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS responses (
+                    id         INTEGER PRIMARY KEY AUTOINCREMENT,
+                    scope      TEXT NOT NULL,
+                    request    TEXT NOT NULL,
+                    embedding  BLOB NOT NULL,
+                    response   TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    last_hit   REAL NOT NULL,
+                    UNIQUE (scope, request)
+                )
+                """
+            )
+
+        # In-memory mirror of the table.  Entries are appended to the matrix
+        # of unit-norm vectors as they are cached; rows of dropped entries
+        # are only reclaimed once they make up half of the matrix.
+        self._ids: List[int] = []  # matrix row → entry id (-1 once dropped)
+        self._entries: Dict[int, Tuple[int, str, str]] = {}  # id → (row, scope, request)
+        self._by_request: Dict[Tuple[str, str], int] = {}
+        self._by_scope: Dict[str, np.ndarray] = {}  # scope → matrix rows
+        self._created: Dict[int, float] = {}  # oldest first
+        self._recency: "OrderedDict[int, None]" = OrderedDict()  # least recently hit first
+        self._matrix = np.zeros((0, 0), dtype=np.float32)  # may have spare rows
+        self._stats = {"hits": 0, "exact_hits": 0, "semantic_hits": 0, "misses": 0}
+        self._load()
+
+    # ------------------------------------------------------------------ #
+    # PUBLIC API                                                         #
+    # ------------------------------------------------------------------ #
+
+    @staticmethod
+    def normalize(request: str) -> str:
+        """Lower-case, drop punctuation and collapse whitespace."""
+        text = re.sub(r"[^\w\s]", " ", request.lower())
+        return re.sub(r"\s+", " ", text).strip()
+
+    async def get(self, request: str, scope: str = "") -> Optional[str]:
+        """Return the cached response for *request* (or a similar one) in *scope*."""
+        key = self.normalize(request)
+        row_id = self._by_request.get((scope, key))
+        if row_id is not None and not self._expired(row_id):
+            self._stats["exact_hits"] += 1
+            CACHE_LOOKUPS.inc(cache="response", result="exact_hit")
+            return await asyncio.to_thread(self._hit, row_id)
+
+        if scope in self._by_scope:
+            vector = self._unit(await self.embeddings.aembed_query(key))
+            with self._lock:
+                rows = self._by_scope.get(scope)
+                if rows is not None and self._matrix.shape[1] == vector.shape[0]:
+                    scores = self._matrix[rows] @ vector
+                    best = int(rows[int(np.argmax(scores))])
+                    score, row_id = float(scores.max()), self._ids[best]
+                else:
+                    score, row_id = -1.0, None
+            if row_id is not None and score >= self.similarity_threshold:
+                if not self._expired(row_id):
+                    logger.debug(f"Semantic cache hit (similarity {score:.3f})")
+                    self._stats["semantic_hits"] += 1
+                    CACHE_LOOKUPS.inc(cache="response", result="semantic_hit")
+                    return await asyncio.to_thread(self._hit, row_id)
+
+        self._stats["misses"] += 1
+        CACHE_LOOKUPS.inc(cache="response", result="miss")
+        return None
+
+    async def set(self, request: str, response: str, scope: str = "") -> None:
+        """Cache *response* for *request* in *scope*."""
+        key = self.normalize(request)
+        vector = self._unit(await self.embeddings.aembed_query(key))
+        await asyncio.to_thread(self._insert, scope, key, vector, response)
+
+    def stats(self) -> dict:
+        hits = self._stats["exact_hits"] + self._stats["semantic_hits"]
+        lookups = hits + self._stats["misses"]
+        return {
+            **self._stats,
+            "hits": hits,
+            "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+        }
+
+    # ------------------------------------------------------------------ #
+    # STORAGE                                                            #
+    # ------------------------------------------------------------------ #
+
+    def _load(self) -> None:
+        with self._lock, self._conn:
+            self._conn.execute(
+                "DELETE FROM responses WHERE created_at < ?",
+                (time.time() - self.ttl_seconds,),
+            )
+            rows = self._conn.execute(
+                "SELECT id, scope, request, embedding, created_at, last_hit "
+                "FROM responses ORDER BY id"
+            ).fetchall()
+        # Entries embedded with a different model (dimension) are ignored
+        dim = len(rows[-1][3]) if rows else 0
+        rows = [row for row in rows if len(row[3]) == dim]
+        vectors = [np.frombuffer(row[3], dtype=np.float32) for row in rows]
+        by_scope: Dict[str, List[int]] = {}
+        for i, row in enumerate(rows):
+            by_scope.setdefault(row[1], []).append(i)
+        with self._lock:
+            self._ids = [row[0] for row in rows]
+            self._entries = {row[0]: (i, row[1], row[2]) for i, row in enumerate(rows)}
+            self._by_request = {(row[1], row[2]): row[0] for row in rows}
+            self._by_scope = {
+                scope: np.asarray(indices, dtype=np.intp)
+                for scope, indices in by_scope.items()
+            }
+            self._created = {row[0]: row[4] for row in rows}
+            self._recency = OrderedDict(
+                (row[0], None) for row in sorted(rows, key=lambda row: row[5])
+            )
+            self._matrix = (
+                np.vstack(vectors) if vectors else np.zeros((0, 0), dtype=np.float32)
+            )
+        logger.debug(f"Loaded {len(rows)} cached responses")
+
+    def _hit(self, row_id: int) -> Optional[str]:
+        with self._lock, self._conn:
+            self._conn.execute(
+                "UPDATE responses SET last_hit = ? WHERE id = ?", (time.time(), row_id)
+            )
+            row = self._conn.execute(
+                "SELECT response FROM responses WHERE id = ?", (row_id,)
+            ).fetchone()
+            if row_id in self._recency:
+                self._recency.move_to_end(row_id)
+        return row[0] if row else None
+
+    def _insert(self, scope: str, key: str, vector: np.ndarray, response: str) -> None:
+        now = time.time()
+        with self._lock:
+            # A new embedding model (dimension) rebuilds the mirror from the table
+            reload = bool(self._matrix.size) and self._matrix.shape[1] != vector.shape[0]
+            with self._conn:
+                row_id = self._conn.execute(
+                    "INSERT OR REPLACE INTO responses "
+                    "(scope, request, embedding, response, created_at, last_hit) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    (scope, key, vector.tobytes(), response, now, now),
+                ).lastrowid
+                if reload:
+                    self._conn.execute(
+                        "DELETE FROM responses WHERE id NOT IN ("
+                        "SELECT id FROM responses ORDER BY last_hit DESC LIMIT ?)",
+                        (self.max_entries,),
+                    )
+                else:
+                    replaced = self._by_request.get((scope, key))
+                    if replaced is not None:
+                        self._drop(replaced)
+                    self._append(row_id, scope, key, vector, now)
+                    # Drop expired entries, then the least recently used overflow
+                    stale = self._evict(now)
+                    self._conn.executemany(
+                        "DELETE FROM responses WHERE id = ?", [(i,) for i in stale]
+                    )
+            if 2 * len(self._entries) < len(self._ids):
+                self._compact()
+        if reload:
+            self._load()
+
+    def _append(
+        self, row_id: int, scope: str, key: str, vector: np.ndarray, created: float
+    ) -> None:
+        """Add an entry to the in-memory mirror; the caller holds the lock."""
+        row = len(self._ids)
+        if row == len(self._matrix):
+            grown = np.zeros((max(2 * row, 16), vector.shape[0]), dtype=np.float32)
+            if row:
+                grown[:row] = self._matrix[:row]
+            self._matrix = grown
+        self._matrix[row] = vector
+        self._ids.append(row_id)
+        self._entries[row_id] = (row, scope, key)
+        self._by_request[(scope, key)] = row_id
+        rows = self._by_scope.get(scope)
+        self._by_scope[scope] = (
+            np.array([row], dtype=np.intp) if rows is None else np.append(rows, row)
+        )
+        self._created[row_id] = created
+        self._recency[row_id] = None
+
+    def _drop(self, row_id: int) -> None:
+        """Remove an entry from the in-memory mirror; the caller holds the lock."""
+        row, scope, key = self._entries.pop(row_id)
+        self._ids[row] = -1
+        del self._by_request[(scope, key)]
+        rows = self._by_scope[scope][self._by_scope[scope] != row]
+        if len(rows):
+            self._by_scope[scope] = rows
+        else:
+            del self._by_scope[scope]
+        del self._created[row_id]
+        del self._recency[row_id]
+
+    def _evict(self, now: float) -> List[int]:
+        """Drop expired and least recently used entries; return their ids."""
+        stale = []
+        for row_id, created in self._created.items():
+            if created >= now - self.ttl_seconds:
+                break
+            stale.append(row_id)
+        for row_id in stale:
+            self._drop(row_id)
+        while len(self._entries) > self.max_entries:
+            row_id = next(iter(self._recency))
+            self._drop(row_id)
+            stale.append(row_id)
+        return stale
+
+    def _compact(self) -> None:
+        """Reclaim the matrix rows of dropped entries; the caller holds the lock."""
+        live = [row for row, row_id in enumerate(self._ids) if row_id >= 0]
+        self._matrix = self._matrix[live]
+        self._ids = [self._ids[row] for row in live]
+        by_scope: Dict[str, List[int]] = {}
+        for row, row_id in enumerate(self._ids):
+            _, scope, key = self._entries[row_id]
+            self._entries[row_id] = (row, scope, key)
+            by_scope.setdefault(scope, []).append(row)
+        self._by_scope = {
+            scope: np.asarray(rows, dtype=np.intp) for scope, rows in by_scope.items()
+        }
+
+    def _expired(self, row_id: int) -> bool:
+        created = self._created.get(row_id)
+        return created is None or time.time() - created > self.ttl_seconds
+
+    @staticmethod
+    def _unit(vector: List[float]) -> np.ndarray:
+        array = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(array)
+        return array / norm if norm else array
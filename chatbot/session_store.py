@@ -0,0 +1,210 @@
+"""
+Per-session conversation history with bounded memory.
+
+Each session keeps its last ``history_length`` messages in a ring buffer
+(:class:`collections.deque` with ``maxlen``), so appending never rebuilds a
+list.  Sessions are held in an LRU that is capped at ``max_sessions`` and
+drops sessions idle for longer than ``ttl_seconds``, so memory stays flat no
+matter how many users come and go.
+
+An optional backend persists sessions outside the process.  Any object with
+Redis-style ``get(key)``, ``set(key, value, ex=seconds)`` and ``delete(key)``
+methods works: a ``redis.Redis`` client, or the local
+:class:`SQLiteSessionBackend` stand-in.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Deque, List, Optional, Protocol
+
+from langchain_core.messages import BaseMessage, messages_from_dict, messages_to_dict
+from loguru import logger
+
+from config_loader import AppConfig
+
+
+class SessionBackend(Protocol):
+    def get(self, key: str) -> Optional[bytes | str]: ...
+
+    def set(self, key: str, value: str, ex: Optional[int] = None) -> object: ...
+
+    def delete(self, key: str) -> object: ...
+
+
+class SQLiteSessionBackend:
+    """On-disk, Redis-compatible (``get``/``set``/``delete``) session backend."""
+
+    def __init__(self, path: str):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS sessions "
+                "(key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL)"
+            )
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, expires_at FROM sessions WHERE key = ?", (key,)
+            ).fetchone()
+        if row is None or (row[1] is not None and row[1] < time.time()):
+            return None
+        return row[0]
+
+    def set(self, key: str, value: str, ex: Optional[int] = None) -> None:
+        expires_at = time.time() + ex if ex else None
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO sessions VALUES (?, ?, ?)",
+                (key, value, expires_at),
+            )
+            self._conn.execute(
+                "DELETE FROM sessions WHERE expires_at < ?", (time.time(),)
+            )
+
+    def delete(self, key: str) -> None:
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM sessions WHERE key = ?", (key,))
+
+
+class _Session:
+    __slots__ = ("messages", "last_seen")
+
+    def __init__(self, history_length: int, messages: List[BaseMessage] = ()):
+        self.messages: Deque[BaseMessage] = deque(messages, maxlen=history_length)
+        self.last_seen = time.monotonic()
+
+
+class SessionStore:
+    KEY_PREFIX = "edumind:session:"
+
+    def __init__(
+        self,
+        history_length: int,
+        max_sessions: int = 10000,
+        ttl_seconds: int = 3600,
+        backend: Optional[SessionBackend] = None,
+    ):
+        self.history_length = history_length
+        self.max_sessions = max_sessions
+        self.ttl_seconds = ttl_seconds
+        self.backend = backend
+        self._sessions: "OrderedDict[str, _Session]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.evictions = 0
+
+    # ------------------------------------------------------------------ #
+    # PUBLIC API                                                         #
+    # ------------------------------------------------------------------ #
+
+    async def history(self, session_id: str) -> List[BaseMessage]:
+        """Return the (at most ``history_length``) messages of *session_id*."""
+        session = await self._session(session_id)
+        return list(session.messages)
+
+    async def append(self, session_id: str, *messages: BaseMessage) -> None:
+        """Append *messages*; the oldest fall out of the ring buffer."""
+        session = await self._session(session_id)
+        with self._lock:
+            session.messages.extend(messages)
+            snapshot = list(session.messages)
+        if self.backend is not None:
+            payload = json.dumps(messages_to_dict(snapshot))
+            await asyncio.to_thread(
+                self.backend.set, self._key(session_id), payload, ex=self.ttl_seconds
+            )
+
+    async def clear(self, session_id: str) -> None:
+        with self._lock:
+            self._sessions.pop(session_id, None)
+        if self.backend is not None:
+            await asyncio.to_thread(self.backend.delete, self._key(session_id))
+
+    def stats(self) -> dict:
+        return {
+            "active_sessions": len(self._sessions),
+            "max_sessions": self.max_sessions,
+            "evictions": self.evictions,
+            "backend": type(self.backend).__name__ if self.backend else None,
+        }
+
+    # ------------------------------------------------------------------ #
+    # INTERNALS                                                          #
+    # ------------------------------------------------------------------ #
+
+    async def _session(self, session_id: str) -> _Session:
+        with self._lock:
+            self._evict_idle()
+            session = self._sessions.get(session_id)
+            if session is not None:
+                session.last_seen = time.monotonic()
+                self._sessions.move_to_end(session_id)
+                return session
+
+        messages: List[BaseMessage] = []
+        if self.backend is not None:
+            raw = await asyncio.to_thread(self.backend.get, self._key(session_id))
+            if raw:
+                messages = messages_from_dict(json.loads(raw))
+
+        with self._lock:
+            # Another request may have created it while we were loading
+            session = self._sessions.get(session_id)
+            if session is None:
+                session = _Session(self.history_length, messages)
+                self._sessions[session_id] = session
+                while len(self._sessions) > self.max_sessions:
+                    self._sessions.popitem(last=False)
+                    self.evictions += 1
+            return session
+
+    def _evict_idle(self) -> None:
+        """Drop idle sessions; the LRU order puts the oldest first."""
+        deadline = time.monotonic() - self.ttl_seconds
+        while self._sessions:
+            oldest = next(iter(self._sessions.values()))
+            if oldest.last_seen >= deadline:
+                break
+            self._sessions.popitem(last=False)
+            self.evictions += 1
+
+    def _key(self, session_id: str) -> str:
+        return f"{self.KEY_PREFIX}{session_id}"
+
+
+def create_session_store(config: AppConfig) -> SessionStore:
+    """Build the :class:`SessionStore` described by ``config.session``."""
+    session_config = config.session
+    backend: Optional[SessionBackend] = None
+    if session_config.backend == "sqlite":
+        backend = SQLiteSessionBackend(session_config.path)
+    elif session_config.backend == "redis":
+        try:
+            import redis
+        except ImportError as exc:
+            raise ImportError(
+                "session.backend 'redis' requires the redis package "
+                "(pip install redis)"
+            ) from exc
+        backend = redis.Redis.from_url(session_config.redis_url)
+    elif session_config.backend != "memory":
+        raise ValueError(
+            f"Unsupported session backend: {session_config.backend}. "
+            "Supported backends are: memory, sqlite, redis"
+        )
+    logger.info(f"Session store backend: {session_config.backend}")
+    return SessionStore(
+        history_length=config.chat.history_length,
+        max_sessions=session_config.max_sessions,
+        ttl_seconds=session_config.ttl_seconds,
+        backend=backend,
+    )
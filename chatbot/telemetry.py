@@ -0,0 +1,283 @@
+"""
+Timing spans and Prometheus metrics.
+
+:func:`span` times a block of work (a chat stage, a vector search, a pipeline
+stage) into the ``edumind_stage_seconds`` histogram and :func:`llm_call`
+does the same for one LLM request, by prompt type.  Metrics live in process
+and are rendered in the Prometheus text format by :func:`render_metrics`,
+which the API serves at ``/metrics``.
+
+When :func:`setup_tracing` was given an OTLP endpoint, every span is also
+exported to OpenTelemetry; ``opentelemetry-sdk`` and
+``opentelemetry-exporter-otlp`` are only needed then.
+"""
+
+from __future__ import annotations
+
+import math
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from typing import Any, Callable, ContextManager, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from loguru import logger
+
+DEFAULT_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0,
+)
+
+
+# ---------------------------------------------------------------------- #
+# METRICS                                                                #
+# ---------------------------------------------------------------------- #
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value))
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple[str, ...], Any] = {}
+        self._lock = threading.Lock()
+        _REGISTRY.append(self)
+
+    def _key(self, labels: Dict[str, Any]) -> Tuple[str, ...]:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def _samples(self) -> List[str]:
+        raise NotImplementedError
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            lines.extend(self._samples())
+        return "\n".join(lines)
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1.0, **labels: Any) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def _samples(self) -> List[str]:
+        return [
+            f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+            for key, value in sorted(self._values.items())
+        ]
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def dec(self, amount: float = 1.0, **labels: Any) -> None:
+        self.inc(-amount, **labels)
+
+    def set(self, value: float, **labels: Any) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+
+    def observe(self, value: float, **labels: Any) -> None:
+        key = self._key(labels)
+        with self._lock:
+            counts, total = self._values.get(key) or ([0] * len(self.buckets), 0.0)
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+                    break
+            self._values[key] = (counts, total + value)
+
+    def _samples(self) -> List[str]:
+        lines = []
+        for key, (counts, total) in sorted(self._values.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                le = f'le="{_format_value(bound)}"'
+                lines.append(
+                    f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}"
+                )
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+_REGISTRY: List[_Metric] = []
+
+
+def render_metrics() -> str:
+    """All metrics in the Prometheus text exposition format."""
+    return "\n".join(metric.render() for metric in _REGISTRY) + "\n"
+
+
+REQUESTS_IN_FLIGHT = Gauge(
+    "edumind_requests_in_flight", "HTTP requests being served.", ["route"]
+)
+HTTP_REQUESTS = Counter(
+    "edumind_http_requests_total", "HTTP requests served.", ["route", "method", "status"]
+)
+HTTP_REQUEST_SECONDS = Histogram(
+    "edumind_http_request_seconds", "HTTP request duration, until the last body byte.", ["route"]
+)
+STAGE_SECONDS = Histogram(
+    "edumind_stage_seconds", "Duration of timed spans.", ["stage", "outcome"]
+)
+LLM_SECONDS = Histogram(
+    "edumind_llm_seconds", "LLM call latency, including retries.", ["prompt"]
+)
+LLM_CALLS = Counter(
+    "edumind_llm_calls_total", "LLM calls.", ["prompt", "outcome"]
+)
+LLM_RETRIES = Counter(
+    "edumind_llm_retries_total", "LLM calls retried after a transient error.", ["prompt"]
+)
+CACHE_LOOKUPS = Counter(
+    "edumind_cache_lookups_total", "Cache lookups.", ["cache", "result"]
+)
+PDF_PAGES = Counter(
+    "edumind_pdf_pages_total", "Parsed PDF pages by where their text came from.", ["source"]
+)
+STORE_DOCUMENTS_WRITTEN = Counter(
+    "edumind_vector_store_documents_written_total", "Documents committed to the vector store."
+)
+STORE_COMMIT_SECONDS = Histogram(
+    "edumind_vector_store_commit_seconds", "Vector store group commits, write plus persist."
+)
+PIPELINE_FILES = Counter(
+    "edumind_pipeline_files_total", "Files through each indexing stage.", ["stage", "outcome"]
+)
+PIPELINE_FILE_SECONDS = Histogram(
+    "edumind_pipeline_file_seconds", "Time per file in each indexing stage.", ["stage"]
+)
+
+
+# ---------------------------------------------------------------------- #
+# TRACING                                                                #
+# ---------------------------------------------------------------------- #
+
+_tracer = None
+_provider = None
+
+
+def setup_tracing(otlp_endpoint: Optional[str], service_name: str = "edumind-chatbot") -> None:
+    """Export spans to an OTLP (gRPC) collector, e.g. ``http://localhost:4317``.
+
+    Without an endpoint spans only feed the Prometheus histograms.
+    """
+    global _tracer, _provider
+    if not otlp_endpoint:
+        return
+    try:
+        from opentelemetry.exporter.otlp.proto.grpc.trace_exporter import OTLPSpanExporter
+        from opentelemetry.sdk.resources import Resource
+        from opentelemetry.sdk.trace import TracerProvider
+        from opentelemetry.sdk.trace.export import BatchSpanProcessor
+    except ImportError as exc:
+        raise ImportError(
+            "telemetry.otlp_endpoint requires OpenTelemetry "
+            "(pip install opentelemetry-sdk opentelemetry-exporter-otlp)"
+        ) from exc
+
+    _provider = TracerProvider(resource=Resource.create({"service.name": service_name}))
+    _provider.add_span_processor(
+        BatchSpanProcessor(OTLPSpanExporter(endpoint=otlp_endpoint, insecure=True))
+    )
+    _tracer = _provider.get_tracer("edumind")
+    logger.info(f"Exporting traces to {otlp_endpoint}")
+
+
+def shutdown_tracing() -> None:
+    """Flush and stop the span exporter."""
+    global _tracer, _provider
+    if _provider is not None:
+        _provider.shutdown()
+    _tracer = _provider = None
+
+
+@contextmanager
+def _timed(
+    name: str, attributes: Dict[str, Any], record: Callable[[float, str], None]
+) -> Iterator[None]:
+    """Time the block and pass its duration and outcome to *record*."""
+    otel = (
+        _tracer.start_as_current_span(name, attributes=attributes)
+        if _tracer is not None
+        else nullcontext()
+    )
+    outcome = "ok"
+    start = time.perf_counter()
+    try:
+        with otel:
+            yield
+    except BaseException:
+        outcome = "error"
+        raise
+    finally:
+        seconds = time.perf_counter() - start
+        logger.debug(f"[Span] {name}: {seconds * 1000:.1f} ms ({outcome})")
+        record(seconds, outcome)
+
+
+def span(name: str, **attributes: Any) -> ContextManager[None]:
+    """Time a stage into ``edumind_stage_seconds`` (and an OpenTelemetry span).
+
+    Do not ``yield`` from an async generator inside the block: the
+    OpenTelemetry context must be exited in the task that entered it.
+    """
+    def record(seconds: float, outcome: str) -> None:
+        STAGE_SECONDS.observe(seconds, stage=name, outcome=outcome)
+
+    return _timed(name, attributes, record)
+
+
+def observe_llm(prompt: str, seconds: float, outcome: str = "ok") -> None:
+    """Record one LLM request of type *prompt* timed by the caller."""
+    LLM_SECONDS.observe(seconds, prompt=prompt)
+    LLM_CALLS.inc(prompt=prompt, outcome=outcome)
+
+
+def llm_call(prompt: str, **attributes: Any) -> ContextManager[None]:
+    """Time one LLM request of type *prompt* (``edumind_llm_*`` metrics)."""
+    return _timed(
+        f"llm.{prompt}",
+        {"prompt": prompt, **attributes},
+        lambda seconds, outcome: observe_llm(prompt, seconds, outcome),
+    )
@@ -12,6 +12,7 @@ class LLMConfig(BaseModel):
     top_p: float
     frequency_penalty: float
     presence_penalty: float
+    max_retries: int = 2  # Retries of a transient LLM error, with exponential backoff
 
 
 class APIConfig(BaseModel):
@@ -24,20 +25,93 @@ class ChatConfig(BaseModel):
     history_length: int
 
 
+class SessionConfig(BaseModel):
+    backend: str = "memory"  # "memory", "sqlite" or "redis"
+    max_sessions: int = 10000
+    ttl_seconds: int = 3600
+    path: str = ".cache/sessions.sqlite"  # sqlite backend
+    redis_url: Optional[str] = None  # redis backend
+
+
 class ChunkConfig(BaseModel):
     chunk_size: int
     overlap: int
     chunk_type: str
+    workers: Optional[int] = None  # Chunking processes; None/0 → one per CPU core
+
+
+class EmbeddingConfig(BaseModel):
+    backend: str = "openai"  # "openai" or "local"
+    model: Optional[str] = None  # OpenAI embedding model; None → library default
+    local_model: str = "sentence-transformers/all-MiniLM-L6-v2"  # Local backend and SemanticChunker
+    device: str = "cpu"
+    batch_size: int = 64  # Max texts per forward pass
+    max_batch_tokens: int = 16384  # Max padded tokens per forward pass
+    tokenizer_threads: int = 4
+
+
+class ParsingConfig(BaseModel):
+    cache_path: str = ".cache/pdf_pages.sqlite"  # Parsed pages by PDF SHA-256; "" disables
+    local_text_layer: bool = True  # Use the PDF's own text where it is good enough
+    min_text_quality: float = 0.9  # Pages scoring lower go to Azure
+    min_page_chars: int = 40  # Pages with less text count as scanned
+    local_workers: Optional[int] = None  # Text-layer processes; None/0 → one per CPU core
+    azure_model: str = "prebuilt-document"
+    pages_per_request: int = 4  # Longer PDFs are analysed in page ranges of this size
+    range_concurrency: int = 4  # Page ranges of one PDF analysed at once
+
+
+class PipelineConfig(BaseModel):
+    mode: str = "staged"  # "staged" (stage barriers) or "streaming"
+    parse_concurrency: int = 10
+    embed_concurrency: int = 4
+    queue_size: int = 16  # Per-stage queue bound in streaming mode
+
+
+class ResponseCacheConfig(BaseModel):
+    enabled: bool = True
+    path: str = ".cache/responses.sqlite"
+    similarity_threshold: float = 0.95
+    ttl_seconds: float = 86400
+    max_entries: int = 1000
+
+
+class RerankConfig(BaseModel):
+    enabled: bool = True  # False → filter context per exercise with the LLM
+    top_n: int = 3  # Passages passed to each exercise prompt
+    mmr: bool = True
+    mmr_lambda: float = 0.7  # 1.0 = pure relevance, lower = more diverse
+
+
+class PromptConfig(BaseModel):
+    context_window: int = 128000  # Prompt + completion tokens the model accepts
+    context_tokens: int = 6000  # Retrieved chunks per prompt
+    message_tokens: int = 1000  # User message
+    exercise_tokens: int = 500  # Exercise JSON
+
+
+class TelemetryConfig(BaseModel):
+    otlp_endpoint: Optional[str] = None  # e.g. http://localhost:4317; None → no span export
+    service_name: str = "edumind-chatbot"
 
 
 class AppConfig(BaseModel):
     llm: LLMConfig
     api: APIConfig
     chat: ChatConfig
+    session: SessionConfig = SessionConfig()
+    parsing: ParsingConfig = ParsingConfig()
     chunking: ChunkConfig
+    pipeline: PipelineConfig = PipelineConfig()
+    embeddings: EmbeddingConfig = EmbeddingConfig()
+    response_cache: ResponseCacheConfig = ResponseCacheConfig()
+    rerank: RerankConfig = RerankConfig()
+    prompt: PromptConfig = PromptConfig()
+    telemetry: TelemetryConfig = TelemetryConfig()
     exams_path: Optional[str] = None
     vector_store: Optional[dict] = None
     force_reload: Optional[bool] = False
+    index_on_startup: Optional[bool] = True
 
 
 def load_config() -> AppConfig:
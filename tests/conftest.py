@@ -0,0 +1,64 @@
+import hashlib
+from typing import List
+
+import numpy as np
+import pytest
+from langchain_core.embeddings import Embeddings
+
+from benchmarks.common import load_bench_config
+from benchmarks.fakes import FakeChatOpenAI
+
+
+class HashEmbeddings(Embeddings):
+    """Unit vectors derived from a hash of the text; counts the texts embedded."""
+
+    def __init__(self, size: int = 16):
+        self.size = size
+        self.calls = 0
+
+    def _vector(self, text: str) -> List[float]:
+        seed = int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:8], "little")
+        vector = np.random.default_rng(seed).standard_normal(self.size)
+        return (vector / np.linalg.norm(vector)).tolist()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        self.calls += len(texts)
+        return [self._vector(text) for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        self.calls += 1
+        return self._vector(text)
+
+
+@pytest.fixture
+def embeddings():
+    return HashEmbeddings()
+
+
+class CountingChat(FakeChatOpenAI):
+    """Fake chat model that counts the prompts it answers."""
+
+    calls: int = 0
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs):
+        self.calls += 1
+        return await super()._agenerate(messages, stop, run_manager, **kwargs)
+
+
+@pytest.fixture
+def make_vector_store(tmp_path, embeddings):
+    """Build offline :class:`VectorStore` instances under *tmp_path*."""
+    from chatbot.rag.vector_store import VectorStore
+
+    def _make(backend: str = "flat", llm=None, **vector_store):
+        config = load_bench_config(
+            vector_store={
+                "persist_directory": str(tmp_path / "db"),
+                "embedding_cache_path": "",
+                "backend": backend,
+                **vector_store,
+            }
+        )
+        return VectorStore(config, llm=llm or CountingChat(), embeddings=embeddings)
+
+    return _make
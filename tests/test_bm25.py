@@ -0,0 +1,67 @@
+from chatbot.rag.vector_store.bm25 import BM25Index
+
+DOCS = {
+    "physics": "electromagnetic induction in a coil and a magnet",
+    "chemistry": "acid base titration of acetic acid",
+    "maths": "complex numbers and geometric sequences",
+}
+
+
+def _index(tmp_path):
+    index = BM25Index(str(tmp_path / "bm25"))
+    index.add(list(DOCS), list(DOCS.values()))
+    return index
+
+
+def _ids(results):
+    return [doc_id for doc_id, _ in results]
+
+
+def test_search_ranks_matching_documents(tmp_path):
+    index = _index(tmp_path)
+    assert _ids(index.search("acid titration", k=2)) == ["chemistry"]
+    assert _ids(index.search("unknown words")) == []
+
+
+def test_search_is_restricted_to_allowed_ids(tmp_path):
+    index = _index(tmp_path)
+    assert _ids(index.search("induction acid", allowed={"chemistry"})) == ["chemistry"]
+
+
+def test_existing_ids_are_not_added_twice(tmp_path):
+    index = _index(tmp_path)
+    assert index.add(["physics"], ["something else"]) == 0
+    assert len(index) == 3
+
+
+def test_changes_are_pending_until_persisted(tmp_path):
+    index = _index(tmp_path)
+    assert index.pending == 3
+    index.persist()
+    assert index.pending == 0
+    index.delete(["maths"])
+    assert index.pending == 1
+
+
+def test_persist_round_trip(tmp_path):
+    index = _index(tmp_path)
+    index.persist()
+    index.add(["history"], ["the first world war"])
+    index.delete(["chemistry"])
+    before = index.search("war coil acid complex", k=5)
+    index.persist()
+
+    reopened = BM25Index(str(tmp_path / "bm25"))
+    assert len(reopened) == 3
+    assert "chemistry" not in reopened
+    assert _ids(reopened.search("war coil acid complex", k=5)) == _ids(before)
+    assert reopened.search("war coil acid complex", k=5)[0][1] == before[0][1]
+
+
+def test_deleted_documents_are_not_returned(tmp_path):
+    index = _index(tmp_path)
+    index.delete(["chemistry"])
+    assert _ids(index.search("acid")) == []
+    # A deleted ID can be indexed again
+    assert index.add(["chemistry"], ["acid rain"]) == 1
+    assert _ids(index.search("acid")) == ["chemistry"]
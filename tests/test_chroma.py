@@ -0,0 +1,40 @@
+import asyncio
+
+from chatbot.rag.vector_store.chroma import DEFAULT_MAX_BATCH_SIZE, ChromaCollection
+
+
+class _LimitlessClient:
+    """Client without ``get_max_batch_size`` (e.g. an older or remote one)."""
+
+
+def test_batch_size_falls_back_to_a_constant(tmp_path):
+    collection = ChromaCollection(str(tmp_path / "db"))
+    assert collection.max_batch_size > 0
+    collection.client = _LimitlessClient()
+    assert collection._max_batch_size() == DEFAULT_MAX_BATCH_SIZE
+
+
+def test_writes_are_split_into_accepted_batches(tmp_path):
+    collection = ChromaCollection(str(tmp_path / "db"))
+    collection.max_batch_size = 2
+    ids = [str(i) for i in range(5)]
+    collection.upsert(ids, [[1.0, float(i)] for i in range(5)], ids, [{"n": i} for i in range(5)])
+    collection.update_metadatas(ids, [{"n": -i} for i in range(5)])
+    assert collection.count() == 5
+    assert collection.collection.get(ids=["4"])["metadatas"] == [{"n": -4}]
+    collection.delete(ids[:3])
+    assert collection.count() == 2
+
+
+def test_chroma_backed_store_round_trip(make_vector_store):
+    store = make_vector_store(backend="chroma")
+    store.collection.max_batch_size = 2
+
+    async def main():
+        await store.add_documents([f"chunk {i}" for i in range(5)])
+        assert store.count() == 5
+        assert len(await store.search("chunk 1", k=3)) == 3
+        await store.delete(store.ids()[:4])
+
+    asyncio.run(main())
+    assert store.count() == 1
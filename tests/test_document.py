@@ -0,0 +1,74 @@
+import json
+
+import pytest
+
+from chatbot.rag.chunking.chunker import read_chunks
+from chatbot.rag.parsing.document import (
+    PageLocator,
+    build_pages,
+    document_text,
+    read_parsed_pages,
+    write_parsed_document,
+)
+
+PAGES = [(1, ["BACCALAUREATE 2023", "Mathematics"]), (2, ["Exercise 1", "Solve x + 1 = 0"])]
+
+
+def test_round_trip(tmp_path):
+    path = str(tmp_path / "exam.pdf.parsed.jsonl")
+    assert write_parsed_document(path, PAGES, source="exam.pdf") == 2
+
+    with open(path, encoding="utf-8") as f:
+        header = json.loads(f.readline())
+    assert header["source"] == "exam.pdf"
+    assert header["pages"] == 2
+
+    pages = list(read_parsed_pages(path))
+    assert [(page.number, list(page.lines)) for page in pages] == PAGES
+    text = document_text(pages)
+    assert header["chars"] == len(text)
+    for page in pages:
+        assert text[page.offset:page.end] == page.text
+
+
+def test_unicode_survives_the_round_trip(tmp_path):
+    path = str(tmp_path / "exam.pdf.parsed.jsonl")
+    write_parsed_document(path, [(1, ["Équation : x² − 1 = 0", "مسابقة في الرياضيات"])])
+    assert list(read_parsed_pages(path))[0].lines[1] == "مسابقة في الرياضيات"
+
+
+def test_other_jsonl_files_are_rejected(tmp_path):
+    path = tmp_path / "other.parsed.jsonl"
+    path.write_text('{"format": "something"}\n', encoding="utf-8")
+    with pytest.raises(ValueError):
+        list(read_parsed_pages(str(path)))
+
+
+def test_legacy_text_files_are_split_on_blank_lines(tmp_path):
+    path = tmp_path / "exam.pdf.parsed.txt"
+    path.write_text("page one\nline two\n\npage two", encoding="utf-8")
+    pages = list(read_parsed_pages(str(path)))
+    assert [page.number for page in pages] == [1, 2]
+    assert pages[1].text == "page two"
+
+
+def test_page_locator_maps_spans_to_pages():
+    pages = build_pages(PAGES)
+    locator = PageLocator(pages)
+    assert locator.pages(0, 5) == [1]
+    assert locator.pages(pages[1].offset, pages[1].offset + 3) == [2]
+    assert locator.pages(pages[0].end - 3, pages[1].offset + 3) == [1, 2]
+
+
+def test_read_chunks_reads_both_formats(tmp_path):
+    jsonl = tmp_path / "exam.pdf.chunked.jsonl"
+    jsonl.write_text(
+        json.dumps({"text": "chunk one", "pages": [1]}) + "\n"
+        + json.dumps({"text": "chunk two", "pages": [1, 2]}) + "\n",
+        encoding="utf-8",
+    )
+    assert list(read_chunks(str(jsonl))) == [("chunk one", [1]), ("chunk two", [1, 2])]
+
+    legacy = tmp_path / "exam.pdf.chunked.txt"
+    legacy.write_text("chunk one\n---\nchunk two\nmore\n---\n", encoding="utf-8")
+    assert list(read_chunks(str(legacy))) == [("chunk one", []), ("chunk two\nmore", [])]
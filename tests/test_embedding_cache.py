@@ -0,0 +1,24 @@
+import asyncio
+
+from chatbot.rag.embeddings.cache import CachedEmbeddings
+
+
+def test_embeddings_are_computed_once(tmp_path, embeddings):
+    cached = CachedEmbeddings(embeddings, str(tmp_path / "emb.sqlite"), model="hash")
+    first = cached.embed_documents(["a", "b", "a"])
+    assert embeddings.calls == 2
+    assert cached.embed_documents(["b", "a"]) == [first[1], first[0]]
+    assert embeddings.calls == 2
+    assert cached.stats()["hits"] == 2
+
+
+def test_embedding_cache_persists_and_is_keyed_by_model(tmp_path, embeddings):
+    path = str(tmp_path / "emb.sqlite")
+    vector = asyncio.run(CachedEmbeddings(embeddings, path, model="hash").aembed_query("q"))
+
+    reopened = CachedEmbeddings(embeddings, path, model="hash")
+    assert asyncio.run(reopened.aembed_query("q")) == vector
+    assert embeddings.calls == 1
+
+    CachedEmbeddings(embeddings, path, model="other").embed_query("q")
+    assert embeddings.calls == 2
@@ -0,0 +1,52 @@
+import pytest
+
+from chatbot.rag.vector_store.facets import FacetIndex, branch_filter, facet_fields
+
+
+@pytest.fixture
+def facets():
+    index = FacetIndex()
+    index.add(
+        ["a", "b", "c"],
+        [
+            {"subject": "Physics", **facet_fields(["general science"])},
+            {"subject": "Biology", **facet_fields(["life science"])},
+            {"subject": "Physics", **facet_fields(["general science", "life science"])},
+        ],
+    )
+    return index
+
+
+def test_branch_filter_shapes():
+    assert branch_filter([]) == {}
+    assert branch_filter(["Life Science"]) == {"branch_life_science": True}
+    assert branch_filter(["life science", "general science", "life science"]) == {
+        "$or": [{"branch_life_science": True}, {"branch_general_science": True}]
+    }
+
+
+def test_match(facets):
+    assert facets.match({}) is None
+    assert facets.match(branch_filter(["life science"])) == {"b", "c"}
+    assert facets.match(branch_filter(["general science", "life science"])) == {"a", "b", "c"}
+    assert facets.match({"subject": {"$in": ["Biology"]}}) == {"b"}
+    assert facets.match(
+        {"$and": [{"subject": "Physics"}, branch_filter(["life science"])]}
+    ) == {"c"}
+
+
+def test_re_adding_replaces_facets(facets):
+    facets.add(["c"], [{"subject": "Chemistry"}])
+    assert facets.match({"subject": "Physics"}) == {"a"}
+    assert facets.match(branch_filter(["life science"])) == {"b"}
+
+
+def test_remove(facets):
+    facets.remove(["a", "missing"])
+    assert len(facets) == 2
+    assert facets.match({"subject": "Physics"}) == {"c"}
+
+
+def test_unsupported_operator(facets):
+    with pytest.raises(ValueError):
+        facets.match({"subject": {"$ne": "Physics"}})
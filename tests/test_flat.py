@@ -0,0 +1,106 @@
+from chatbot.rag.vector_store.facets import branch_filter, facet_fields
+from chatbot.rag.vector_store.flat import FlatVectorStore
+
+TEXTS = ["physics | induction", "chemistry | titration", "maths | sequences"]
+BRANCHES = [["general science"], ["life science"], ["general science", "life science"]]
+
+
+def _store(tmp_path, embeddings, **kwargs):
+    store = FlatVectorStore(str(tmp_path / "flat"), embeddings, **kwargs)
+    metadatas = [
+        {"subject": text.split(" |")[0], **facet_fields(branches)}
+        for text, branches in zip(TEXTS, BRANCHES)
+    ]
+    store.add_texts(TEXTS, metadatas, ids=["p", "c", "m"])
+    return store
+
+
+def test_exact_match_is_the_top_hit(tmp_path, embeddings):
+    store = _store(tmp_path, embeddings)
+    assert store.similarity_search(TEXTS[1], k=1)[0].page_content == TEXTS[1]
+    assert len(store.similarity_search(TEXTS[1], k=10)) == 3
+
+
+def test_filters_on_branch_facets(tmp_path, embeddings):
+    store = _store(tmp_path, embeddings)
+    docs = store.similarity_search(TEXTS[0], k=10, filter=branch_filter(["life science"]))
+    assert sorted(doc.page_content for doc in docs) == sorted(TEXTS[1:])
+    docs = store.similarity_search(TEXTS[0], k=10, filter={"subject": "maths"})
+    assert [doc.page_content for doc in docs] == [TEXTS[2]]
+
+
+def test_upsert_replaces_and_delete_removes(tmp_path, embeddings):
+    store = _store(tmp_path, embeddings)
+    store.add_texts(["physics | energy"], [{"subject": "physics"}], ids=["p"])
+    store.delete(["c"])
+    assert store.count() == 2
+    data = store.get(ids=["p", "c"])
+    assert data["ids"] == ["p"]
+    assert data["documents"] == ["physics | energy"]
+
+
+def test_update_metadatas_keeps_the_document(tmp_path, embeddings):
+    store = _store(tmp_path, embeddings)
+    store.update_metadatas(["c"], [{"subject": "biology"}])
+    assert store.get(ids=["c"])["metadatas"] == [{"subject": "biology"}]
+    assert store.similarity_search(TEXTS[1], k=1, filter={"subject": "biology"})
+
+
+def test_persist_round_trip(tmp_path, embeddings):
+    store = _store(tmp_path, embeddings, dtype="float16")
+    store.delete(["m"])
+    store.persist()
+
+    reopened = FlatVectorStore(str(tmp_path / "flat"), embeddings, dtype="float16")
+    assert reopened.count() == 2
+    assert sorted(reopened.get(include=[])["ids"]) == ["c", "p"]
+    assert reopened.similarity_search(TEXTS[0], k=1)[0].page_content == TEXTS[0]
+
+
+def test_metadata_updates_do_not_add_rows(tmp_path, embeddings):
+    store = _store(tmp_path, embeddings)
+    store.update_metadatas(["c"], [{"subject": "biology"}])
+    store.persist()
+    assert store._rows == 3
+
+    reopened = FlatVectorStore(str(tmp_path / "flat"), embeddings)
+    assert reopened.get(ids=["c"])["metadatas"] == [{"subject": "biology"}]
+    assert reopened._rows == 3
+
+
+def test_deleting_and_re_adding_does_not_grow_the_store(tmp_path, embeddings):
+    store = _store(tmp_path, embeddings, compact_dead_fraction=0.5)
+    for i in range(20):
+        store.delete(["m"])
+        store.add_texts([TEXTS[2]], [{"subject": "maths"}], ids=["m"])
+        store.update_metadatas(["p"], [{"subject": f"physics {i}"}])
+        store.persist()
+    assert store.count() == 3
+    assert store._rows < 6
+    assert len(store.get(ids=["m"])["documents"]) == 1
+
+    reopened = FlatVectorStore(str(tmp_path / "flat"), embeddings)
+    assert sorted(reopened.get(include=[])["ids"]) == ["c", "m", "p"]
+    assert reopened.get(ids=["p"])["metadatas"] == [{"subject": "physics 19"}]
+    assert reopened.similarity_search(TEXTS[2], k=1)[0].page_content == TEXTS[2]
+    # Only the current generation's files are kept
+    assert len(list((tmp_path / "flat").glob("docs*.jsonl"))) == 1
+
+
+def test_other_processes_follow_updates_and_compactions(tmp_path, embeddings):
+    writer = _store(tmp_path, embeddings)
+    writer.persist()
+    reader = FlatVectorStore(str(tmp_path / "flat"), embeddings)
+    assert reader.count() == 3
+
+    writer.update_metadatas(["c"], [{"subject": "biology"}])
+    writer.add_texts(["physics | optics"], [{"subject": "physics"}], ids=["o"])
+    writer.persist()
+    assert reader.count() == 4
+    assert reader.get(ids=["c"])["metadatas"] == [{"subject": "biology"}]
+
+    writer.delete(["p", "m"])
+    writer.persist()  # half of the rows are dead: compacted
+    assert writer._generation == 1
+    assert sorted(reader.get(include=[])["ids"]) == ["c", "o"]
+    assert reader.similarity_search(TEXTS[1], k=1)[0].page_content == TEXTS[1]
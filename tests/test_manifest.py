@@ -0,0 +1,87 @@
+import pytest
+
+from chatbot.rag.manifest import IndexManifest
+
+
+@pytest.fixture
+def manifest(tmp_path):
+    return IndexManifest(str(tmp_path / "manifest.sqlite"))
+
+
+def _statuses(manifest, source):
+    return tuple(manifest.status(source, stage) for stage in IndexManifest.STAGES)
+
+
+def test_new_source_starts_pending(manifest):
+    manifest.track("a.pdf", "h1", "c1")
+    assert _statuses(manifest, "a.pdf") == ("pending",) * 3
+    assert manifest.sources() == ["a.pdf"]
+
+
+def test_existing_parse_output_is_adopted(manifest):
+    manifest.track("a.pdf", "h1", "c1", parsed=True)
+    assert _statuses(manifest, "a.pdf") == ("done", "pending", "pending")
+
+
+def test_unchanged_source_keeps_its_statuses(manifest):
+    manifest.track("a.pdf", "h1", "c1")
+    for stage in IndexManifest.STAGES:
+        manifest.set_status("a.pdf", stage, IndexManifest.DONE)
+    manifest.track("a.pdf", "h1", "c1")
+    assert _statuses(manifest, "a.pdf") == ("done",) * 3
+
+
+def test_config_change_only_resets_chunk_and_embed(manifest):
+    manifest.track("a.pdf", "h1", "c1")
+    for stage in IndexManifest.STAGES:
+        manifest.set_status("a.pdf", stage, IndexManifest.DONE)
+    manifest.track("a.pdf", "h1", "c2")
+    assert _statuses(manifest, "a.pdf") == ("done", "pending", "pending")
+
+
+def test_modified_source_restarts_from_parsing(manifest):
+    manifest.track("a.pdf", "h1", "c1")
+    for stage in IndexManifest.STAGES:
+        manifest.set_status("a.pdf", stage, IndexManifest.DONE)
+    manifest.track("a.pdf", "h2", "c1", parsed=True)
+    assert _statuses(manifest, "a.pdf") == ("pending",) * 3
+
+
+def test_unknown_stage_is_rejected(manifest):
+    manifest.track("a.pdf", "h1", "c1")
+    with pytest.raises(ValueError):
+        manifest.set_status("a.pdf", "upload", IndexManifest.DONE)
+
+
+def test_chunk_ids_and_orphans(manifest):
+    manifest.track("a.pdf", "h1", "c1")
+    manifest.track("b.pdf", "h2", "c1")
+    manifest.set_chunk_ids("a.pdf", ["x", "shared"])
+    manifest.set_chunk_ids("b.pdf", ["y", "shared"])
+    assert sorted(manifest.chunk_ids("a.pdf")) == ["shared", "x"]
+    assert manifest.all_chunk_ids() == {"x", "y", "shared"}
+    # "shared" is still used by b.pdf
+    assert manifest.orphaned("a.pdf", ["x", "shared"]) == ["x"]
+
+    manifest.set_chunk_ids("a.pdf", ["z"])
+    assert manifest.chunk_ids("a.pdf") == ["z"]
+
+
+def test_remove_drops_the_source_and_its_chunks(manifest):
+    manifest.track("a.pdf", "h1", "c1")
+    manifest.set_chunk_ids("a.pdf", ["x"])
+    manifest.remove("a.pdf")
+    assert manifest.get("a.pdf") is None
+    assert manifest.all_chunk_ids() == set()
+
+
+def test_state_survives_reopening(tmp_path):
+    path = str(tmp_path / "manifest.sqlite")
+    manifest = IndexManifest(path)
+    manifest.track("a.pdf", "h1", "c1")
+    manifest.set_status("a.pdf", "parse", IndexManifest.DONE)
+    manifest.set_chunk_ids("a.pdf", ["x"])
+
+    reopened = IndexManifest(path)
+    assert reopened.status("a.pdf", "parse") == "done"
+    assert reopened.chunk_ids("a.pdf") == ["x"]
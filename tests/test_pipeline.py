@@ -0,0 +1,58 @@
+import threading
+
+from chatbot.rag.exam_data_pipeline import ExamDataPipeline
+
+
+def _pipeline():
+    # Only the progress bookkeeping is needed, not the stages' dependencies
+    pipeline = ExamDataPipeline.__new__(ExamDataPipeline)
+    pipeline._progress_lock = threading.Lock()
+    pipeline.progress = {"state": "running", "stages": {}, "error": None, "failed_files": {}}
+    return pipeline
+
+
+def _run(pipeline, outcomes):
+    for stage, results in outcomes.items():
+        pipeline._begin_stage(stage, len(results))
+        for source, ok in results:
+            pipeline._advance_stage(stage, 0.0, failed=not ok, source=source)
+    pipeline._finish()
+    return pipeline.progress
+
+
+def test_nested_sources_get_distinct_outputs():
+    first = ExamDataPipeline._parsed_path("parsed", "a/exam.pdf")
+    second = ExamDataPipeline._parsed_path("parsed", "b/exam.pdf")
+    assert first != second
+    assert ExamDataPipeline._chunked_path("chunked", "a/exam.pdf") != ExamDataPipeline._chunked_path(
+        "chunked", "b/exam.pdf"
+    )
+    # Escaping cannot make a nested source collide with a top-level one
+    assert ExamDataPipeline._output_name("a%2Fexam.pdf") != ExamDataPipeline._output_name("a/exam.pdf")
+
+
+def test_top_level_output_names_are_unchanged():
+    assert ExamDataPipeline._parsed_path("parsed", "exam.pdf").startswith("parsed/exam.pdf")
+    assert ExamDataPipeline._chunked_path("chunked", "exam.pdf") == "chunked/exam.pdf.chunked.jsonl"
+
+
+def test_clean_run_is_done():
+    progress = _run(_pipeline(), {"parse": [("a.pdf", True)], "embed": [("a.pdf", True)]})
+    assert progress["state"] == "done"
+    assert progress["failed_files"] == {}
+
+
+def test_run_with_some_failures_is_partial():
+    progress = _run(
+        _pipeline(),
+        {"parse": [("a.pdf", True), ("b.pdf", False)], "embed": [("a.pdf", True)]},
+    )
+    assert progress["state"] == "partial"
+    assert progress["failed_files"] == {"parse": ["b.pdf"]}
+    assert progress["error"]
+
+
+def test_run_that_embeds_nothing_is_failed():
+    progress = _run(_pipeline(), {"parse": [("a.pdf", True)], "chunk": [("a.pdf", False)]})
+    assert progress["state"] == "failed"
+    assert progress["failed_files"] == {"chunk": ["a.pdf"]}
@@ -0,0 +1,107 @@
+import asyncio
+
+import pytest
+
+from chatbot.response_cache import SemanticResponseCache
+
+
+@pytest.fixture
+def responses(tmp_path, embeddings):
+    return SemanticResponseCache(
+        str(tmp_path / "responses.sqlite"), embeddings, similarity_threshold=0.95
+    )
+
+
+def test_exact_hits_ignore_case_and_punctuation(responses):
+    async def main():
+        await responses.set("Grade 12 math exam", "exam A", scope="math")
+        return await responses.get("grade 12 MATH exam!", scope="math")
+
+    assert asyncio.run(main()) == "exam A"
+    assert responses.stats()["exact_hits"] == 1
+
+
+def test_entries_of_another_scope_are_not_served(responses):
+    async def main():
+        await responses.set("math exam", "exam A", scope="math|v1")
+        return (
+            await responses.get("math exam", scope="math|v2"),
+            await responses.get("math exam", scope="physics|v1"),
+        )
+
+    assert asyncio.run(main()) == (None, None)
+    assert responses.stats()["misses"] == 2
+
+
+def test_semantic_hits_stay_within_the_scope(tmp_path, embeddings):
+    # With a threshold of -1 every entry is similar enough
+    cache = SemanticResponseCache(
+        str(tmp_path / "responses.sqlite"), embeddings, similarity_threshold=-1
+    )
+
+    async def main():
+        await cache.set("math exam", "math", scope="math")
+        await cache.set("physics exam", "physics", scope="physics")
+        return await cache.get("a different request", scope="physics")
+
+    assert asyncio.run(main()) == "physics"
+    assert cache.stats()["semantic_hits"] == 1
+
+
+def test_expired_entries_are_not_served(tmp_path, embeddings):
+    cache = SemanticResponseCache(
+        str(tmp_path / "responses.sqlite"), embeddings, ttl_seconds=-1
+    )
+
+    async def main():
+        await cache.set("math exam", "exam A")
+        return await cache.get("math exam")
+
+    assert asyncio.run(main()) is None
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path, embeddings):
+    cache = SemanticResponseCache(
+        str(tmp_path / "responses.sqlite"), embeddings, max_entries=2
+    )
+
+    async def main():
+        for request in ("one", "two", "three"):
+            await cache.set(request, request)
+
+    asyncio.run(main())
+    assert cache.stats()["entries"] == 2
+
+
+def test_recently_hit_entries_survive_eviction(tmp_path, embeddings):
+    cache = SemanticResponseCache(
+        str(tmp_path / "responses.sqlite"), embeddings, max_entries=2
+    )
+
+    async def main():
+        await cache.set("one", "one")
+        await cache.set("two", "two")
+        await cache.get("one")
+        await cache.set("three", "three")
+        return [await cache.get(request) for request in ("one", "two", "three")]
+
+    assert asyncio.run(main()) == ["one", None, "three"]
+
+
+def test_entries_are_updated_in_place_and_survive_a_restart(tmp_path, embeddings):
+    path = str(tmp_path / "responses.sqlite")
+    cache = SemanticResponseCache(path, embeddings, max_entries=3)
+
+    async def main():
+        # Enough replacements and evictions for the matrix to be compacted
+        for i in range(20):
+            await cache.set(f"request {i % 5}", f"answer {i}", scope=str(i % 2))
+        return await cache.get("request 4", scope="1"), await cache.get("request 3", scope="1")
+
+    assert asyncio.run(main()) == ("answer 19", None)
+    assert cache.stats()["entries"] == 3
+    assert len(cache._ids) < 20
+
+    reopened = SemanticResponseCache(path, embeddings, max_entries=3)
+    assert asyncio.run(reopened.get("request 4", scope="1")) == "answer 19"
+    assert reopened.stats()["entries"] == 3
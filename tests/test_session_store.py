@@ -0,0 +1,70 @@
+import asyncio
+
+from langchain_core.messages import AIMessage, HumanMessage
+
+from chatbot.session_store import SessionStore, SQLiteSessionBackend
+
+
+def test_history_is_a_bounded_ring_buffer():
+    store = SessionStore(history_length=3)
+
+    async def main():
+        for i in range(5):
+            await store.append("s", HumanMessage(content=str(i)))
+        return await store.history("s"), await store.history("other")
+
+    history, other = asyncio.run(main())
+    assert [m.content for m in history] == ["2", "3", "4"]
+    assert other == []
+
+
+def test_least_recently_used_sessions_are_evicted():
+    store = SessionStore(history_length=5, max_sessions=2)
+
+    async def main():
+        await store.append("a", HumanMessage(content="a"))
+        await store.append("b", HumanMessage(content="b"))
+        await store.history("a")  # a is now more recent than b
+        await store.append("c", HumanMessage(content="c"))
+
+    asyncio.run(main())
+    assert store.evictions == 1
+    assert list(store._sessions) == ["a", "c"]
+
+
+def test_idle_sessions_expire():
+    store = SessionStore(history_length=5, ttl_seconds=-1)
+
+    async def main():
+        await store.append("a", HumanMessage(content="a"))
+        return await store.history("a")
+
+    assert asyncio.run(main()) == []
+
+
+def test_sessions_survive_a_restart_with_a_backend(tmp_path):
+    path = str(tmp_path / "sessions.sqlite")
+
+    async def write():
+        store = SessionStore(history_length=5, backend=SQLiteSessionBackend(path))
+        await store.append("s", HumanMessage(content="hi"), AIMessage(content="hello"))
+
+    async def read():
+        store = SessionStore(history_length=5, backend=SQLiteSessionBackend(path))
+        return await store.history("s")
+
+    asyncio.run(write())
+    history = asyncio.run(read())
+    assert [(m.type, m.content) for m in history] == [("human", "hi"), ("ai", "hello")]
+
+
+def test_clear_removes_the_backend_copy(tmp_path):
+    backend = SQLiteSessionBackend(str(tmp_path / "sessions.sqlite"))
+    store = SessionStore(history_length=5, backend=backend)
+
+    async def main():
+        await store.append("s", HumanMessage(content="hi"))
+        await store.clear("s")
+
+    asyncio.run(main())
+    assert backend.get(store._key("s")) is None
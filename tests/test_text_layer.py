@@ -0,0 +1,23 @@
+from chatbot.rag.parsing.text_layer import text_quality
+
+CLEAN = "Exercise 1 (4 points) Solve the equation x + 1 = 0 and justify each step."
+
+
+def test_clean_text_scores_high():
+    assert text_quality(CLEAN) > 0.9
+
+
+def test_short_pages_score_zero():
+    assert text_quality("Page 3") == 0.0
+    assert text_quality(" \n\t ") == 0.0
+
+
+def test_unmapped_glyphs_lower_the_score():
+    garbled = " ".join("(cid:12)(cid:34)" for _ in range(30))
+    assert text_quality(garbled) < 0.2
+    half = CLEAN + " " + "�" * len(CLEAN)
+    assert text_quality(half) < text_quality(CLEAN)
+
+
+def test_run_together_text_lowers_the_score():
+    assert text_quality(CLEAN.replace(" ", "")) < 0.5
@@ -0,0 +1,84 @@
+import asyncio
+
+import pytest
+
+
+def test_metadatas_must_match_the_chunks(make_vector_store):
+    store = make_vector_store()
+    with pytest.raises(ValueError):
+        asyncio.run(store.add_documents(["a", "b"], metadatas=[{"page_start": 1}]))
+    assert store.count() == 0
+
+
+def test_metadata_is_extracted_in_batches(make_vector_store):
+    store = make_vector_store()
+    chunks = [f"chunk {i}" for i in range(7)]
+    asyncio.run(store.add_documents(chunks, batch_size=3, max_concurrency=2))
+    assert store.llm.calls == 7
+    assert store.count() == 7
+
+
+def test_bm25_is_persisted_on_flush_not_per_commit(make_vector_store):
+    store = make_vector_store()
+
+    async def main():
+        await store.add_documents(["first chunk"])
+        await store.add_documents(["second chunk"])
+        assert store.bm25.pending == 2
+        await store.flush_indexes()
+
+    asyncio.run(main())
+    assert store.bm25.pending == 0
+
+
+def test_bm25_is_persisted_once_enough_changes_are_pending(make_vector_store):
+    store = make_vector_store(bm25_persist_every=3)
+    asyncio.run(store.add_documents([f"chunk {i}" for i in range(3)]))
+    assert store.bm25.pending == 0
+
+
+def test_identical_chunks_are_stored_once(make_vector_store):
+    store = make_vector_store()
+    asyncio.run(store.add_documents(["same", "other", "same"]))
+    assert store.count() == 2
+    assert sorted(store.ids()) == sorted([store.chunk_id("same"), store.chunk_id("other")])
+    assert store.llm.calls == 2
+
+
+def test_existing_chunks_skip_metadata_extraction(make_vector_store):
+    store = make_vector_store()
+    asyncio.run(store.add_documents(["a", "b"]))
+    asyncio.run(store.add_documents(["a", "b", "c"]))
+    assert store.llm.calls == 3
+    assert store.count() == 3
+
+
+def test_reindexing_without_skip_overwrites_in_place(make_vector_store):
+    store = make_vector_store()
+    asyncio.run(store.add_documents(["a"]))
+    asyncio.run(store.add_documents(["a"], skip_existing=False))
+    assert store.llm.calls == 2
+    assert store.count() == 1
+
+
+def test_cache_scopes_make_no_llm_call(make_vector_store, tmp_path, embeddings):
+    from chatbot.response_cache import SemanticResponseCache
+
+    store = make_vector_store()
+    cache = SemanticResponseCache(str(tmp_path / "responses.sqlite"), embeddings)
+    request = "an exam about something the extractor is unsure of"
+
+    async def main():
+        # Before the extractor is trained only repeats of the request hit
+        await cache.set(request, "exam A", scope=await store.query_scope(request))
+        assert await cache.get(request, scope=await store.query_scope(request)) == "exam A"
+        assert store.llm.calls == 0
+
+        await store.add_documents(["mechanics chunk"])
+        await store.refresh_query_extractor()
+        calls = store.llm.calls  # metadata of the indexed chunk
+        await cache.set(request, "exam B", scope=await store.query_scope(request))
+        assert await cache.get(request, scope=await store.query_scope(request)) == "exam B"
+        assert store.llm.calls == calls
+
+    asyncio.run(main())
@@ -0,0 +1,115 @@
+import asyncio
+
+import pytest
+from langchain_core.documents import Document
+
+from chatbot.rag.vector_store.writer import GroupCommitWriter
+
+
+class Recorder:
+    """Upsert/delete callbacks that log every commit they receive."""
+
+    def __init__(self, fail: bool = False):
+        self.commits = []
+        self.fail = fail
+
+    def upsert(self, ids, documents, vectors):
+        if self.fail:
+            raise RuntimeError("disk full")
+        self.commits.append(("upsert", list(ids), [d.page_content for d in documents]))
+
+    def delete(self, ids):
+        self.commits.append(("delete", list(ids)))
+
+
+def _docs(*texts):
+    return [Document(page_content=text) for text in texts], [[0.0]] * len(texts)
+
+
+def test_concurrent_writes_are_committed_together():
+    recorder = Recorder()
+    writer = GroupCommitWriter(recorder.upsert, recorder.delete, batch_size=100, window_ms=20)
+
+    async def main():
+        await asyncio.gather(
+            *(writer.write([f"id{i}"], *_docs(f"text {i}")) for i in range(10))
+        )
+
+    asyncio.run(main())
+    assert len(recorder.commits) == 1
+    assert sorted(recorder.commits[0][1]) == [f"id{i}" for i in range(10)]
+    assert writer.stats()["documents"] == 10
+    assert writer.stats()["commits"] == 1
+
+
+def test_batches_respect_batch_size():
+    recorder = Recorder()
+    writer = GroupCommitWriter(recorder.upsert, recorder.delete, batch_size=4, window_ms=20)
+
+    async def main():
+        await asyncio.gather(
+            *(writer.write([f"a{i}", f"b{i}"], *_docs("x", "y")) for i in range(5))
+        )
+
+    asyncio.run(main())
+    assert [len(commit[1]) for commit in recorder.commits] == [4, 4, 2]
+
+
+def test_duplicate_ids_keep_the_last_write():
+    recorder = Recorder()
+    writer = GroupCommitWriter(recorder.upsert, recorder.delete, window_ms=20)
+
+    async def main():
+        await asyncio.gather(
+            writer.write(["same"], *_docs("first")),
+            writer.write(["same"], *_docs("second")),
+        )
+
+    asyncio.run(main())
+    assert recorder.commits == [("upsert", ["same"], ["second"])]
+
+
+def test_deletes_are_committed_alone_and_in_order():
+    recorder = Recorder()
+    writer = GroupCommitWriter(recorder.upsert, recorder.delete, window_ms=20)
+
+    async def main():
+        await asyncio.gather(
+            writer.write(["a"], *_docs("a")),
+            writer.delete(["a"]),
+            writer.write(["b"], *_docs("b")),
+        )
+
+    asyncio.run(main())
+    assert recorder.commits == [
+        ("upsert", ["a"], ["a"]),
+        ("delete", ["a"]),
+        ("upsert", ["b"], ["b"]),
+    ]
+
+
+def test_commit_errors_reach_every_writer_in_the_batch():
+    writer = GroupCommitWriter(Recorder(fail=True).upsert, lambda ids: None, window_ms=20)
+
+    async def main():
+        return await asyncio.gather(
+            writer.write(["a"], *_docs("a")),
+            writer.write(["b"], *_docs("b")),
+            return_exceptions=True,
+        )
+
+    results = asyncio.run(main())
+    assert all(isinstance(result, RuntimeError) for result in results)
+    assert writer.stats()["commits"] == 0
+
+
+def test_empty_writes_are_ignored():
+    recorder = Recorder()
+    writer = GroupCommitWriter(recorder.upsert, recorder.delete)
+
+    async def main():
+        await writer.write([], [], [])
+        await writer.delete([])
+
+    asyncio.run(main())
+    assert recorder.commits == []